@@ -0,0 +1,114 @@
+"""
+抓取压力测试：对本地 mock 服务器以不同并发度抓取评论，报告吞吐、延迟分位数和重试次数
+
+    python benchmarks/fetch_load.py -c 1 2 4 8 16 --latency 0.1 --rate-limit 50
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from typing import Any
+
+from bilibili_api import Credential
+
+from bilianalyzer.bvid import aid2bvid
+from bilianalyzer.fetch.client import use_api_base
+from bilianalyzer.fetch.comments import COMMENTS_PER_PAGE, ReplyFetcher
+from bilianalyzer.fetch.mock import MockApiServer, MockConfig
+from bilianalyzer.synthetic import SyntheticConfig
+
+AID = 170001
+
+
+def percentile(values: list[float], q: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def run_level(server: MockApiServer, concurrency: int, args: argparse.Namespace) -> dict:
+    fetcher = ReplyFetcher(
+        aid2bvid(AID),
+        Credential(),
+        concurrency=concurrency,
+        delay=args.delay,
+        retries=args.retries,
+    )
+    before = (server.stats.rate_limited, server.stats.errors)
+    start = time.perf_counter()
+    failed = False
+    try:
+        asyncio.run(fetcher.fetch_raw_replies(limit=0))
+    except Exception:
+        failed = True
+    elapsed = time.perf_counter() - start
+
+    stats = fetcher.stats
+    return {
+        "concurrency": concurrency,
+        "pages": stats.pages,
+        "seconds": elapsed,
+        "pages_per_second": stats.pages / elapsed,
+        "p50": statistics.median(stats.latencies) if stats.latencies else 0.0,
+        "p99": percentile(stats.latencies, 0.99),
+        "retries": stats.retries,
+        "rate_limited": server.stats.rate_limited - before[0],
+        "errors": server.stats.errors - before[1],
+        "failed": failed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test ReplyFetcher on a mock API")
+    parser.add_argument(
+        "-c", "--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16]
+    )
+    parser.add_argument("-n", "--replies", type=int, default=2000, help="Root replies")
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--rate-limit", type=float, default=0.0)
+    parser.add_argument("--burst", type=int, default=10)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--delay", type=float, default=0.0, help="Fetcher delay per page")
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        args.latency, args.jitter, args.rate_limit, args.burst, args.error_rate
+    )
+    synthetic = SyntheticConfig(
+        replies_per_video=args.replies, page_size=COMMENTS_PER_PAGE
+    )
+    server = MockApiServer(config=config, synthetic=synthetic).start()
+    use_api_base(server.url)
+
+    results: list[dict[str, Any]] = []
+    print(
+        f"{'concurrency':>11} {'pages':>6} {'pages/s':>9} {'p50':>8} {'p99':>8} "
+        f"{'retries':>8} {'412':>6} {'500':>6}"
+    )
+    try:
+        for concurrency in args.concurrency:
+            result = run_level(server, concurrency, args)
+            results.append(result)
+            print(
+                f"{concurrency:>11} {result['pages']:>6} "
+                f"{result['pages_per_second']:>9.1f} "
+                f"{result['p50']:>8.3f} {result['p99']:>8.3f} {result['retries']:>8} "
+                f"{result['rate_limited']:>6} {result['errors']:>6}"
+                + (" FAILED" if result["failed"] else "")
+            )
+    finally:
+        server.stop()
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
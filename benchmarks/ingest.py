@@ -0,0 +1,150 @@
+"""
+多进程写入压力测试：多个进程同时向同一个数据库写入不同视频的原始评论和数值历史，
+报告吞吐、锁等待重试次数和失败的进程数
+
+    python benchmarks/ingest.py -p 1 2 4 8 -n 5000
+    python benchmarks/ingest.py -p 1 2 4 8 -n 5000 --writer
+    python benchmarks/ingest.py -p 4 --reader
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.synchronize import Event
+from typing import Any, Optional
+
+from bilianalyzer.database import MetricDatabase, RawDatabase
+from bilianalyzer.fetch.service import ServiceInfo, WriterClient, WriterServer
+from bilianalyzer.metrics import metrics
+from bilianalyzer.synthetic import SyntheticConfig, SyntheticGenerator
+
+AID = 170001
+
+
+def ingest(
+    dbpath: str, aid: int, replies: int, batch_size: int, service: Optional[ServiceInfo]
+) -> dict[str, Any]:
+    generator = SyntheticGenerator(SyntheticConfig(replies_per_video=replies))
+    raw_replies = list(generator.generate_replies(aid))
+    metrics.enabled = True
+    metrics.reset()
+    raw_db: RawDatabase | WriterClient
+    metric_db: MetricDatabase | WriterClient
+    fetch_time = int(time.time())
+    error = None
+    try:
+        if service is None:
+            raw_db, metric_db = RawDatabase(dbpath), MetricDatabase(dbpath)
+        else:
+            raw_db = metric_db = WriterClient(service, dbpath)
+        for start in range(0, len(raw_replies), batch_size):
+            batch = raw_replies[start : start + batch_size]
+            raw_db.save_raw_replies(batch, fetch_time)
+            metric_db.save_metrics(batch, fetch_time)
+    except Exception as exception:
+        error = f"{type(exception).__name__}: {exception}"
+    return {
+        "rows": len(raw_replies),
+        "busy_retries": metrics.counters.get("db.busy_retries", 0),
+        "error": error,
+    }
+
+
+def scan(dbpath: str, stop: Event) -> None:
+    """模拟导出等长时间读取：逐批慢速扫描原始评论表，扫描期间持有读事务"""
+    raw_db = RawDatabase(dbpath)
+    while not stop.is_set():
+        cursor = raw_db.connection.execute("SELECT RAW FROM RAW_REPLIES")
+        while cursor.fetchmany(100) and not stop.is_set():
+            time.sleep(0.01)
+        cursor.close()
+        time.sleep(0.01)
+
+
+def run_level(processes: int, args: argparse.Namespace, workdir: str) -> dict[str, Any]:
+    dbpath = os.path.join(workdir, f"ingest-{processes}.db")
+    # NOTE: 预先建表，避免各进程同时建表
+    RawDatabase(dbpath)
+    MetricDatabase(dbpath)
+
+    server = service = None
+    if args.writer:
+        server = WriterServer()
+        service = server.info
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    reader = None
+    stop = multiprocessing.Event()
+    if args.reader:
+        reader = multiprocessing.Process(target=scan, args=(dbpath, stop), daemon=True)
+        reader.start()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=processes) as executor:
+        futures = [
+            executor.submit(
+                ingest, dbpath, AID + index, args.replies, args.batch_size, service
+            )
+            for index in range(processes)
+        ]
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+    if reader is not None:
+        stop.set()
+        reader.join()
+    if server is not None:
+        server.close()
+
+    rows = sum(result["rows"] for result in results)
+    return {
+        "processes": processes,
+        "rows": rows,
+        "seconds": elapsed,
+        "rows_per_second": rows / elapsed,
+        "busy_retries": sum(result["busy_retries"] for result in results),
+        "failed": sum(result["error"] is not None for result in results),
+        "errors": sorted({result["error"] for result in results if result["error"]}),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test concurrent database writers")
+    parser.add_argument("-p", "--processes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("-n", "--replies", type=int, default=5000, help="Root replies")
+    parser.add_argument("-b", "--batch-size", type=int, default=200)
+    parser.add_argument(
+        "--writer", action="store_true", help="Send batches to a writer process"
+    )
+    parser.add_argument(
+        "--reader",
+        action="store_true",
+        help="Scan the table in another process meanwhile",
+    )
+    parser.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    args = parser.parse_args()
+
+    results: list[dict[str, Any]] = []
+    print(f"{'processes':>9} {'rows':>8} {'rows/s':>9} {'retries':>8} {'failed':>7}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for processes in args.processes:
+            result = run_level(processes, args, workdir)
+            results.append(result)
+            print(
+                f"{processes:>9} {result['rows']:>8} {result['rows_per_second']:>9.0f} "
+                f"{result['busy_retries']:>8} {result['failed']:>7}"
+            )
+            for error in result["errors"]:
+                print(f"{'':>9} {error}")
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
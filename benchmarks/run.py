@@ -0,0 +1,421 @@
+"""
+端到端基准测试：用合成数据测量解析、数据库读写、分析和命令行的耗时
+
+    python benchmarks/run.py -n 5000 -o results.json
+    python benchmarks/run.py -n 5000 --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Optional
+from collections.abc import Callable
+
+from bilianalyzer import CommentResourceType
+from bilianalyzer.analyze.comments import CommentAnalyzer
+from bilianalyzer.bvid import aid2bvid
+from bilianalyzer.database import (
+    MemberDatabase,
+    RawDatabase,
+    ReplyDatabase,
+    SketchDatabase,
+    VideoDatabase,
+    decompress_raw,
+)
+from bilianalyzer.parse import (
+    MemberParser,
+    ReplyParser,
+    VideoParser,
+    reset_identity_maps,
+)
+from bilianalyzer.synthetic import SyntheticConfig, SyntheticGenerator
+
+AID = 170001
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # NOTE: setup 不计时，返回被计时的函数，该函数返回处理的条目数
+    setup: Callable[["Context"], Callable[[], int]]
+
+
+BENCHMARKS: list[Benchmark] = []
+
+
+def benchmark(name: str):
+    def decorator(setup: Callable[["Context"], Callable[[], int]]):
+        BENCHMARKS.append(Benchmark(name, setup))
+        return setup
+
+    return decorator
+
+
+class Context:
+    """基准测试共享的合成数据和临时工作目录"""
+
+    def __init__(self, config: SyntheticConfig, workdir: str):
+        self.config: SyntheticConfig = config
+        self.workdir: str = workdir
+        self.bvid: str = aid2bvid(AID)
+        generator = SyntheticGenerator(config)
+        self.raw_video = generator.generate_video(AID)
+        self.raw_replies = list(generator.generate_replies(AID))
+        reset_identity_maps()
+        self.video = VideoParser().parse_from_api(self.raw_video)
+        member_parser = MemberParser()
+        self.replies = ReplyParser(member_parser).batch_parse_from_api(self.raw_replies)
+        self.members = list(member_parser.unroll_members(self.replies))
+        self.all_replies = list(ReplyParser.unroll_replies(self.replies))
+        self.counter = 0
+
+        # NOTE: 读取类基准共用一个预先填充的数据库
+        self.dbpath = os.path.join(workdir, "bilianalyzer.db")
+        RawDatabase(self.dbpath).save_raw_video(self.raw_video)
+        RawDatabase(self.dbpath).save_raw_replies(self.raw_replies)
+        VideoDatabase(self.dbpath).save_video(self.video)
+        member_db = MemberDatabase(self.dbpath)
+        member_db.save_members(self.members)
+        ReplyDatabase(self.dbpath, member_db).save_replies(self.replies)
+        SketchDatabase(self.dbpath).save_replies(self.replies)
+
+    def fresh_dbpath(self) -> str:
+        self.counter += 1
+        return os.path.join(self.workdir, f"write-{self.counter}.db")
+
+
+@benchmark("parse.batch_parse_from_api")
+def bench_parse(ctx: Context) -> Callable[[], int]:
+    def run() -> int:
+        reset_identity_maps()
+        return len(ReplyParser(MemberParser()).batch_parse_from_api(ctx.raw_replies))
+
+    return run
+
+
+@benchmark("parse.parallel_parse_from_api")
+def bench_parallel_parse(ctx: Context) -> Callable[[], int]:
+    raw_db = RawDatabase(ctx.dbpath)
+    blobs = raw_db.load_raw_reply_blobs_by_resource(AID, CommentResourceType.VIDEO)
+
+    def run() -> int:
+        reset_identity_maps()
+        parser = ReplyParser(MemberParser())
+        workers = os.cpu_count() or 1
+        return len(parser.parallel_parse_from_api(blobs, workers, decode=decompress_raw))
+
+    return run
+
+
+@benchmark("database.save_raw_replies")
+def bench_save_raw_replies(ctx: Context) -> Callable[[], int]:
+    def run() -> int:
+        # NOTE: 每次写入新数据库，否则内容哈希相同的行会被跳过
+        RawDatabase(ctx.fresh_dbpath()).save_raw_replies(ctx.raw_replies)
+        return len(ctx.raw_replies)
+
+    return run
+
+
+@benchmark("database.resave_raw_replies")
+def bench_resave_raw_replies(ctx: Context) -> Callable[[], int]:
+    raw_db = RawDatabase(ctx.dbpath)
+
+    def run() -> int:
+        raw_db.save_raw_replies(ctx.raw_replies)
+        return len(ctx.raw_replies)
+
+    return run
+
+
+@benchmark("database.load_raw_replies")
+def bench_load_raw_replies(ctx: Context) -> Callable[[], int]:
+    raw_db = RawDatabase(ctx.dbpath)
+    return lambda: len(raw_db.load_raw_replies())
+
+
+@benchmark("database.load_raw_reply_by_resource")
+def bench_load_raw_reply_by_resource(ctx: Context) -> Callable[[], int]:
+    raw_db = RawDatabase(ctx.dbpath)
+    return lambda: len(raw_db.load_raw_reply_by_resource(AID, CommentResourceType.VIDEO))
+
+
+@benchmark("database.save_raw_video")
+def bench_save_raw_video(ctx: Context) -> Callable[[], int]:
+    raw_db = RawDatabase(ctx.fresh_dbpath())
+
+    def run() -> int:
+        raw_db.save_raw_video(ctx.raw_video)
+        return 1
+
+    return run
+
+
+@benchmark("database.load_raw_video_by_bvid")
+def bench_load_raw_video(ctx: Context) -> Callable[[], int]:
+    raw_db = RawDatabase(ctx.dbpath)
+    return lambda: int(raw_db.load_raw_video_by_bvid(ctx.bvid) is not None)
+
+
+@benchmark("database.save_video")
+def bench_save_video(ctx: Context) -> Callable[[], int]:
+    video_db = VideoDatabase(ctx.fresh_dbpath())
+
+    def run() -> int:
+        video_db.save_video(ctx.video)
+        return 1
+
+    return run
+
+
+@benchmark("database.load_video_by_bvid")
+def bench_load_video(ctx: Context) -> Callable[[], int]:
+    video_db = VideoDatabase(ctx.dbpath)
+
+    def run() -> int:
+        reset_identity_maps()
+        return int(video_db.load_video_by_bvid(ctx.bvid) is not None)
+
+    return run
+
+
+@benchmark("database.save_members")
+def bench_save_members(ctx: Context) -> Callable[[], int]:
+    def run() -> int:
+        MemberDatabase(ctx.fresh_dbpath()).save_members(ctx.members)
+        return len(ctx.members)
+
+    return run
+
+
+@benchmark("database.resave_members")
+def bench_resave_members(ctx: Context) -> Callable[[], int]:
+    member_db = MemberDatabase(ctx.dbpath)
+
+    def run() -> int:
+        member_db.save_members(ctx.members)
+        return len(ctx.members)
+
+    return run
+
+
+@benchmark("database.load_members")
+def bench_load_members(ctx: Context) -> Callable[[], int]:
+    member_db = MemberDatabase(ctx.dbpath)
+
+    def run() -> int:
+        reset_identity_maps()
+        return len(member_db.load_members())
+
+    return run
+
+
+@benchmark("database.save_replies")
+def bench_save_replies(ctx: Context) -> Callable[[], int]:
+    dbpath = ctx.fresh_dbpath()
+    reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+
+    def run() -> int:
+        reply_db.save_replies(ctx.replies)
+        return len(ctx.all_replies)
+
+    return run
+
+
+@benchmark("database.load_replies")
+def bench_load_replies(ctx: Context) -> Callable[[], int]:
+    reply_db = ReplyDatabase(ctx.dbpath, MemberDatabase(ctx.dbpath))
+
+    def run() -> int:
+        reset_identity_maps()
+        return len(reply_db.load_replies())
+
+    return run
+
+
+@benchmark("database.load_replies_by_resource")
+def bench_load_replies_by_resource(ctx: Context) -> Callable[[], int]:
+    reply_db = ReplyDatabase(ctx.dbpath, MemberDatabase(ctx.dbpath))
+
+    def run() -> int:
+        reset_identity_maps()
+        return len(reply_db.load_replies_by_resource(AID, CommentResourceType.VIDEO))
+
+    return run
+
+
+@benchmark("database.load_replies_by_resource_lazy")
+def bench_load_replies_by_resource_lazy(ctx: Context) -> Callable[[], int]:
+    reply_db = ReplyDatabase(ctx.dbpath, MemberDatabase(ctx.dbpath), lazy=True)
+
+    def run() -> int:
+        reset_identity_maps()
+        replies = reply_db.load_replies_by_resource(AID, CommentResourceType.VIDEO)
+        # NOTE: 与立即加载的结果可比，访问每条评论的用户和楼中楼
+        return sum(
+            1 for reply in replies if reply.member is not None or reply.child_replies
+        )
+
+    return run
+
+
+@benchmark("database.load_reply_rows")
+def bench_load_reply_rows(ctx: Context) -> Callable[[], int]:
+    reply_db = ReplyDatabase(ctx.dbpath, MemberDatabase(ctx.dbpath))
+    return lambda: sum(len(rows) for rows in reply_db.load_reply_rows(AID))
+
+
+@benchmark("database.search_replies")
+def bench_search_replies(ctx: Context) -> Callable[[], int]:
+    reply_db = ReplyDatabase(ctx.dbpath, MemberDatabase(ctx.dbpath))
+
+    def run() -> int:
+        reset_identity_maps()
+        return len(list(reply_db.search_replies("哈哈哈", limit=1000)))
+
+    return run
+
+
+@benchmark("database.sketch_save_replies")
+def bench_sketch_save_replies(ctx: Context) -> Callable[[], int]:
+    sketch_db = SketchDatabase(ctx.fresh_dbpath())
+
+    def run() -> int:
+        sketch_db.save_replies(ctx.replies)
+        return len(ctx.all_replies)
+
+    return run
+
+
+@benchmark("database.load_sketch")
+def bench_load_sketch(ctx: Context) -> Callable[[], int]:
+    sketch_db = SketchDatabase(ctx.dbpath)
+    return lambda: len(sketch_db.load_sketch("members", AID, CommentResourceType.VIDEO))
+
+
+@benchmark("analyze.generate_analysis")
+def bench_generate_analysis(ctx: Context) -> Callable[[], int]:
+    def run() -> int:
+        CommentAnalyzer(ctx.video, ctx.members, ctx.replies).generate_analysis()
+        return len(ctx.all_replies)
+
+    return run
+
+
+def cli(*args: str) -> Callable[["Context"], Callable[[], int]]:
+    def setup(ctx: Context) -> Callable[[], int]:
+        def run() -> int:
+            subprocess.run(
+                [sys.executable, "-m", "bilianalyzer", *args, ctx.bvid],
+                cwd=ctx.workdir,
+                check=True,
+                stdout=subprocess.DEVNULL,
+            )
+            return len(ctx.all_replies)
+
+        return run
+
+    return setup
+
+
+# NOTE: 命令行基准包含解释器启动和模块导入的开销
+benchmark("cli.parse")(cli("parse"))
+benchmark("cli.analyze")(cli("analyze", "--exact", "-o", os.devnull))
+benchmark("cli.export")(cli("export", "-o", "export.csv"))
+
+
+def commit_hash() -> Optional[str]:
+    try:
+        result = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def measure(ctx: Context, bench: Benchmark, repeat: int) -> dict:
+    run = bench.setup(ctx)
+    timings: list[float] = []
+    items = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        items = run()
+        timings.append(time.perf_counter() - start)
+    return {
+        "seconds": statistics.median(timings),
+        "min": min(timings),
+        "runs": timings,
+        "items": items,
+    }
+
+
+def compare(results: dict, baseline: dict) -> None:
+    print(f"\nCompared with {baseline.get('commit')}:")
+    for name, result in results["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None:
+            continue
+        change = (result["seconds"] - base["seconds"]) / base["seconds"] * 100
+        print(
+            f"{name:40} {base['seconds']:10.4f}s -> "
+            f"{result['seconds']:10.4f}s {change:+7.1f}%"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run bilianalyzer benchmarks")
+    parser.add_argument("-n", "--replies", type=int, default=2000, help="Root replies")
+    parser.add_argument(
+        "-m", "--members", type=int, default=5000, help="Member pool size"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Runs per benchmark")
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument(
+        "-k", "--filter", default="", help="Run benchmarks containing this"
+    )
+    parser.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    parser.add_argument("-c", "--compare", default=None, help="Baseline JSON to compare")
+    args = parser.parse_args()
+
+    config = SyntheticConfig(
+        seed=args.seed, member_count=args.members, replies_per_video=args.replies
+    )
+    results = {
+        "commit": commit_hash(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": vars(config),
+        "benchmarks": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        ctx = Context(config, workdir)
+        for bench in BENCHMARKS:
+            if args.filter not in bench.name:
+                continue
+            result = measure(ctx, bench, args.repeat)
+            results["benchmarks"][bench.name] = result
+            print(f"{bench.name:40} {result['seconds']:10.4f}s {result['items']:8} items")
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+命令行启动耗时基准：用 python -X importtime 统计各子命令的导入耗时
+
+    python benchmarks/startup.py -o startup.json
+    python benchmarks/startup.py --compare startup.json
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+# NOTE: 使用 --help 只测量导入和参数解析，不触及数据库和网络
+COMMANDS: dict[str, list[str]] = {
+    "main": ["--help"],
+    "auth": ["auth", "--help"],
+    "fetch": ["fetch", "--help"],
+    "parse": ["parse", "--help"],
+    "analyze": ["analyze", "--help"],
+    "graph": ["graph", "--help"],
+    "search": ["search", "--help"],
+    "list": ["list", "comments", "--help"],
+    "view": ["view", "--help"],
+    "export": ["export", "--help"],
+    "snapshot": ["snapshot", "--help"],
+    "history": ["history", "--help"],
+    "gc": ["gc", "--help"],
+    "shard": ["shard", "--help"],
+    "writer": ["writer", "--help"],
+    "fetch-uploader": ["fetch-uploader", "--help"],
+    "watch": ["watch", "--help"],
+}
+# NOTE: 离线命令不应导入的网络相关模块
+NETWORK_MODULES: tuple[str, ...] = ("bilibili_api", "httpx", "aiohttp", "curl_cffi")
+
+
+def parse_importtime(stderr: str) -> tuple[dict[str, int], int]:
+    """解析 -X importtime 输出，返回各模块的累计导入耗时和总导入耗时（微秒）"""
+    modules: dict[str, int] = {}
+    total = 0
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        modules[name.strip()] = int(cumulative)
+        # NOTE: 缩进表示嵌套导入，只累加顶层模块避免重复计算
+        if not name[1:].startswith(" "):
+            total += int(cumulative)
+    return modules, total
+
+
+def measure(args: list[str], repeat: int) -> dict:
+    walls: list[float] = []
+    totals: list[int] = []
+    modules: dict[str, int] = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-m", "bilianalyzer", *args],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        walls.append(time.perf_counter() - start)
+        modules, total = parse_importtime(result.stderr)
+        totals.append(total)
+    network = {name.split(".")[0] for name in modules if name.startswith(NETWORK_MODULES)}
+    return {
+        "seconds": statistics.median(walls),
+        "import_us": statistics.median(totals),
+        "modules": len(modules),
+        "network": sorted(network),
+        "top": sorted(modules.items(), key=lambda item: -item[1])[:10],
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Measure bilianalyzer CLI startup time")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="Runs per command")
+    parser.add_argument(
+        "-v", "--verbose", action="store_true", help="Show slowest imports"
+    )
+    parser.add_argument("-o", "--output", default=None, help="Write results as JSON")
+    parser.add_argument("-c", "--compare", default=None, help="Baseline JSON to compare")
+    args = parser.parse_args()
+
+    results: dict = {"python": platform.python_version(), "commands": {}}
+    for name, command in COMMANDS.items():
+        result = measure(command, args.repeat)
+        results["commands"][name] = result
+        network = ",".join(result["network"]) or "-"
+        print(
+            f"{name:10} {result['seconds'] * 1000:8.1f} ms wall "
+            f"{result['import_us'] / 1000:8.1f} ms import "
+            f"{result['modules']:5} modules  network: {network}"
+        )
+        if args.verbose:
+            for module, cumulative in result["top"]:
+                print(f"{'':10} {cumulative / 1000:8.1f} ms {module}")
+
+    if args.output is not None:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.compare is not None:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print("\nCompared with baseline:")
+        for name, result in results["commands"].items():
+            base = baseline.get("commands", {}).get(name)
+            if base is None:
+                continue
+            print(
+                f"{name:10} {base['seconds'] * 1000:8.1f} ms -> "
+                f"{result['seconds'] * 1000:8.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,25 @@
 from dataclasses import dataclass
+from enum import Enum
 from typing import Optional
 
-from bilibili_api.comment import CommentResourceType
+
+class CommentResourceType(Enum):
+    """
+    评论资源类型，取值与 bilibili_api.comment.CommentResourceType 一致
+
+    NOTE: 在本地定义以免离线命令导入 bilibili_api，抓取时按 value 传给 bilibili_api
+    """
+
+    VIDEO = 1
+    ARTICLE = 12
+    DYNAMIC_DRAW = 11
+    DYNAMIC = 17
+    AUDIO = 14
+    AUDIO_LIST = 19
+    CHEESE = 33
+    BLACK_ROOM = 6
+    MANGA = 22
+    ACTIVITY = 4
 
 
 @dataclass
@@ -1,17 +1,90 @@
+import importlib
+from typing import Optional
+
 import click
 
-from .commands import auth_commands, fetch_commands, parse_commands, analyze_commands
+from .metrics import Profiler, metrics
+
+# NOTE: 子命令在被调用时才导入，只有抓取相关的命令和 auth/mock 会导入 bilibili_api
+COMMANDS: dict[str, str] = {
+    "auth": "auth_commands:auth",
+    "fetch": "fetch_commands:fetch",
+    "parse": "parse_commands:parse",
+    "analyze": "analyze_commands:analyze",
+    "search": "search_commands:search",
+    "list": "list_commands:list_group",
+    "view": "view_commands:view",
+    "graph": "graph_commands:graph",
+    "export": "export_commands:export",
+    "snapshot": "snapshot_commands:snapshot",
+    "history": "history_commands:history",
+    "gc": "gc_commands:gc",
+    "shard": "shard_commands:shard",
+    "writer": "writer_commands:writer",
+    "fetch-uploader": "uploader_commands:fetch_uploader",
+    "watch": "watch_commands:watch",
+    "mock": "mock_commands:mock",
+}
+
 
+class LazyGroup(click.Group):
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted(set(super().list_commands(ctx)) | set(COMMANDS))
 
-@click.group()
-def main():
+    def get_command(self, ctx: click.Context, name: str) -> Optional[click.Command]:
+        if name not in self.commands and name in COMMANDS:
+            module_name, attribute = COMMANDS[name].split(":")
+            module = importlib.import_module(f".commands.{module_name}", __package__)
+            self.add_command(getattr(module, attribute), name)
+        return super().get_command(ctx, name)
+
+
+@click.group(cls=LazyGroup)
+@click.option(
+    "--profile",
+    is_flag=True,
+    help="Print per-stage timings, counters and queue depths after the command",
+)
+@click.option(
+    "--metrics-out",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write per-stage metrics of the command as JSON to this file",
+)
+@click.option(
+    "--cprofile",
+    "cprofile_out",
+    type=click.Path(dir_okay=False, writable=True),
+    default=None,
+    help="Write cProfile stats of the command to this file",
+)
+@click.option(
+    "--tracemalloc",
+    "trace_memory",
+    is_flag=True,
+    help="Trace memory allocations and print the top allocation sites",
+)
+@click.pass_context
+def main(ctx, profile, metrics_out, cprofile_out, trace_memory):
     """BiliAnalyzer: Fetch and Analyze Bilibili Comments"""
 
+    # NOTE: 未指定任何选项时不启用计量，各处埋点只做一次属性判断
+    if not (profile or metrics_out or cprofile_out or trace_memory):
+        return
+    metrics.enabled = True
+    profiler = Profiler(cprofile_out, trace_memory)
+    profiler.start()
+
+    def finish():
+        lines = profiler.stop()
+        if metrics_out is not None:
+            metrics.dump(metrics_out)
+        if profile or trace_memory:
+            click.echo(metrics.report(), err=True)
+            for line in lines:
+                click.echo(line, err=True)
 
-main.add_command(auth_commands.auth)
-main.add_command(fetch_commands.fetch)
-main.add_command(parse_commands.parse)
-main.add_command(analyze_commands.analyze)
+    ctx.call_on_close(finish)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,116 @@
+from typing import Any, Optional
+from collections import Counter
+
+from .. import CommentResourceType, Member, Video
+from ..snapshot import NULL_CODE, Column, Snapshot, numpy
+from .comments import CommentAnalyzer
+
+
+class ColumnarAnalyzer(CommentAnalyzer):
+    """
+    直接在 mmap 快照的列上统计分布，不构造 Member/Reply 对象
+
+    评论正文相关的分析（高频词、刷屏检测）仍按需逐行解码
+    """
+
+    def __init__(
+        self,
+        snapshot: Snapshot,
+        oid: int,
+        otype: CommentResourceType = CommentResourceType.VIDEO,
+        **kwargs: Any,
+    ):
+        resource: Optional[dict[str, Any]] = snapshot.resource(oid, otype)
+        if resource is None:
+            raise ValueError(f"Resource {otype.name} {oid} not found in snapshot")
+        if resource["video"] is None:
+            raise ValueError(f"Video info of resource {otype.name} {oid} not in snapshot")
+        self.snapshot: Snapshot = snapshot
+        self.snapshot_replies = snapshot.replies(resource)
+        self.snapshot_members = snapshot.members(resource)
+        super().__init__(
+            Video(**resource["video"]),
+            self.snapshot_members,
+            self.snapshot_replies,
+            **kwargs,
+        )
+
+    def find_members(self, uids: set[int]) -> dict[int, Member]:
+        return self.snapshot_members.find(uids)
+
+    def _count_codes(self, name: str, codes: Column) -> Counter[str]:
+        counts: Counter[str] = Counter()
+        if numpy is not None:
+            values, frequencies = numpy.unique(codes, return_counts=True)
+            pairs = zip(values.tolist(), frequencies.tolist())
+        else:
+            pairs = Counter(codes).items()
+        for code, count in pairs:
+            if code != NULL_CODE:
+                counts[self.snapshot.dictionaries[name][code]] = count
+        return counts
+
+    @staticmethod
+    def _count_values(values: Column) -> Counter[int]:
+        if numpy is not None:
+            values, frequencies = numpy.unique(values, return_counts=True)
+            return Counter(dict(zip(values.tolist(), frequencies.tolist())))
+        return Counter(values)
+
+    def analyze_member_count(self) -> int:
+        if self.member_sketch is not None:
+            return len(self.member_sketch)
+        # NOTE: 快照中同一资源下的用户已按 UID 去重
+        return len(self.snapshot_members)
+
+    def analyze_uid_lengths(self) -> Counter[int]:
+        uids = self.snapshot_members.column("uid")
+        if numpy is not None:
+            powers = numpy.array(
+                [10**digits for digits in range(1, 19)], dtype=numpy.int64
+            )
+            return self._count_values(numpy.searchsorted(powers, uids, side="right") + 1)
+        return Counter(len(str(uid)) for uid in uids)
+
+    def analyze_levels(self) -> Counter[int]:
+        levels = self._count_values(self.snapshot_members.column("level"))
+        levels.pop(NULL_CODE, None)
+        return levels
+
+    def analyze_vips(self) -> Counter[str]:
+        return self._count_codes("members.vip", self.snapshot_members.column("vip"))
+
+    def analyze_sexes(self) -> Counter[str]:
+        sexes = self._count_codes("members.sex", self.snapshot_members.column("sex"))
+        unknown = len(self.snapshot_members) - sum(sexes.values())
+        if unknown:
+            sexes["保密"] += unknown
+        return sexes
+
+    def analyze_pendants(self) -> Counter[str]:
+        return self._count_codes(
+            "members.pendant", self.snapshot_members.column("pendant")
+        )
+
+    def analyze_cardbags(self) -> Counter[str]:
+        return self._count_codes(
+            "members.cardbag", self.snapshot_members.column("cardbag")
+        )
+
+    def analyze_locations(self) -> Counter[str]:
+        return self._count_codes(
+            "replies.location", self.snapshot_replies.column("location")
+        )
+
+    def analyze_comment_intervals(self) -> Counter[str]:
+        ctimes = self.snapshot_replies.column("ctime")
+        if numpy is None:
+            return super().analyze_comment_intervals()
+        hours = (ctimes - self.video.publish_time) / 3600.0
+        indices = numpy.searchsorted(self.INTERVAL_POINTS, hours, side="right")
+        return Counter(
+            {
+                self.INTERVAL_NAMES[index]: count
+                for index, count in self._count_values(indices).items()
+            }
+        )
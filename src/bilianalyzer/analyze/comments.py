@@ -2,16 +2,54 @@ import os
 import json
 from typing import Optional, NewType
 from collections import Counter
-from collections.abc import Collection
+from collections.abc import Collection, Iterable
 
 from .. import Member, Reply, Video
+from ..metrics import count, timer
+from .sketches import HyperLogLog, SpaceSaving, heavy_hitters
+from .messages import MessageAnalyzer, Segmenter
+from .duplicates import DuplicateAnalyzer
+from .sampling import Interval, proportion_intervals
 
-Analysis = NewType("Analysis", dict[str, str | int | Counter[str] | Counter[int]])
+Analysis = NewType(
+    "Analysis",
+    dict[
+        str,
+        str
+        | int
+        | Counter[str]
+        | Counter[int]
+        | dict[str, int]
+        | dict[int, list[tuple[str, float]]]
+        | list[dict[str, str | int]]
+        | dict[str, dict[str | int, Interval]],
+    ],
+)
 
 
-class MemberAnalyzer:
-    def __init__(self, members: Collection[Member]):
+class SketchMixin:
+    # NOTE: sketch_capacity 为 None 时精确统计，否则只跟踪前 sketch_capacity 个高频项
+    sketch_capacity: Optional[int] = None
+    sketches: dict[str, SpaceSaving[str]]
+
+    def _count_strings(self, name: str, values: Iterable[str]) -> Counter[str]:
+        if self.sketch_capacity is None:
+            return Counter(values)
+        sketch = heavy_hitters(values, self.sketch_capacity)
+        self.sketches[name] = sketch
+        return sketch.to_counter()
+
+    def sketch_errors(self) -> dict[str, int]:
+        return {name: sketch.error_bound() for name, sketch in self.sketches.items()}
+
+
+class MemberAnalyzer(SketchMixin):
+    def __init__(
+        self, members: Collection[Member], sketch_capacity: Optional[int] = None
+    ):
         self.members: Collection[Member] = members
+        self.sketch_capacity = sketch_capacity
+        self.sketches = {}
 
     def analyze_uid_lengths(self) -> Counter[int]:
         return Counter(len(str(member.uid)) for member in self.members)
@@ -44,24 +82,18 @@ class MemberAnalyzer:
     # TODO: refactor pendants and cardbags
     def analyze_pendants(self) -> Counter[str]:
         # NOTE: pendant 表示头像框，叠加在头像上
-        pendants: Counter[str] = Counter()
-        for member in self.members:
-            if member.pendant is None:
-                continue
-            else:
-                pendants[member.pendant] += 1
-        return pendants
+        return self._count_strings(
+            "pendants",
+            (member.pendant for member in self.members if member.pendant is not None),
+        )
 
     # TODO: refactor pendants and cardbags
     def analyze_cardbags(self) -> Counter[str]:
         # NOTE: cardbag 表示数字周边，出现在评论右侧
-        cardbags: Counter[str] = Counter()
-        for member in self.members:
-            if member.cardbag is None:
-                continue
-            else:
-                cardbags[member.cardbag] += 1
-        return cardbags
+        return self._count_strings(
+            "cardbags",
+            (member.cardbag for member in self.members if member.cardbag is not None),
+        )
 
     # TODO: readd fans medal
     """
@@ -83,65 +115,78 @@ class MemberAnalyzer:
     """
 
 
-class ReplyAnalyzer:
-    def __init__(self, replies: Collection[Reply]):
+class ReplyAnalyzer(SketchMixin):
+    def __init__(self, replies: Collection[Reply], sketch_capacity: Optional[int] = None):
         self.replies: Collection[Reply] = replies
+        self.sketch_capacity = sketch_capacity
+        self.sketches = {}
 
     def analyze_locations(self) -> Counter[str]:
-        locations: Counter[str] = Counter()
-        for reply in self.replies:
-            location = reply.location
-            if location is not None:
-                locations[location] += 1
-        return locations
+        return self._count_strings(
+            "locations",
+            (reply.location for reply in self.replies if reply.location is not None),
+        )
 
 
-class CommentAnalyzer(MemberAnalyzer, ReplyAnalyzer):
+class CommentAnalyzer(MemberAnalyzer, ReplyAnalyzer, MessageAnalyzer, DuplicateAnalyzer):
     def __init__(
         self,
         video: Video,
         members: Collection[Member],
         replies: Collection[Reply],
+        sketch_capacity: Optional[int] = None,
+        member_sketch: Optional[HyperLogLog] = None,
+        segmenter: Optional[Segmenter] = None,
+        workers: int = 1,
+        confidence: Optional[float] = None,
     ):
         self.video: Video = video
-        MemberAnalyzer.__init__(self, members)
-        ReplyAnalyzer.__init__(self, replies)
+        MemberAnalyzer.__init__(self, members, sketch_capacity)
+        ReplyAnalyzer.__init__(self, replies, sketch_capacity)
+        MessageAnalyzer.__init__(self, replies, segmenter, workers)
+        DuplicateAnalyzer.__init__(self, replies, members)
+        # NOTE: 给出 member_sketch 时用 HyperLogLog 估计参与评论的用户数；
+        # 其他分布仍需要全部用户，草图不减少单个视频分析时加载的数据
+        self.member_sketch: Optional[HyperLogLog] = member_sketch
+        # NOTE: 给出 confidence 时将评论视为抽样结果，报告各分布占比的置信区间
+        self.confidence: Optional[float] = confidence
         self.analysis: Optional[Analysis] = None
 
-    @staticmethod
-    def _calc_interval_name(start_time: int, end_time: int) -> str:
+    INTERVAL_POINTS: list[float] = [
+        0.0,
+        0.5,
+        1.0,
+        2.0,
+        3.0,
+        6.0,
+        12.0,
+        24.0,
+        48.0,
+        72.0,
+    ]
+    INTERVAL_NAMES: list[str] = [
+        # NOTE: "超时空评论" is just for fun and in case of special cases
+        "超时空评论",
+        "半小时内",
+        "0.5-1小时内",
+        "1-2小时内",
+        "2-3小时内",
+        "3-6小时内",
+        "6-12小时内",
+        "12-24小时内（1天内）",
+        "24-48小时内（2天内）",
+        "48-72小时内（3天内）",
+        "3天以上",
+    ]
+
+    @classmethod
+    def _calc_interval_name(cls, start_time: int, end_time: int) -> str:
 
         interval_hours: float = (end_time - start_time) / 3600.0
-        INTERVAL_POINTS: list[float] = [
-            0.0,
-            0.5,
-            1.0,
-            2.0,
-            3.0,
-            6.0,
-            12.0,
-            24.0,
-            48.0,
-            72.0,
-        ]
-        INTERVAL_NAMES: list[str] = [
-            # NOTE: "超时空评论" is just for fun and in case of special cases
-            "超时空评论",
-            "半小时内",
-            "0.5-1小时内",
-            "1-2小时内",
-            "2-3小时内",
-            "3-6小时内",
-            "6-12小时内",
-            "12-24小时内（1天内）",
-            "24-48小时内（2天内）",
-            "48-72小时内（3天内）",
-            "3天以上",
-        ]
-        for interval_stop, interval_name in zip(INTERVAL_POINTS, INTERVAL_NAMES):
+        for interval_stop, interval_name in zip(cls.INTERVAL_POINTS, cls.INTERVAL_NAMES):
             if interval_hours < interval_stop:
                 return interval_name
-        return INTERVAL_NAMES[-1]
+        return cls.INTERVAL_NAMES[-1]
 
     def analyze_comment_intervals(self) -> Counter[str]:
 
@@ -156,20 +201,36 @@ class CommentAnalyzer(MemberAnalyzer, ReplyAnalyzer):
 
         return comment_intervals
 
+    def analyze_member_count(self) -> int:
+        if self.member_sketch is not None:
+            return len(self.member_sketch)
+        return len({member.uid for member in self.members})
+
     def generate_analysis(self) -> Analysis:
         video: Video = self.video
         reply_count: int = len(self.replies)
-        member_count: int = len(self.members)
-        uid_lengths: Counter[int] = self.analyze_uid_lengths()
-        levels: Counter[int] = self.analyze_levels()
-        vips: Counter[str] = self.analyze_vips()
-        sexes: Counter[str] = self.analyze_sexes()
-        # TODO: refactor pendants and cardbags
-        # TODO: readd fans medal
-        pendants: Counter[str] = self.analyze_pendants()
-        cardbags: Counter[str] = self.analyze_cardbags()
-        locations: Counter[str] = self.analyze_locations()
-        comment_intervals: Counter[str] = self.analyze_comment_intervals()
+        with timer("analyze.members"):
+            member_count: int = self.analyze_member_count()
+            uid_lengths: Counter[int] = self.analyze_uid_lengths()
+            levels: Counter[int] = self.analyze_levels()
+            vips: Counter[str] = self.analyze_vips()
+            sexes: Counter[str] = self.analyze_sexes()
+            # TODO: refactor pendants and cardbags
+            # TODO: readd fans medal
+            pendants: Counter[str] = self.analyze_pendants()
+            cardbags: Counter[str] = self.analyze_cardbags()
+        with timer("analyze.replies"):
+            locations: Counter[str] = self.analyze_locations()
+            comment_intervals: Counter[str] = self.analyze_comment_intervals()
+        with timer("analyze.messages"):
+            terms: Counter[str] = self.analyze_terms()
+            emotes: Counter[str] = self.analyze_emotes()
+            keywords: dict[int, list[tuple[str, float]]] = self.analyze_keywords()
+        with timer("analyze.duplicates"):
+            duplicates: list[dict[str, str | int]] = self.analyze_duplicates()
+            duplicate_levels: Counter[int] = self.analyze_duplicate_levels()
+            duplicate_uid_lengths: Counter[int] = self.analyze_duplicate_uid_lengths()
+        count("analyze.replies", reply_count)
         analysis = Analysis(
             {
                 "bvid": video.bvid,
@@ -189,10 +250,31 @@ class CommentAnalyzer(MemberAnalyzer, ReplyAnalyzer):
                 # TODO: readd fans medal
                 "locations": locations,
                 "comment_intervals": comment_intervals,
+                "terms": terms,
+                "emotes": emotes,
+                "keywords": keywords,
+                "duplicates": duplicates,
+                "duplicate_levels": duplicate_levels,
+                "duplicate_uid_lengths": duplicate_uid_lengths,
             }
         )
+        if self.sketch_capacity is not None:
+            analysis["sketch_errors"] = self.sketch_errors()
+        if self.confidence is not None:
+            analysis["intervals"] = self.analyze_intervals(
+                {"levels": levels, "vips": vips, "sexes": sexes, "locations": locations}
+            )
         return analysis
 
+    def analyze_intervals(
+        self, distributions: dict[str, Counter]
+    ) -> dict[str, dict[str | int, Interval]]:
+        confidence = self.confidence if self.confidence is not None else 0.95
+        return {
+            name: proportion_intervals(counts, confidence)
+            for name, counts in distributions.items()
+        }
+
     def get_analysis(self) -> Analysis:
         if self.analysis is None:
             self.analysis = self.generate_analysis()
@@ -0,0 +1,211 @@
+import hashlib
+import re
+from array import array
+from dataclasses import dataclass, field
+from typing import Optional
+from collections import Counter
+from collections.abc import Collection, Iterable
+
+from .. import Member, Reply
+
+NORMALIZE_PATTERN = re.compile(r"[\s\W_]+")
+# NOTE: array 的 "I"/"L" 宽度随平台而定，取 4 字节宽的类型码，保证签名切分为 32 位哈希
+HASH_TYPECODE = next((code for code in "IL" if array(code).itemsize == 4), None)
+if HASH_TYPECODE is None:
+    raise RuntimeError("No 32-bit unsigned array typecode on this platform")
+
+
+class MinHasher:
+    """字符 shingle 的 MinHash 签名，两条签名相同位置相等的比例估计 Jaccard 相似度"""
+
+    def __init__(self, num_permutations: int = 64, shingle_size: int = 3, seed: int = 1):
+        self.num_permutations: int = num_permutations
+        self.shingle_size: int = shingle_size
+        self.salt: bytes = seed.to_bytes(8, "little")
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return NORMALIZE_PATTERN.sub("", text.lower())
+
+    def shingles(self, text: str) -> set[str]:
+        size = self.shingle_size
+        if len(text) <= size:
+            return {text}
+        return {text[start : start + size] for start in range(len(text) - size + 1)}
+
+    def signature(self, text: str) -> tuple[int, ...]:
+        # NOTE: 每个 shingle 只做一次 SHAKE-128，切成 num_permutations 个 32 位哈希，
+        # 逐列取最小值，避免在 Python 层逐个计算 (a * h + b) % p
+        length = 4 * self.num_permutations
+        hashes = [
+            array(
+                HASH_TYPECODE,
+                hashlib.shake_128(self.salt + shingle.encode("utf-8")).digest(length),
+            )
+            for shingle in self.shingles(text)
+        ]
+        return tuple(map(min, zip(*hashes)))
+
+    @staticmethod
+    def similarity(first: tuple[int, ...], second: tuple[int, ...]) -> float:
+        return sum(a == b for a, b in zip(first, second)) / len(first)
+
+
+class DisjointSet:
+    def __init__(self):
+        self.parents: dict[int, int] = {}
+
+    def find(self, item: int) -> int:
+        root = self.parents.setdefault(item, item)
+        while root != self.parents[root]:
+            root = self.parents[root]
+        while item != root:
+            self.parents[item], item = root, self.parents[item]
+        return root
+
+    def union(self, first: int, second: int) -> None:
+        self.parents[self.find(first)] = self.find(second)
+
+
+class LSHIndex:
+    """
+    MinHash 签名的分段局部敏感哈希索引
+
+    签名切成 `bands` 段，任一段完全相同即成为候选；桶内每个分组保留一个代表元素，
+    候选与桶内每个其他分组的代表比较，整体复杂度与评论数近似线性
+    """
+
+    def __init__(self, bands: int = 16, threshold: float = 0.6):
+        self.bands: int = bands
+        self.threshold: float = threshold
+        self.buckets: list[dict[tuple[int, ...], list[int]]] = [{} for _ in range(bands)]
+        self.signatures: dict[int, tuple[int, ...]] = {}
+        self.groups: DisjointSet = DisjointSet()
+
+    def insert(self, key: int, signature: tuple[int, ...]) -> None:
+        rows = len(signature) // self.bands
+        self.signatures[key] = signature
+        self.groups.find(key)
+        for band, buckets in enumerate(self.buckets):
+            segment = signature[band * rows : (band + 1) * rows]
+            representatives = buckets.setdefault(segment, [])
+            # NOTE: 桶内的代表可能因之后的合并属于同一分组，每个分组只比较一次
+            compared: set[int] = set()
+            joined = False
+            for representative in representatives:
+                root = self.groups.find(representative)
+                if root == self.groups.find(key):
+                    joined = True
+                    continue
+                if root in compared:
+                    continue
+                compared.add(root)
+                similarity = MinHasher.similarity(
+                    signature, self.signatures[representative]
+                )
+                if similarity >= self.threshold:
+                    self.groups.union(key, representative)
+                    joined = True
+            if not joined:
+                representatives.append(key)
+
+    def clusters(self) -> list[list[int]]:
+        clusters: dict[int, list[int]] = {}
+        for key in self.signatures:
+            clusters.setdefault(self.groups.find(key), []).append(key)
+        return list(clusters.values())
+
+
+@dataclass
+class DuplicateGroup:
+    message: str
+    rpids: list[int] = field(default_factory=list)
+    mids: set[int] = field(default_factory=set)
+
+
+class DuplicateAnalyzer:
+    def __init__(
+        self,
+        replies: Collection[Reply],
+        members: Optional[Collection[Member]] = None,
+        threshold: float = 0.6,
+        min_length: int = 6,
+        min_group_size: int = 3,
+    ):
+        self.replies: Collection[Reply] = replies
+        self.members: Collection[Member] = members or ()
+        self.members_by_uid: Optional[dict[int, Member]] = None
+        self.threshold: float = threshold
+        self.min_length: int = min_length
+        self.min_group_size: int = min_group_size
+        self.duplicate_groups: Optional[list[DuplicateGroup]] = None
+
+    def get_duplicate_groups(self) -> list[DuplicateGroup]:
+        if self.duplicate_groups is not None:
+            return self.duplicate_groups
+
+        hasher = MinHasher()
+        index = LSHIndex(threshold=self.threshold)
+        # NOTE: 完全相同的文本只计算一次签名，刷屏评论大多逐字相同
+        texts: dict[str, int] = {}
+        replies_by_text: list[list[Reply]] = []
+        for reply in self.replies:
+            text = hasher.normalize(reply.message)
+            if len(text) < self.min_length:
+                continue
+            if text not in texts:
+                texts[text] = len(replies_by_text)
+                replies_by_text.append([])
+                index.insert(texts[text], hasher.signature(text))
+            replies_by_text[texts[text]].append(reply)
+
+        groups: list[DuplicateGroup] = []
+        for cluster in index.clusters():
+            replies = [reply for key in cluster for reply in replies_by_text[key]]
+            if len(replies) < self.min_group_size:
+                continue
+            group = DuplicateGroup(message=replies[0].message)
+            for reply in replies:
+                group.rpids.append(reply.rpid)
+                group.mids.add(reply.mid)
+            groups.append(group)
+        groups.sort(key=lambda group: len(group.rpids), reverse=True)
+
+        self.duplicate_groups = groups
+        return groups
+
+    def find_members(self, uids: set[int]) -> dict[int, Member]:
+        """返回给定 UID 的用户 {UID: Member}，子类可直接按 UID 定位以免构造全部用户"""
+        return {member.uid: member for member in self.members if member.uid in uids}
+
+    def _duplicate_members(self) -> Iterable[Member]:
+        groups = self.get_duplicate_groups()
+        if self.members_by_uid is None:
+            # NOTE: 只在首次需要时查找刷屏组内的用户
+            self.members_by_uid = self.find_members(
+                {mid for group in groups for mid in group.mids}
+            )
+        for group in groups:
+            for mid in group.mids:
+                if mid in self.members_by_uid:
+                    yield self.members_by_uid[mid]
+
+    def analyze_duplicates(self, top: int = 10) -> list[dict[str, str | int]]:
+        return [
+            {
+                "message": group.message,
+                "reply_count": len(group.rpids),
+                "member_count": len(group.mids),
+            }
+            for group in self.get_duplicate_groups()[:top]
+        ]
+
+    def analyze_duplicate_levels(self) -> Counter[int]:
+        return Counter(
+            member.level
+            for member in self._duplicate_members()
+            if member.level is not None
+        )
+
+    def analyze_duplicate_uid_lengths(self) -> Counter[int]:
+        return Counter(len(str(member.uid)) for member in self._duplicate_members())
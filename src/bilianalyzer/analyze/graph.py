@@ -0,0 +1,322 @@
+import heapq
+import json
+import os
+from array import array
+from itertools import groupby
+from typing import Any, Optional
+from collections import Counter
+from collections.abc import Iterable
+
+from ..metrics import count, timer
+from ..parse import Record
+from ..snapshot import Column, numpy
+
+PAGERANK_DAMPING = 0.85
+PAGERANK_ITERATIONS = 100
+PAGERANK_TOLERANCE = 1e-8
+
+
+class ReplyGraph:
+    """
+    用户互动图的 CSR（压缩稀疏行）表示：下标为 i 的用户回复过的用户下标为
+    targets[offsets[i]:offsets[i + 1]]，weights 的同一区间为对应的回复次数
+
+    NOTE: 每条边只在 targets/weights 中各占 4 字节，UID 只在 uids 中存一份，
+    数百万条边的图只需数十 MB；numpy 可用时各数组为 ndarray，否则为 array
+    """
+
+    def __init__(self, uids: Column, offsets: Column, targets: Column, weights: Column):
+        self.uids: Column = uids
+        self.offsets: Column = offsets
+        self.targets: Column = targets
+        self.weights: Column = weights
+
+    def __len__(self) -> int:
+        return len(self.uids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def neighbors(self, index: int) -> list[tuple[int, int]]:
+        start, stop = self.offsets[index], self.offsets[index + 1]
+        return list(zip(self.targets[start:stop], self.weights[start:stop]))
+
+    def in_weights(self) -> Column:
+        """每个用户收到的回复数（不含回复自己）"""
+        if numpy is not None:
+            received = numpy.bincount(self.targets, self.weights, minlength=len(self))
+            return received.astype(numpy.int64)
+        received = array("q", bytes(8 * len(self)))
+        for target, weight in zip(self.targets, self.weights):
+            received[target] += weight
+        return received
+
+    def pagerank(
+        self,
+        damping: float = PAGERANK_DAMPING,
+        iterations: int = PAGERANK_ITERATIONS,
+        tolerance: float = PAGERANK_TOLERANCE,
+    ) -> Column:
+        """
+        按回复次数加权的 PageRank：被影响力高的用户回复越多，影响力越高
+
+        NOTE: 没有回复过他人的用户的得分均匀分给所有用户，得分之和始终为 1
+        """
+        size = len(self)
+        if size == 0:
+            return array("d")
+        if numpy is not None:
+            return self._pagerank_numpy(damping, iterations, tolerance)
+
+        out_weights = [
+            sum(self.weights[self.offsets[index] : self.offsets[index + 1]])
+            for index in range(size)
+        ]
+        ranks = [1.0 / size] * size
+        for _ in range(iterations):
+            received = [0.0] * size
+            dangling = 0.0
+            for index in range(size):
+                if out_weights[index] == 0:
+                    dangling += ranks[index]
+                    continue
+                share = ranks[index] / out_weights[index]
+                for position in range(self.offsets[index], self.offsets[index + 1]):
+                    received[self.targets[position]] += share * self.weights[position]
+            base = (1 - damping + damping * dangling) / size
+            updated = [base + damping * value for value in received]
+            delta = sum(abs(new - old) for new, old in zip(updated, ranks))
+            ranks = updated
+            count("graph.pagerank_iterations")
+            if delta < tolerance:
+                break
+        return array("d", ranks)
+
+    def _pagerank_numpy(
+        self, damping: float, iterations: int, tolerance: float
+    ) -> Column:
+        size = len(self)
+        offsets = numpy.frombuffer(self.offsets, dtype=numpy.int64)
+        targets = numpy.frombuffer(self.targets, dtype=numpy.int32)
+        weights = numpy.frombuffer(self.weights, dtype=numpy.int32)
+        sources = numpy.repeat(numpy.arange(size, dtype=numpy.int32), numpy.diff(offsets))
+        out_weights = numpy.bincount(sources, weights=weights, minlength=size)
+        dangling = out_weights == 0
+        # NOTE: 每条边分得来源用户得分的比例，迭代中只做一次乘法和一次 bincount
+        shares = weights / out_weights[sources]
+        ranks = numpy.full(size, 1.0 / size)
+        for _ in range(iterations):
+            received = numpy.bincount(
+                targets, weights=ranks[sources] * shares, minlength=size
+            )
+            base = (1 - damping + damping * ranks[dangling].sum()) / size
+            updated = base + damping * received
+            delta = numpy.abs(updated - ranks).sum()
+            ranks = updated
+            count("graph.pagerank_iterations")
+            if delta < tolerance:
+                break
+        return ranks
+
+    def top(self, values: Column, k: int) -> list[tuple[int, Any]]:
+        """返回 `values` 最大的 k 个用户的 (UID, 取值)，取值相同时 UID 小的在前"""
+        if numpy is not None and len(values) > k:
+            values = numpy.asarray(values)
+            # NOTE: 先用 partition 找到第 k 大的取值，只对不小于它的候选排序
+            threshold = numpy.partition(values, len(values) - k)[len(values) - k]
+            candidates = numpy.flatnonzero(values >= threshold).tolist()
+            scores = dict(zip(candidates, values[candidates].tolist()))
+        else:
+            scores = dict(enumerate(values.tolist()))
+        indices = heapq.nsmallest(
+            k, scores, key=lambda index: (-scores[index], self.uids[index])
+        )
+        return [(int(self.uids[index]), scores[index]) for index in indices]
+
+
+class ReplyGraphBuilder:
+    """
+    一次遍历 `ReplyDatabase.load_thread_rows` 的记录，同时统计每楼的评论数和回复深度，
+    并收集楼中楼回复者到被回复者的边
+
+    NOTE: 同一楼的评论相邻，只需保留当前楼内评论的深度，内存与最大的楼成正比；
+    边以两个 UID 数组暂存，建图时再转为 CSR
+    """
+
+    def __init__(self):
+        self.sources: array = array("q")
+        self.targets: array = array("q")
+        self.thread_sizes: Counter[int] = Counter()
+        self.thread_depths: Counter[int] = Counter()
+        self.reply_count: int = 0
+        self.sub_reply_count: int = 0
+        # NOTE: 被回复的评论未抓取（例如只保存了楼中楼预览）时无法确定被回复者
+        self.missing_parents: int = 0
+        self.self_replies: int = 0
+        self.interaction_count: int = 0
+        self._thread: Optional[int] = None
+        self._depths: dict[int, int] = {}
+
+    def add_rows(self, rows: Iterable[Record]) -> None:
+        for rpid, root, parent, mid, parent_mid in rows:
+            thread = rpid if root == 0 else root
+            if thread != self._thread:
+                self._finish_thread()
+                self._thread = thread
+            self.reply_count += 1
+            if root == 0:
+                self._depths[rpid] = 0
+                continue
+            self.sub_reply_count += 1
+            # NOTE: 根评论未保存时直接回复根评论的深度同样为 1
+            self._depths[rpid] = self._depths.get(parent, 0) + 1
+            if parent_mid is None:
+                self.missing_parents += 1
+            elif parent_mid == mid:
+                self.self_replies += 1
+            else:
+                self.sources.append(mid)
+                self.targets.append(parent_mid)
+
+    def _finish_thread(self) -> None:
+        if self._thread is None:
+            return
+        self.thread_sizes[len(self._depths)] += 1
+        self.thread_depths[max(self._depths.values())] += 1
+        self._depths.clear()
+        self._thread = None
+
+    def build(self) -> ReplyGraph:
+        """建图，之后释放暂存的边"""
+        self._finish_thread()
+        self.interaction_count = len(self.sources)
+        count("graph.replies", self.reply_count)
+        count("graph.interactions", self.interaction_count)
+        with timer("graph.build"):
+            if numpy is not None:
+                graph = self._build_numpy()
+            else:
+                graph = self._build_python()
+        self.sources, self.targets = array("q"), array("q")
+        return graph
+
+    def _build_numpy(self) -> ReplyGraph:
+        sources = numpy.frombuffer(self.sources, dtype=numpy.int64)
+        targets = numpy.frombuffer(self.targets, dtype=numpy.int64)
+        uids = numpy.unique(
+            numpy.concatenate((numpy.unique(sources), numpy.unique(targets)))
+        )
+        size = len(uids)
+        # NOTE: (来源, 目标) 编码为一个整数后原地排序，相邻相同的键合并为回复次数，
+        # 结果即按行排列的 CSR；避免 numpy.unique(return_inverse) 的多份整表副本
+        keys = numpy.searchsorted(uids, sources)
+        keys *= size
+        keys += numpy.searchsorted(uids, targets)
+        keys.sort()
+        starts = numpy.flatnonzero(numpy.diff(keys, prepend=-1))
+        weights = numpy.diff(starts, append=len(keys)).astype(numpy.int32)
+        keys = keys[starts]
+        offsets = numpy.zeros(size + 1, dtype=numpy.int64)
+        numpy.cumsum(numpy.bincount(keys // size, minlength=size), out=offsets[1:])
+        return ReplyGraph(uids, offsets, (keys % size).astype(numpy.int32), weights)
+
+    def _build_python(self) -> ReplyGraph:
+        uids = array("q", sorted(set(self.sources).union(self.targets)))
+        index = {uid: position for position, uid in enumerate(uids)}
+        size = len(uids)
+        # NOTE: 计数排序：先按来源统计每行的边数，再把目标填入各行的位置
+        starts = array("q", bytes(8 * (size + 1)))
+        for source in self.sources:
+            starts[index[source] + 1] += 1
+        for position in range(size):
+            starts[position + 1] += starts[position]
+        positions = array("q", starts)
+        columns = array("i", bytes(4 * len(self.sources)))
+        for source, target in zip(self.sources, self.targets):
+            row = index[source]
+            columns[positions[row]] = index[target]
+            positions[row] += 1
+
+        offsets = array("q", [0])
+        targets = array("i")
+        weights = array("i")
+        for row in range(size):
+            for target, group in groupby(sorted(columns[starts[row] : starts[row + 1]])):
+                targets.append(target)
+                weights.append(sum(1 for _ in group))
+            offsets.append(len(targets))
+        return ReplyGraph(uids, offsets, targets, weights)
+
+
+class GraphAnalyzer:
+    """评论区的回复关系分析：楼的大小和深度分布、被回复最多的用户和用户影响力"""
+
+    THREAD_SIZE_POINTS: list[int] = [2, 6, 21, 101]
+    THREAD_SIZE_NAMES: list[str] = [
+        "无回复",
+        "1-4条回复",
+        "5-19条回复",
+        "20-99条回复",
+        "100条以上回复",
+    ]
+
+    def __init__(self, batches: Iterable[Iterable[Record]], top_k: int = 10):
+        self.top_k: int = top_k
+        self.builder: ReplyGraphBuilder = ReplyGraphBuilder()
+        with timer("graph.load"):
+            for rows in batches:
+                self.builder.add_rows(rows)
+        self.graph: ReplyGraph = self.builder.build()
+        self.analysis: Optional[dict[str, Any]] = None
+
+    @classmethod
+    def thread_size_name(cls, size: int) -> str:
+        for point, name in zip(cls.THREAD_SIZE_POINTS, cls.THREAD_SIZE_NAMES):
+            if size < point:
+                return name
+        return cls.THREAD_SIZE_NAMES[-1]
+
+    def analyze_thread_sizes(self) -> Counter[str]:
+        sizes: Counter[str] = Counter()
+        for size, threads in self.builder.thread_sizes.items():
+            sizes[self.thread_size_name(size)] += threads
+        return sizes
+
+    def analyze_thread_depths(self) -> Counter[int]:
+        return Counter(self.builder.thread_depths)
+
+    def analyze_most_replied(self) -> list[tuple[int, int]]:
+        return self.graph.top(self.graph.in_weights(), self.top_k)
+
+    def analyze_influence(self) -> list[tuple[int, float]]:
+        with timer("graph.pagerank"):
+            ranks = self.graph.pagerank()
+        return self.graph.top(ranks, self.top_k)
+
+    def get_analysis(self) -> dict[str, Any]:
+        if self.analysis is not None:
+            return self.analysis
+        builder = self.builder
+        self.analysis = {
+            "reply_count": builder.reply_count,
+            "sub_reply_count": builder.sub_reply_count,
+            "thread_count": builder.thread_sizes.total(),
+            "member_count": len(self.graph),
+            "edge_count": self.graph.edge_count,
+            "interaction_count": builder.interaction_count,
+            "missing_parents": builder.missing_parents,
+            "self_replies": builder.self_replies,
+            "thread_sizes": self.analyze_thread_sizes(),
+            "thread_depths": self.analyze_thread_depths(),
+            "most_replied": self.analyze_most_replied(),
+            "influence": self.analyze_influence(),
+        }
+        return self.analysis
+
+    def save_analysis(self, filepath: str) -> None:
+        if self.analysis is None:
+            return
+        os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.analysis, f, ensure_ascii=False, indent=4)
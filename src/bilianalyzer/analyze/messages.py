@@ -0,0 +1,225 @@
+import heapq
+import math
+import re
+from dataclasses import dataclass, field
+from typing import Optional, Protocol
+from collections import Counter
+from collections.abc import Collection, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+
+from .. import Reply
+
+# NOTE: [doge] [笑哭] 之类的表情文本，以及 Unicode emoji
+EMOTE_PATTERN = re.compile(r"\[[^\[\]\s]{1,16}\]")
+EMOJI_PATTERN = re.compile("[\U0001f300-\U0001faff\u2600-\u27bf]")
+TOKEN_PATTERN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff]+|[A-Za-z0-9_]+")
+CJK_PATTERN = re.compile("[\u3400-\u4dbf\u4e00-\u9fff]")
+
+MAX_TERMS = 100000
+CHUNK_SIZE = 5000
+
+
+class Segmenter(Protocol):
+    def __call__(self, text: str) -> Iterable[str]: ...
+
+
+class NGramSegmenter:
+    """中文按字符 n-gram 切分，英文/数字按单词切分并转小写"""
+
+    def __init__(self, sizes: Collection[int] = (2,)):
+        if not sizes or min(sizes) <= 0:
+            raise ValueError("Invalid n-gram sizes: must be positive")
+        self.sizes: tuple[int, ...] = tuple(sorted(sizes))
+
+    def __call__(self, text: str) -> Iterator[str]:
+        for match in TOKEN_PATTERN.finditer(text):
+            token = match.group()
+            if CJK_PATTERN.match(token) is None:
+                yield token.lower()
+                continue
+            if len(token) < self.sizes[0]:
+                yield token
+                continue
+            for size in self.sizes:
+                for start in range(len(token) - size + 1):
+                    yield token[start : start + size]
+
+
+class JiebaSegmenter:
+    """使用 jieba 分词，需要额外安装 jieba"""
+
+    def __init__(self):
+        try:
+            import jieba
+        except ImportError as error:
+            raise ImportError(
+                "JiebaSegmenter requires 'jieba' to be installed"
+            ) from error
+        self.jieba = jieba
+
+    def __getstate__(self) -> dict:
+        # NOTE: 模块对象无法 pickle，子进程中重新导入
+        return {}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+
+    def __call__(self, text: str) -> Iterator[str]:
+        for word in self.jieba.cut(text):
+            word = word.strip().lower()
+            if TOKEN_PATTERN.fullmatch(word) is not None:
+                yield word
+
+
+SEGMENTERS: dict[str, type] = {"ngram": NGramSegmenter, "jieba": JiebaSegmenter}
+
+
+def prune(counter: Counter[str], max_terms: int) -> None:
+    """超出上限时只保留计数最高的一半，低频词被丢弃以保证内存有界"""
+    if len(counter) <= max_terms:
+        return
+    kept = heapq.nlargest(max_terms // 2, counter.items(), key=lambda pair: pair[1])
+    counter.clear()
+    counter.update(dict(kept))
+
+
+@dataclass
+class MessageStatistics:
+    documents: int = 0
+    terms: Counter[str] = field(default_factory=Counter)
+    document_frequencies: Counter[str] = field(default_factory=Counter)
+    terms_by_oid: dict[int, Counter[str]] = field(default_factory=dict)
+    emotes: Counter[str] = field(default_factory=Counter)
+
+    def add(self, oid: int, message: str, segmenter: Segmenter, max_terms: int) -> None:
+        for emote in EMOTE_PATTERN.findall(message):
+            self.emotes[emote] += 1
+        message = EMOTE_PATTERN.sub(" ", message)
+        for emoji in EMOJI_PATTERN.findall(message):
+            self.emotes[emoji] += 1
+
+        terms = Counter(segmenter(message))
+        self.documents += 1
+        self.terms.update(terms)
+        self.document_frequencies.update(terms.keys())
+        if oid not in self.terms_by_oid:
+            self.terms_by_oid[oid] = Counter()
+        self.terms_by_oid[oid].update(terms)
+        # NOTE: 只在某个计数器超出上限时剪枝，避免每条评论都遍历所有视频的词频
+        if (
+            len(self.terms) > max_terms
+            or len(self.emotes) > max_terms
+            or len(self.terms_by_oid[oid]) > max_terms
+        ):
+            self.prune(max_terms)
+
+    def merge(self, other: "MessageStatistics", max_terms: int) -> None:
+        self.documents += other.documents
+        self.terms.update(other.terms)
+        self.document_frequencies.update(other.document_frequencies)
+        for oid, terms in other.terms_by_oid.items():
+            if oid not in self.terms_by_oid:
+                self.terms_by_oid[oid] = Counter()
+            self.terms_by_oid[oid].update(terms)
+        self.emotes.update(other.emotes)
+        self.prune(max_terms)
+
+    def prune(self, max_terms: int) -> None:
+        """
+        剪枝各计数器
+
+        NOTE: 文档频率只用于计算各视频关键词的 IDF，不单独按计数剪枝，而是保留
+        仍在任一视频词频中的词；否则在少数评论中反复出现的词会丢失文档频率，
+        得到最大的 IDF。文档频率的词总是视频词频中的词，内存同样有界
+        """
+        prune(self.terms, max_terms)
+        prune(self.emotes, max_terms)
+        for terms in self.terms_by_oid.values():
+            prune(terms, max_terms)
+        kept: set[str] = set()
+        for terms in self.terms_by_oid.values():
+            kept.update(terms.keys())
+        for term in [term for term in self.document_frequencies if term not in kept]:
+            del self.document_frequencies[term]
+
+
+def count_messages(
+    messages: Iterable[tuple[int, str]], segmenter: Segmenter, max_terms: int
+) -> MessageStatistics:
+    statistics = MessageStatistics()
+    for oid, message in messages:
+        statistics.add(oid, message, segmenter, max_terms)
+    return statistics
+
+
+class MessageAnalyzer:
+    def __init__(
+        self,
+        replies: Collection[Reply],
+        segmenter: Optional[Segmenter] = None,
+        workers: int = 1,
+        max_terms: int = MAX_TERMS,
+        chunk_size: int = CHUNK_SIZE,
+    ):
+        self.replies: Collection[Reply] = replies
+        if segmenter is None:
+            segmenter = NGramSegmenter()
+        self.segmenter: Segmenter = segmenter
+        self.workers: int = workers
+        self.max_terms: int = max_terms
+        self.chunk_size: int = chunk_size
+        self.message_statistics: Optional[MessageStatistics] = None
+
+    def _chunks(self) -> Iterator[list[tuple[int, str]]]:
+        chunk: list[tuple[int, str]] = []
+        for reply in self.replies:
+            chunk.append((reply.oid, reply.message))
+            if len(chunk) >= self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def get_message_statistics(self) -> MessageStatistics:
+        if self.message_statistics is not None:
+            return self.message_statistics
+
+        statistics = MessageStatistics()
+        if self.workers <= 1 or len(self.replies) <= self.chunk_size:
+            for chunk in self._chunks():
+                statistics.merge(
+                    count_messages(chunk, self.segmenter, self.max_terms), self.max_terms
+                )
+        else:
+            # NOTE: 分块并行统计，各进程返回已剪枝的部分结果后在主进程合并
+            with ProcessPoolExecutor(self.workers) as executor:
+                futures = [
+                    executor.submit(count_messages, chunk, self.segmenter, self.max_terms)
+                    for chunk in self._chunks()
+                ]
+                for future in futures:
+                    statistics.merge(future.result(), self.max_terms)
+
+        self.message_statistics = statistics
+        return statistics
+
+    def analyze_terms(self, top: int = 100) -> Counter[str]:
+        return Counter(dict(self.get_message_statistics().terms.most_common(top)))
+
+    def analyze_emotes(self) -> Counter[str]:
+        return Counter(self.get_message_statistics().emotes)
+
+    def analyze_keywords(self, top: int = 20) -> dict[int, list[tuple[str, float]]]:
+        """每个视频的 TF-IDF 关键词，以单条评论为文档计算 IDF"""
+        statistics = self.get_message_statistics()
+        keywords: dict[int, list[tuple[str, float]]] = {}
+        for oid, terms in statistics.terms_by_oid.items():
+            total = sum(terms.values())
+            scores: dict[str, float] = {}
+            for term, count in terms.items():
+                # NOTE: 平滑 IDF，避免出现在所有评论中的词得到负分
+                frequency = statistics.document_frequencies.get(term, 0)
+                idf = math.log((1 + statistics.documents) / (1 + frequency)) + 1
+                scores[term] = round(count / total * idf, 6)
+            keywords[oid] = heapq.nlargest(top, scores.items(), key=lambda pair: pair[1])
+        return keywords
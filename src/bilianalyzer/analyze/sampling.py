@@ -0,0 +1,52 @@
+import math
+from statistics import NormalDist
+from typing import Hashable, TypeVar
+from collections import Counter
+
+T = TypeVar("T", bound=Hashable)
+
+Interval = tuple[float, float, float]
+
+
+def z_score(confidence: float) -> float:
+    """双侧置信水平对应的标准正态分位数，例如 0.95 对应 1.96"""
+    if not 0 < confidence < 1:
+        raise ValueError("Invalid confidence: must be between 0 and 1")
+    return NormalDist().inv_cdf(0.5 + confidence / 2)
+
+
+def wilson_interval(successes: int, total: int, z: float) -> tuple[float, float]:
+    """
+    比例的 Wilson 得分区间
+
+    NOTE: 比例接近 0 或 1（例如小众的 IP 属地）时正态近似的区间会越出 [0, 1]，
+    Wilson 区间在样本较小时覆盖率也更接近名义水平
+    """
+    if total == 0:
+        return 0.0, 1.0
+    proportion = successes / total
+    denominator = 1 + z * z / total
+    center = (proportion + z * z / (2 * total)) / denominator
+    margin = (
+        z
+        * math.sqrt(proportion * (1 - proportion) / total + z * z / (4 * total * total))
+        / denominator
+    )
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+def proportion_intervals(
+    counts: Counter[T], confidence: float = 0.95
+) -> dict[T, Interval]:
+    """
+    由抽样得到的分布估计总体中各取值的占比，返回 {取值: (占比, 下限, 上限)}，按出现次数降序
+
+    NOTE: 将样本中的每条评论/每个用户视为独立抽取；按页抽样时同页评论发布时间相近，
+    分层抽样使各时段都有样本，区间仍可能略窄于整群抽样的真实误差
+    """
+    total = counts.total()
+    z = z_score(confidence)
+    return {
+        value: (count / total, *wilson_interval(count, total, z))
+        for value, count in counts.most_common()
+    }
@@ -0,0 +1,184 @@
+import hashlib
+import heapq
+import math
+import zlib
+from typing import Generic, Hashable, Optional, TypeVar
+from collections import Counter
+from collections.abc import Iterable
+
+T = TypeVar("T", bound=Hashable)
+
+
+class SpaceSaving(Generic[T]):
+    """
+    Space-Saving 高频项草图（Metwally et al.）
+
+    最多同时跟踪 `capacity` 个元素，内存有界
+    每个计数最多高估 `errors[item]`，且不超过 `total / capacity`
+    """
+
+    def __init__(self, capacity: int = 100):
+        if capacity <= 0:
+            raise ValueError("Invalid capacity: must be positive")
+        self.capacity: int = capacity
+        self.total: int = 0
+        self.counts: dict[T, int] = {}
+        self.errors: dict[T, int] = {}
+        # NOTE: 小根堆带惰性删除，过期条目的计数与 counts 不一致
+        self._heap: list[tuple[int, int, T]] = []
+        self._sequence: int = 0
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def __contains__(self, item: object) -> bool:
+        return item in self.counts
+
+    def _push(self, item: T) -> None:
+        self._sequence += 1
+        heapq.heappush(self._heap, (self.counts[item], self._sequence, item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self) -> None:
+        self._heap = [(count, 0, item) for item, count in self.counts.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_min(self) -> tuple[T, int]:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            if self.counts.get(item) == count:
+                return item, count
+
+    def update(self, item: T, count: int = 1) -> None:
+        self.total += count
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            victim, min_count = self._pop_min()
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[item] = min_count + count
+            self.errors[item] = min_count
+        self._push(item)
+
+    def update_many(self, items: Iterable[T]) -> None:
+        for item in items:
+            self.update(item)
+
+    def min_count(self) -> int:
+        if len(self.counts) < self.capacity:
+            return 0
+        return min(self.counts.values())
+
+    def merge(self, other: "SpaceSaving[T]") -> "SpaceSaving[T]":
+        """合并两个草图（Agarwal et al. mergeable summaries），返回新草图"""
+        merged: SpaceSaving[T] = SpaceSaving(max(self.capacity, other.capacity))
+        self_min, other_min = self.min_count(), other.min_count()
+        counts: dict[T, int] = {}
+        errors: dict[T, int] = {}
+        for item in self.counts.keys() | other.counts.keys():
+            counts[item] = self.counts.get(item, self_min) + other.counts.get(
+                item, other_min
+            )
+            errors[item] = self.errors.get(item, self_min) + other.errors.get(
+                item, other_min
+            )
+        kept = heapq.nlargest(merged.capacity, counts, key=counts.__getitem__)
+        merged.counts = {item: counts[item] for item in kept}
+        merged.errors = {item: errors[item] for item in kept}
+        merged.total = self.total + other.total
+        merged._rebuild_heap()
+        return merged
+
+    def estimate(self, item: T) -> int:
+        """估计值（上界），未跟踪的元素返回可能的最大计数"""
+        return self.counts.get(item, self.min_count())
+
+    def guaranteed(self, item: T) -> int:
+        """保证下界"""
+        if item not in self.counts:
+            return 0
+        return self.counts[item] - self.errors[item]
+
+    def error_bound(self) -> int:
+        """任意元素计数的最大高估量"""
+        return self.total // self.capacity
+
+    def most_common(self, n: Optional[int] = None) -> list[tuple[T, int]]:
+        if n is None:
+            return sorted(self.counts.items(), key=lambda pair: pair[1], reverse=True)
+        return heapq.nlargest(n, self.counts.items(), key=lambda pair: pair[1])
+
+    def to_counter(self) -> Counter[T]:
+        return Counter(self.counts)
+
+
+class HyperLogLog:
+    """
+    HyperLogLog 基数估计草图（Flajolet et al.）
+
+    `2 ** precision` 个寄存器，标准误差约为 `1.04 / sqrt(2 ** precision)`
+    精度相同的草图取寄存器最大值即可合并，重复添加同一元素不改变结果
+    """
+
+    def __init__(self, precision: int = 14):
+        if not 4 <= precision <= 18:
+            raise ValueError("Invalid precision: must be between 4 and 18")
+        self.precision: int = precision
+        self.registers: bytearray = bytearray(1 << precision)
+
+    def __len__(self) -> int:
+        return round(self.estimate())
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def add(self, item: Hashable) -> None:
+        digest = hashlib.blake2b(str(item).encode("utf-8"), digest_size=8).digest()
+        value = int.from_bytes(digest, "little")
+        bits = 64 - self.precision
+        index = value >> bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, items: Iterable[Hashable]) -> None:
+        for item in items:
+            self.add(item)
+
+    def estimate(self) -> float:
+        size = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        raw = alpha * size * size / sum(2.0**-register for register in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * size and zeros != 0:
+            # NOTE: 小基数时使用线性计数修正
+            return size * math.log(size / zeros)
+        return raw
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if self.precision != other.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches of different precisions")
+        merged = HyperLogLog(self.precision)
+        merged.registers = bytearray(map(max, self.registers, other.registers))
+        return merged
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + zlib.compress(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        sketch = cls(data[0])
+        sketch.registers = bytearray(zlib.decompress(data[1:]))
+        return sketch
+
+
+def heavy_hitters(items: Iterable[T], capacity: int) -> SpaceSaving[T]:
+    sketch: SpaceSaving[T] = SpaceSaving(capacity)
+    sketch.update_many(items)
+    return sketch
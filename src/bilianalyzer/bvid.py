@@ -0,0 +1,33 @@
+"""BV 号与 AV 号互转，结果与 bilibili_api.aid2bvid/bvid2aid 一致"""
+
+XOR_CODE = 23442827791579
+MASK_CODE = 2251799813685247
+MAX_AID = 1 << 51
+BASE = 58
+ALPHABET = "FcwAPNKTMug3GV5Lj7EJnHpWsx4tb8haYeviqBz6rkCy12mUSDQX9RdoZf"
+INDEX: dict[str, int] = {char: index for index, char in enumerate(ALPHABET)}
+# NOTE: BV1 之后 9 位字符的排列顺序
+ENCODE_ORDER: tuple[int, ...] = (8, 7, 0, 5, 1, 3, 2, 4, 6)
+PREFIX = "BV1"
+
+
+def aid2bvid(aid: int) -> str:
+    if not 0 < aid < MAX_AID:
+        raise ValueError(f"AID out of range: {aid}")
+    chars: list[str] = [""] * len(ENCODE_ORDER)
+    value = (MAX_AID | aid) ^ XOR_CODE
+    for position in ENCODE_ORDER:
+        chars[position] = ALPHABET[value % BASE]
+        value //= BASE
+    return PREFIX + "".join(chars)
+
+
+def bvid2aid(bvid: str) -> int:
+    if len(bvid) != len(PREFIX) + len(ENCODE_ORDER) or bvid[:3].upper() != PREFIX:
+        raise ValueError(f"Invalid BVID: {bvid}")
+    value = 0
+    for position in reversed(ENCODE_ORDER):
+        if bvid[3 + position] not in INDEX:
+            raise ValueError(f"Invalid BVID: {bvid}")
+        value = value * BASE + INDEX[bvid[3 + position]]
+    return (value & MASK_CODE) ^ XOR_CODE
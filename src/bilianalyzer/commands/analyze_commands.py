@@ -1,9 +1,18 @@
 import click
-from bilibili_api import bvid2aid
-from bilibili_api.comment import CommentResourceType
+from typing import Optional
+from .. import CommentResourceType
+from ..bvid import bvid2aid
 from ..analyze.comments import CommentAnalyzer
-from ..database import ReplyDatabase, MemberDatabase, VideoDatabase
+from ..analyze.messages import SEGMENTERS
+from ..database import (
+    ReplyDatabase,
+    MemberDatabase,
+    VideoDatabase,
+    SketchDatabase,
+    SampleDatabase,
+)
 from ..parse import ReplyParser, MemberParser, VideoParser
+from ..shards import ShardRouter
 
 
 # TODO: add type hint for command
@@ -15,17 +24,90 @@ from ..parse import ReplyParser, MemberParser, VideoParser
     default=None,
     help="Output filepath for Analysis",
 )
+@click.option(
+    "-k",
+    "--top-k",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Track only the top K pendants/cardbags/locations with bounded memory",
+)
+@click.option(
+    "--exact",
+    is_flag=True,
+    help="Count distinct members exactly instead of using stored HyperLogLog sketches "
+    "(all comments and members are loaded either way)",
+)
+@click.option(
+    "--segmenter",
+    type=click.Choice(list(SEGMENTERS)),
+    default="ngram",
+    help="Segmenter used to tokenize comment messages (default: ngram)",
+)
+@click.option(
+    "-j",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes used to tokenize comment messages (default: 1)",
+)
+@click.option(
+    "--snapshot",
+    "snapshot_path",
+    type=click.Path(exists=True, file_okay=False),
+    default=None,
+    help="Analyze from a columnar snapshot directory instead of the database",
+)
+@click.option(
+    "--confidence",
+    type=click.FloatRange(min=0, max=1, min_open=True, max_open=True),
+    default=None,
+    help="Report confidence intervals of member shares at this level, e.g. 0.95, "
+    "analyzing only the comments of the latest 'fetch --sample'",
+)
 @click.command(help="Analyze comments from video with given BVID")
-def analyze(bvid, output):
+def analyze(bvid, output, top_k, exact, segmenter, workers, snapshot_path, confidence):
     """Analyze comments from video with given BVID"""
 
+    try:
+        segmenter = SEGMENTERS[segmenter]()
+    except ImportError as error:
+        raise click.UsageError(str(error))
+
+    if snapshot_path is not None and confidence is not None:
+        # NOTE: 快照不记录哪些评论属于抽样，全部评论被当作抽样会得到错误的区间
+        raise click.UsageError("Option '--confidence' cannot be used with '--snapshot'.")
+
+    if snapshot_path is not None:
+        # NOTE: 快照分析会导入 numpy，只在需要时导入
+        from ..analyze.columns import ColumnarAnalyzer
+        from ..snapshot import Snapshot
+
+        try:
+            analyzer = ColumnarAnalyzer(
+                Snapshot(snapshot_path),
+                bvid2aid(bvid),
+                CommentResourceType.VIDEO,
+                sketch_capacity=top_k,
+                segmenter=segmenter,
+                workers=workers,
+                confidence=confidence,
+            )
+        except ValueError as error:
+            print(f"Cannot analyze BVID {bvid} from snapshot: {error}")
+            return
+        report(analyzer, output)
+        return
+
     video_parser = VideoParser()
     member_parser = MemberParser()
     reply_parser = ReplyParser(member_parser)
 
-    video_db = VideoDatabase("bilianalyzer.db", video_parser)
-    member_db = MemberDatabase("bilianalyzer.db", member_parser)
-    reply_db = ReplyDatabase("bilianalyzer.db", member_db, reply_parser)
+    dbpath = ShardRouter().path_for_bvid(bvid)
+    video_db = VideoDatabase(dbpath, video_parser)
+    member_db = MemberDatabase(dbpath, member_parser)
+    # NOTE: 用户和楼中楼在分析访问时按批加载，不逐条递归查询
+    reply_db = ReplyDatabase(dbpath, member_db, reply_parser, lazy=True)
+    sketch_db = SketchDatabase(dbpath)
 
     video = video_db.load_video_by_bvid(bvid)
     if video is None:
@@ -33,9 +115,49 @@ def analyze(bvid, output):
         print(f"Please run 'uv run -m bilianalyzer fetch {bvid}' first")
         return
 
-    replies = reply_db.load_replies_by_resource(bvid2aid(bvid), CommentResourceType.VIDEO)
-    members = list(member_parser.unroll_members(replies))
-    analyzer = CommentAnalyzer(video, members, replies)
+    if confidence is None:
+        replies = reply_db.load_replies_by_resource(
+            bvid2aid(bvid), CommentResourceType.VIDEO
+        )
+    else:
+        # NOTE: 只统计最近一次抽样抽中的根评论，之前完整抓取留下的评论和楼中楼不参与估计
+        rpids = SampleDatabase(dbpath).load_sample(
+            bvid2aid(bvid), CommentResourceType.VIDEO
+        )
+        if not rpids:
+            print(f"No sampled comments found for BVID {bvid}.")
+            print(f"Please run 'uv run -m bilianalyzer fetch {bvid} --sample 50' first")
+            return
+        replies = list(reply_db.load_replies_by_rpids(rpids).values())
+    if confidence is None:
+        members = list(member_parser.unroll_members(replies))
+    else:
+        members = list(
+            {
+                reply.member.uid: reply.member
+                for reply in replies
+                if reply.member is not None
+            }.values()
+        )
+    member_sketch = None
+    if not exact and confidence is None:
+        member_sketch = sketch_db.load_sketch(
+            "members", bvid2aid(bvid), CommentResourceType.VIDEO
+        )
+    analyzer = CommentAnalyzer(
+        video,
+        members,
+        replies,
+        sketch_capacity=top_k,
+        member_sketch=member_sketch,
+        segmenter=segmenter,
+        workers=workers,
+        confidence=confidence,
+    )
+    report(analyzer, output)
+
+
+def report(analyzer: CommentAnalyzer, output: Optional[str]) -> None:
     analysis = analyzer.get_analysis()
 
     print("=" * 40)
@@ -83,6 +205,41 @@ def analyze(bvid, output):
 
     print_dist("评论IP属地分布", analysis["locations"], "次")
     print_dist("评论发布时间分布", analysis["comment_intervals"], "次")
+    print_dist("评论高频词", analysis["terms"], "次", top=10)
+    print_dist("评论表情分布", analysis["emotes"], "次")
+
+    print("评论关键词（TF-IDF）:")
+    keywords = [term for terms in analysis["keywords"].values() for term, _ in terms]
+    print("  " + " / ".join(keywords[:10]) if keywords else "无数据")
+    print()
+
+    print("疑似刷屏评论:")
+    if len(analysis["duplicates"]) == 0:
+        print("无数据")
+    for group in analysis["duplicates"][:5]:
+        message = group["message"].replace("\n", " ")[:40]
+        print(f"  {message}: {group['reply_count']} 条 / {group['member_count']} 人")
+    print()
+    print_dist("刷屏用户等级分布", analysis["duplicate_levels"], "个")
+    print_dist("刷屏用户UID位数分布", analysis["duplicate_uid_lengths"], "个")
+
+    if "intervals" in analysis:
+        print(f"抽样估计（{analyzer.confidence:.0%}置信区间）:")
+        titles = {
+            "levels": "用户等级",
+            "vips": "用户大会员",
+            "sexes": "用户性别",
+            "locations": "评论IP属地",
+        }
+        for name, title in titles.items():
+            intervals = list(analysis["intervals"][name].items())
+            print(f"  {title}:{'' if intervals else ' 无数据'}")
+            for k, (share, low, high) in intervals[:5]:
+                print(f"    {k}: {share:.1%} ({low:.1%}-{high:.1%})")
+        print()
+
+    if "sketch_errors" in analysis:
+        print_dist("近似统计误差上限", analysis["sketch_errors"], "次")
 
     print("=" * 40)
 
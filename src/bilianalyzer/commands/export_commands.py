@@ -0,0 +1,83 @@
+import click
+from .. import CommentResourceType
+from ..bvid import bvid2aid
+from ..database import ReplyDatabase, MemberDatabase
+from ..export import EXPORTERS, export_filename, export_replies
+from ..shards import ShardRouter
+
+
+@click.argument("bvid", type=str, required=False)
+@click.option(
+    "-a",
+    "--all",
+    "export_all",
+    is_flag=True,
+    help="Export comments of all stored videos",
+)
+@click.option(
+    "-f",
+    "--format",
+    "file_format",
+    type=click.Choice(list(EXPORTERS)),
+    default="csv",
+    help="Output format, parquet/arrow require pyarrow (default: csv)",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=str,
+    default=None,
+    help="Output filepath, or output directory with '--split'",
+)
+@click.option(
+    "-z",
+    "--gzip",
+    "compress",
+    is_flag=True,
+    help="Compress output (gzip for csv/jsonl/parquet, zstd for arrow)",
+)
+@click.option(
+    "-s",
+    "--split",
+    is_flag=True,
+    help="Write one file per video into the output directory",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=1000,
+    help="Number of rows read from the database per batch (default: 1000)",
+)
+@click.command(help="Export comments of video with given BVID")
+def export(bvid, export_all, file_format, output, compress, split, batch_size):
+    """Export comments of video with given BVID"""
+
+    if bvid is None and not export_all:
+        raise click.UsageError("Either BVID or '--all' must be given.")
+    if bvid is not None and export_all:
+        raise click.UsageError("BVID and '--all' are mutually exclusive.")
+
+    name = bvid if bvid is not None else "replies"
+    if output is None:
+        output = "export" if split else export_filename(name, file_format, compress)
+
+    router = ShardRouter()
+    if bvid is not None:
+        dbpath = router.path_for_bvid(bvid)
+        reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+        batches = reply_db.load_reply_rows(
+            bvid2aid(bvid), CommentResourceType.VIDEO, batch_size=batch_size
+        )
+    else:
+        batches = router.load_reply_rows(batch_size=batch_size)
+
+    try:
+        counts = export_replies(batches, output, file_format, compress, split)
+    except ImportError as error:
+        raise click.UsageError(str(error))
+
+    if len(counts) == 0:
+        print("No comments found to export.")
+        return
+    for filepath, count in counts.items():
+        print(f"Exported {count} comments to {filepath}")
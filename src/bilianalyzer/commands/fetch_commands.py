@@ -1,10 +1,23 @@
 import click
 from bilibili_api import Credential, sync
+from .. import CommentResourceType
 from ..auth import load_credential
+from ..fetch.client import use_api_base
 from ..fetch.comments import ReplyFetcher
+from ..fetch.service import ServiceInfo, WriterClient
 from ..fetch.videos import VideoFetcher
-from ..database import ReplyDatabase, MemberDatabase, VideoDatabase, RawDatabase
+from ..bvid import bvid2aid
+from ..database import (
+    ReplyDatabase,
+    MemberDatabase,
+    VideoDatabase,
+    RawDatabase,
+    SketchDatabase,
+    MetricDatabase,
+    SampleDatabase,
+)
 from ..parse import MemberParser, ReplyParser, VideoParser
+from ..shards import ShardRouter
 
 
 # TODO: add type hint for command
@@ -32,12 +45,90 @@ from ..parse import MemberParser, ReplyParser, VideoParser
     is_flag=True,
     help="Skip authentication and fetch comments without credentials",
 )
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=5,
+    help="Maximum number of pages fetched concurrently (default: 5)",
+)
+@click.option(
+    "--delay",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Average delay in seconds before fetching each page (default: 1.0)",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=3,
+    help="Retries of a page after rate limit or server errors (default: 3)",
+)
+@click.option(
+    "--api-base",
+    type=str,
+    default=None,
+    envvar="BILIANALYZER_API_BASE",
+    help="Send API requests to this base URL instead, e.g. a local mock server",
+)
+@click.option(
+    "--writer",
+    "use_writer",
+    is_flag=True,
+    help="Send raw replies and metric history to the running 'writer' process",
+)
+@click.option(
+    "--sample",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Fetch only this many random pages, ignoring --limit, and record the sampled "
+    "comments for 'analyze --confidence'",
+)
+@click.option(
+    "--stratified",
+    is_flag=True,
+    help="With '--sample', pick one page from each equal span of pages (by comment age)",
+)
+@click.option(
+    "--seed",
+    type=int,
+    default=None,
+    help="Seed of the page sample, to repeat a sample later",
+)
 @click.command(help="Fetch comments for a video with given BVID")
-def fetch(bvid, limit, raw, no_raw, no_auth):
+def fetch(
+    bvid,
+    limit,
+    raw,
+    no_raw,
+    no_auth,
+    concurrency,
+    delay,
+    retries,
+    api_base,
+    use_writer,
+    sample,
+    stratified,
+    seed,
+):
     """Fetch comments for a video with given BVID"""
 
     if raw and no_raw:
         raise click.UsageError("Options '--raw' and '--no-raw' are mutually exclusive.")
+    if stratified and sample == 0:
+        raise click.UsageError("Option '--stratified' requires '--sample'.")
+
+    if api_base is not None:
+        use_api_base(api_base)
+
+    service = None
+    if use_writer:
+        service = ServiceInfo.load()
+        if service is None:
+            raise click.UsageError(
+                "No writer process found, "
+                "start one with 'uv run -m bilianalyzer writer' first."
+            )
 
     credential: Credential = Credential()
     if not no_auth:
@@ -53,23 +144,66 @@ def fetch(bvid, limit, raw, no_raw, no_auth):
     reply_parser = ReplyParser(member_parser)
 
     # databases
-    raw_db = RawDatabase("bilianalyzer.db")
-    video_db = VideoDatabase("bilianalyzer.db", video_parser)
-    member_db = MemberDatabase("bilianalyzer.db")
-    reply_db = ReplyDatabase("bilianalyzer.db", member_db)
+    dbpath = ShardRouter().path_for_bvid(bvid)
+    raw_db = RawDatabase(dbpath)
+    video_db = VideoDatabase(dbpath, video_parser)
+    member_db = MemberDatabase(dbpath)
+    reply_db = ReplyDatabase(dbpath, member_db)
+    sketch_db = SketchDatabase(dbpath)
+    metric_db = (
+        MetricDatabase(dbpath) if service is None else WriterClient(service, dbpath)
+    )
 
     # fetchers
+    options = {
+        "concurrency": concurrency,
+        "delay": delay,
+        "retries": retries,
+        "metric_db": metric_db,
+        "service": service,
+        "sample": sample,
+        "stratified": stratified,
+        "seed": seed,
+    }
     if raw:
         video_fetcher = VideoFetcher(bvid, credential, video_parser, raw_db=raw_db)
-        reply_fetcher = ReplyFetcher(bvid, credential, reply_parser, raw_db=raw_db)
+        reply_fetcher = ReplyFetcher(
+            bvid, credential, reply_parser, raw_db=raw_db, **options
+        )
     elif no_raw:
         video_fetcher = VideoFetcher(bvid, credential, video_parser, video_db=video_db)
-        reply_fetcher = ReplyFetcher(bvid, credential, reply_parser, reply_db=reply_db)
+        reply_fetcher = ReplyFetcher(
+            bvid, credential, reply_parser, reply_db=reply_db, **options
+        )
     else:
         video_fetcher = VideoFetcher(bvid, credential, video_parser, video_db, raw_db)
-        reply_fetcher = ReplyFetcher(bvid, credential, reply_parser, reply_db, raw_db)
+        reply_fetcher = ReplyFetcher(
+            bvid, credential, reply_parser, reply_db, raw_db, **options
+        )
 
     # fetch and (if needed) store
     sync(video_fetcher.fetch_video())
-    sync(reply_fetcher.fetch_replies(limit=limit))
+    replies = sync(reply_fetcher.fetch_replies(limit=limit))
+    if sample > 0:
+        stats = reply_fetcher.stats
+        SampleDatabase(dbpath).save_sample(
+            bvid2aid(bvid),
+            CommentResourceType.VIDEO,
+            reply_fetcher.sample_rpids,
+            reply_fetcher.fetch_time,
+        )
+        print(
+            f"Sampled {stats.sampled} of {stats.page_count} pages "
+            f"({stats.sampled / max(stats.page_count, 1):.1%}), "
+            "run 'analyze --confidence 0.95' for error margins."
+        )
+    if not no_raw:
+        print(f"Raw replies: {reply_fetcher.stats.raw}.")
+    if not raw:
+        summary = member_db.save_members(
+            list(member_parser.unroll_members(replies)), reply_fetcher.fetch_time
+        )
+        sketch_db.save_replies(replies)
+        print(f"Members: {summary}.")
+    print(f"Reply metrics: {reply_fetcher.stats.history} observations recorded.")
     
\ No newline at end of file
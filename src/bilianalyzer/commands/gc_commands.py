@@ -0,0 +1,108 @@
+import time
+
+import click
+from ..database import (
+    RawDatabase,
+    compact,
+    supports_incremental_vacuum,
+    DELETE_BATCH_SIZE,
+    VACUUM_STEP_PAGES,
+)
+from ..shards import ShardRouter
+
+SECONDS_PER_DAY = 86400
+
+
+@click.option(
+    "--prune-raw-days",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Drop raw payloads of parsed replies fetched more than N days ago",
+)
+@click.option(
+    "--delete-raw-days",
+    type=click.IntRange(min=0),
+    default=None,
+    help="Delete raw replies fetched more than N days ago, parsed or not",
+)
+@click.option(
+    "--batch-size",
+    type=click.IntRange(min=1),
+    default=DELETE_BATCH_SIZE,
+    help=f"Rows deleted per transaction (default: {DELETE_BATCH_SIZE})",
+)
+@click.option(
+    "--vacuum/--no-vacuum",
+    default=True,
+    help="Reclaim free pages with incremental vacuum afterwards (default: on)",
+)
+@click.option(
+    "--step-pages",
+    type=click.IntRange(min=1),
+    default=VACUUM_STEP_PAGES,
+    help=f"Pages reclaimed per vacuum step (default: {VACUUM_STEP_PAGES})",
+)
+@click.option(
+    "--full",
+    is_flag=True,
+    help="Convert databases created before incremental vacuum with one full VACUUM; "
+    "this rewrites the whole file and blocks other processes until it finishes",
+)
+@click.command(help="Apply retention rules to stored data and reclaim free space")
+def gc(prune_raw_days, delete_raw_days, batch_size, vacuum, step_pages, full):
+    """Apply retention rules to stored data and reclaim free space"""
+
+    now = int(time.time())
+    delete_before = None
+    if delete_raw_days is not None:
+        delete_before = now - delete_raw_days * SECONDS_PER_DAY
+    prune_before = None
+    if prune_raw_days is not None:
+        prune_before = now - prune_raw_days * SECONDS_PER_DAY
+
+    def collect(dbpath: str) -> tuple[int, int, int, int, bool]:
+        """
+        清理一个数据库文件，返回删除、丢弃原始数据的行数，回收的页数、字节数，
+        以及是否因未启用增量模式而跳过了回收
+        """
+        raw_db = RawDatabase(dbpath)
+        deleted = pruned = freed = page_size = 0
+        skipped = (
+            vacuum and not full and not supports_incremental_vacuum(raw_db.connection)
+        )
+        if delete_before is not None:
+            deleted = raw_db.delete_replies_by_fetch_timestamp(delete_before, batch_size)
+        if prune_before is not None:
+            pruned = raw_db.prune_parsed_raw_replies(prune_before, batch_size)
+        if vacuum:
+            (page_size,) = raw_db.connection.execute("PRAGMA page_size").fetchone()
+            freed = compact(raw_db.connection, step_pages, full=full)
+        raw_db.connection.close()
+        return deleted, pruned, freed, freed * page_size, skipped
+
+    # NOTE: 分片布局下各分片互不影响，并行清理
+    results = ShardRouter().map(collect)
+
+    if delete_raw_days is not None:
+        deleted = sum(result[0] for result in results)
+        print(
+            f"Deleted {deleted} raw replies fetched more than {delete_raw_days} days ago."
+        )
+
+    if prune_raw_days is not None:
+        pruned = sum(result[1] for result in results)
+        print(
+            f"Dropped raw payloads of {pruned} parsed replies "
+            f"fetched more than {prune_raw_days} days ago."
+        )
+
+    if vacuum:
+        freed = sum(result[2] for result in results)
+        freed_bytes = sum(result[3] for result in results)
+        print(f"Reclaimed {freed} pages ({freed_bytes / 1024 / 1024:.1f} MiB).")
+        skipped = sum(result[4] for result in results)
+        if skipped:
+            print(
+                f"Skipped {skipped} database files created before incremental vacuum, "
+                "run 'gc --full' once to convert them (blocks other processes meanwhile)."
+            )
@@ -0,0 +1,110 @@
+import click
+from typing import Optional
+from collections.abc import Iterator
+from .. import CommentResourceType
+from ..analyze.graph import GraphAnalyzer
+from ..bvid import bvid2aid
+from ..database import MemberDatabase, ReplyDatabase
+from ..parse import Record
+from ..shards import ShardRouter
+
+
+@click.argument("bvid", type=str, required=False)
+@click.option(
+    "-k",
+    "--top-k",
+    type=click.IntRange(min=1),
+    default=10,
+    help="Number of most replied and most influential members to show (default: 10)",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=str,
+    default=None,
+    help="Output filepath for Analysis",
+)
+@click.command(help="Analyze who replies to whom, for one video or all stored comments")
+def graph(bvid, top_k, output):
+    """Analyze who replies to whom, for one video or all stored comments"""
+
+    router = ShardRouter()
+    paths = [router.path_for_bvid(bvid)] if bvid is not None else router.paths()
+
+    def load_rows() -> Iterator[list[Record]]:
+        # NOTE: 同一视频的评论在同一分片内，楼不会跨分片，逐个分片顺序读取即可
+        for dbpath in paths:
+            reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+            if bvid is None:
+                yield from reply_db.load_thread_rows()
+            else:
+                yield from reply_db.load_thread_rows(
+                    bvid2aid(bvid), CommentResourceType.VIDEO
+                )
+
+    analyzer = GraphAnalyzer(load_rows(), top_k)
+    analysis = analyzer.get_analysis()
+    if analysis["reply_count"] == 0:
+        print(f"No comments found{f' for BVID {bvid}' if bvid is not None else ''}.")
+        return
+
+    member_dbs = [MemberDatabase(dbpath) for dbpath in paths]
+
+    def member_name(uid: int) -> str:
+        for member_db in member_dbs:
+            member = member_db.load_member_by_uid(uid)
+            if member is not None:
+                return member.name
+        return "未知用户"
+
+    def print_dist(title, dist, unit="个", top=10, key=None):
+        print(f"{title}:")
+        items = sorted(dist.items(), key=key) if key is not None else dist.most_common()
+        if len(items) == 0:
+            print("无数据")
+        for k, v in items[:top]:
+            print(f"  {k}: {v} {unit}")
+        if len(items) > top:
+            print("  ...")
+        print()
+
+    def print_members(title, members, format_value):
+        print(f"{title}:")
+        if len(members) == 0:
+            print("无数据")
+        for index, (uid, value) in enumerate(members, start=1):
+            print(f"  {index}. {member_name(uid)} (mid {uid}): {format_value(value)}")
+        print()
+
+    print("=" * 40)
+    print("BiliAnalyzer 评论互动分析报告")
+    print("=" * 40)
+    print()
+    print("范围:", f"视频 {bvid}" if bvid is not None else "全部评论")
+    print("评论总数:", analysis["reply_count"])
+    print("楼数:", analysis["thread_count"])
+    print("楼中楼回复数:", analysis["sub_reply_count"])
+    print("互动用户数:", analysis["member_count"])
+    print(f"互动关系数: {analysis['edge_count']} 对 / {analysis['interaction_count']} 次")
+    if analysis["missing_parents"] > 0:
+        print("被回复评论未抓取的回复数:", analysis["missing_parents"])
+    print()
+
+    order = {name: index for index, name in enumerate(GraphAnalyzer.THREAD_SIZE_NAMES)}
+    print_dist(
+        "楼大小分布", analysis["thread_sizes"], "楼", key=lambda item: order[item[0]]
+    )
+    print_dist(
+        "楼回复深度分布", analysis["thread_depths"], "楼", key=lambda item: item[0]
+    )
+    print_members(
+        "被回复最多的用户", analysis["most_replied"], lambda value: f"{value} 次"
+    )
+    print_members(
+        "互动影响力（PageRank）", analysis["influence"], lambda value: f"{value:.6f}"
+    )
+    print("=" * 40)
+
+    if output is not None:
+        analyzer.save_analysis(output)
+        print(f"分析结果已保存至{output}")
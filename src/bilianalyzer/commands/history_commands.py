@@ -0,0 +1,68 @@
+import click
+from datetime import datetime
+from typing import Optional
+from .. import CommentResourceType
+from ..bvid import bvid2aid
+from ..database import MetricDatabase
+from ..shards import ShardRouter
+
+
+@click.argument("bvid", type=str)
+@click.option(
+    "--rpid",
+    type=int,
+    default=None,
+    help="Show history of a single comment instead of the whole video",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only show observations fetched at or after this time",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Only show observations fetched before this time",
+)
+@click.command(help="Show how likes and reply counts of comments grew between fetches")
+def history(bvid, rpid, since, until):
+    """Show how likes and reply counts of comments grew between fetches"""
+
+    metric_db = MetricDatabase(ShardRouter().path_for_bvid(bvid))
+    start = int(since.timestamp()) if since is not None else None
+    end = int(until.timestamp()) if until is not None else None
+    if rpid is not None:
+        # NOTE: 按 RPID 查询时不受 BVID 限制，需确认评论属于给定视频
+        resource = metric_db.load_reply_resource(rpid)
+        if resource is not None and resource != (
+            bvid2aid(bvid),
+            CommentResourceType.VIDEO,
+        ):
+            raise click.BadParameter(
+                f"Comment {rpid} does not belong to video {bvid}", param_hint="'--rpid'"
+            )
+        records = metric_db.load_reply_history(rpid, start, end)
+    else:
+        records = metric_db.load_resource_history(
+            bvid2aid(bvid), CommentResourceType.VIDEO, start, end
+        )
+
+    if not records:
+        click.echo(f"No metric history found for {bvid if rpid is None else rpid}.")
+        click.echo("Fetch the video again later to record how its comments change.")
+        return
+
+    click.echo(
+        f"{'fetch time':19} {'likes':>10} {'+likes':>8} {'replies':>10} {'+replies':>8}"
+    )
+    previous: Optional[tuple[int, int]] = None
+    for fetch_time, likes, rcount in records:
+        time_text = datetime.fromtimestamp(fetch_time).strftime("%Y-%m-%d %H:%M:%S")
+        like_delta = "-" if previous is None else f"{likes - previous[0]:+}"
+        rcount_delta = "-" if previous is None else f"{rcount - previous[1]:+}"
+        click.echo(
+            f"{time_text:19} {likes:>10} {like_delta:>8} {rcount:>10} {rcount_delta:>8}"
+        )
+        previous = (likes, rcount)
@@ -0,0 +1,184 @@
+import click
+from datetime import datetime
+from typing import Optional
+from .. import CommentResourceType, Reply
+from ..bvid import bvid2aid
+from ..shards import ShardRouter
+
+
+def format_time(timestamp: int) -> str:
+    return datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def print_reply(reply: Reply, prefix: str = "") -> None:
+    # NOTE: 用户在首次访问时按页批量加载，未保存用户信息时只显示 MID
+    name = reply.member.name if reply.member is not None else "Unknown"
+    location = reply.location or "Unknown"
+    click.echo(
+        f"{prefix}[{reply.rpid}] {format_time(reply.ctime)} {location} "
+        f"{name} (mid {reply.mid})"
+    )
+    click.echo(f"{' ' * len(prefix)}   {reply.message}")
+
+
+def parse_bvid(ctx, param, value: Optional[str]) -> Optional[int]:
+    if value is None:
+        return None
+    try:
+        return bvid2aid(value)
+    except ValueError as error:
+        raise click.BadParameter(str(error))
+
+
+def parse_cursor(ctx, param, value: Optional[str]) -> Optional[tuple[int, str]]:
+    """分页位置的格式为 "<时间戳>:<键>"，即上一页最后一项的排序键"""
+    if value is None:
+        return None
+    timestamp, _, key = value.partition(":")
+    if not timestamp.lstrip("-").isdigit() or not key:
+        raise click.BadParameter(f"Expected '<timestamp>:<key>', got '{value}'")
+    return int(timestamp), key
+
+
+@click.group(name="list")
+def list_group():
+    """List stored videos or comments page by page, newest first"""
+
+
+@list_group.command()
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only list videos published at or after this time",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Only list videos published before this time",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    help="Number of videos per page (default: 20)",
+)
+@click.option(
+    "--after",
+    type=str,
+    default=None,
+    callback=parse_cursor,
+    help="Continue after this position, as printed at the end of the previous page",
+)
+@click.option("--oldest", is_flag=True, help="List oldest videos first")
+def videos(since, until, limit, after, oldest):
+    """List stored videos by publish time"""
+    found = ShardRouter().query_videos(
+        start=int(since.timestamp()) if since is not None else None,
+        end=int(until.timestamp()) if until is not None else None,
+        after=after,
+        limit=limit,
+        ascending=oldest,
+    )
+
+    last = None
+    for index, video in enumerate(found, start=1):
+        last = video
+        click.echo(
+            f"{index}. {video.bvid} {format_time(video.publish_time)} {video.title}"
+        )
+    if last is None:
+        click.echo("No videos found.")
+    elif index == limit:
+        click.echo(f"Next page: --after {last.publish_time}:{last.bvid}")
+
+
+@list_group.command()
+@click.option(
+    "-b",
+    "--bvid",
+    "oid",
+    type=str,
+    default=None,
+    callback=parse_bvid,
+    help="Only list comments from video with given BVID",
+)
+@click.option(
+    "--mid",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only list comments posted by member with given MID",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only list comments posted at or after this time",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Only list comments posted before this time",
+)
+@click.option(
+    "--location",
+    type=str,
+    default=None,
+    help="Only list comments posted from this IP location, e.g. 广东",
+)
+@click.option("--roots", is_flag=True, help="Only list root comments, not replies")
+@click.option(
+    "--thread",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Only list replies under the root comment with given RPID",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    help="Number of comments per page (default: 20)",
+)
+@click.option(
+    "--after",
+    type=str,
+    default=None,
+    callback=parse_cursor,
+    help="Continue after this position, as printed at the end of the previous page",
+)
+@click.option("--oldest", is_flag=True, help="List oldest comments first")
+def comments(oid, mid, since, until, location, roots, thread, limit, after, oldest):
+    """List stored comments by post time"""
+    if after is not None:
+        if not after[1].isdigit():
+            raise click.BadParameter(
+                "Expected '<timestamp>:<rpid>'", param_hint="'--after'"
+            )
+        after = (after[0], int(after[1]))
+
+    found = ShardRouter().query_replies(
+        oid=oid,
+        otype=CommentResourceType.VIDEO if oid is not None else None,
+        mid=mid,
+        start=int(since.timestamp()) if since is not None else None,
+        end=int(until.timestamp()) if until is not None else None,
+        location=location,
+        root_only=roots,
+        root=thread,
+        after=after,
+        limit=limit,
+        ascending=oldest,
+    )
+
+    last = None
+    for index, reply in enumerate(found, start=1):
+        last = reply
+        print_reply(reply, f"{index}. ")
+    if last is None:
+        click.echo("No comments found.")
+    elif index == limit:
+        click.echo(f"Next page: --after {last.ctime}:{last.rpid}")
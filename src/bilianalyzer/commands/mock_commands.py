@@ -0,0 +1,68 @@
+import click
+from ..fetch.mock import MockApiServer, MockConfig
+from ..synthetic import SyntheticConfig
+
+
+@click.option(
+    "--host", type=str, default="127.0.0.1", help="Host to bind (default: 127.0.0.1)"
+)
+@click.option("-p", "--port", type=int, default=8000, help="Port to bind (default: 8000)")
+@click.option(
+    "--latency",
+    type=click.FloatRange(min=0),
+    default=0.05,
+    help="Base latency of each response in seconds (default: 0.05)",
+)
+@click.option(
+    "--jitter",
+    type=click.FloatRange(min=0),
+    default=0.02,
+    help="Maximum random latency added to each response in seconds (default: 0.02)",
+)
+@click.option(
+    "--rate-limit",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Requests per second before responding 412, 0 for unlimited (default: 0)",
+)
+@click.option(
+    "--burst",
+    type=click.IntRange(min=1),
+    default=10,
+    help="Burst size allowed by the rate limit (default: 10)",
+)
+@click.option(
+    "--error-rate",
+    type=click.FloatRange(min=0, max=1),
+    default=0.0,
+    help="Fraction of requests answered with a 500 error (default: 0)",
+)
+@click.option(
+    "-n",
+    "--replies",
+    type=click.IntRange(min=0),
+    default=1000,
+    help="Number of root comments of every video (default: 1000)",
+)
+@click.option("--seed", type=int, default=0, help="Seed of generated data (default: 0)")
+@click.command(help="Serve a local mock of the Bilibili comment and video APIs")
+def mock(host, port, latency, jitter, rate_limit, burst, error_rate, replies, seed):
+    """Serve a local mock of the Bilibili comment and video APIs"""
+
+    config = MockConfig(latency, jitter, rate_limit, burst, error_rate, seed)
+    synthetic = SyntheticConfig(seed=seed, replies_per_video=replies)
+    server = MockApiServer(host, port, config, synthetic)
+
+    print(f"Mock API server listening on {server.url}")
+    print(f"Run 'uv run -m bilianalyzer fetch <bvid> --api-base {server.url}' to use it")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server.server_close()
+    stats = server.stats
+    print(
+        f"Served {stats.requests} requests, {stats.rate_limited} rate limited, "
+        f"{stats.errors} errors"
+    )
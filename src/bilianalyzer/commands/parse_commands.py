@@ -1,25 +1,49 @@
 import click
-from bilibili_api import bvid2aid
-from bilibili_api.comment import CommentResourceType
-from ..database import ReplyDatabase, MemberDatabase, VideoDatabase, RawDatabase
+from .. import CommentResourceType
+from ..bvid import bvid2aid
+from ..database import (
+    ReplyDatabase,
+    MemberDatabase,
+    VideoDatabase,
+    RawDatabase,
+    SketchDatabase,
+    decompress_raw,
+)
 from ..parse import ReplyParser, MemberParser, VideoParser
+from ..shards import ShardRouter
 
 
 # TODO: add type hint for command
 @click.argument("bvid", type=str)
+@click.option(
+    "-j",
+    "--workers",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of processes used to decode and parse raw replies (default: 1)",
+)
 @click.command(help="Parse comments from video with given BVID")
-def parse(bvid):
+def parse(bvid, workers):
     """Parse comments from video with given BVID"""
 
-    raw_db = RawDatabase("bilianalyzer.db")
-    video_db = VideoDatabase("bilianalyzer.db")
-    member_db = MemberDatabase("bilianalyzer.db")
-    reply_db = ReplyDatabase("bilianalyzer.db", member_db)
+    dbpath = ShardRouter().path_for_bvid(bvid)
+    raw_db = RawDatabase(dbpath)
+    video_db = VideoDatabase(dbpath)
+    member_db = MemberDatabase(dbpath)
+    reply_db = ReplyDatabase(dbpath, member_db)
+    sketch_db = SketchDatabase(dbpath)
 
     raw_video = raw_db.load_raw_video_by_bvid(bvid)
-    raw_replies = raw_db.load_raw_reply_by_resource(
-        bvid2aid(bvid), CommentResourceType.VIDEO
-    )
+    raw_replies: list
+    if workers > 1:
+        # NOTE: 并行模式下直接读取压缩数据，解压和解码都在子进程中完成
+        raw_replies = raw_db.load_raw_reply_blobs_by_resource(
+            bvid2aid(bvid), CommentResourceType.VIDEO
+        )
+    else:
+        raw_replies = raw_db.load_raw_reply_by_resource(
+            bvid2aid(bvid), CommentResourceType.VIDEO
+        )
 
     if not raw_video and not raw_replies:
         print(f"No raw video or replies found for BVID {bvid}.")
@@ -36,11 +60,19 @@ def parse(bvid):
         print(f"Successfully parsed video {bvid} from stored raw data.")
 
     if len(raw_replies) != 0:
-        replies = list(reply_parser.batch_parse_from_api(raw_replies))
+        if workers > 1:
+            replies = reply_parser.parallel_parse_from_api(
+                raw_replies, workers, decode=decompress_raw
+            )
+        else:
+            replies = list(reply_parser.batch_parse_from_api(raw_replies))
         members = list(member_parser.unroll_members(replies))
 
-        reply_db.save_replies(replies)
-        member_db.save_members(members)
+        # NOTE: 解析结果沿用原始评论的抓取时间
+        fetch_time = raw_db.load_raw_fetch_time(bvid2aid(bvid), CommentResourceType.VIDEO)
+        reply_db.save_replies(replies, fetch_time)
+        member_db.save_members(members, fetch_time)
+        sketch_db.save_replies(replies)
 
         print(f"Successfully parsed {len(replies)} raw replies from stored raw data.")
 
@@ -0,0 +1,78 @@
+import click
+from datetime import datetime
+from collections.abc import Iterable
+from .. import CommentResourceType, Reply
+from ..bvid import bvid2aid
+from ..database import ReplyDatabase, MemberDatabase
+from ..shards import ShardRouter
+
+
+@click.argument("keyword", type=str)
+@click.option(
+    "-b",
+    "--bvid",
+    type=str,
+    default=None,
+    help="Only search comments from video with given BVID",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(),
+    default=None,
+    help="Only search comments posted at or after this time",
+)
+@click.option(
+    "--until",
+    type=click.DateTime(),
+    default=None,
+    help="Only search comments posted before this time",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=20,
+    help="Number of comments per page (default: 20)",
+)
+@click.option(
+    "-p",
+    "--page",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Page of results to show (default: 1)",
+)
+@click.command(help="Search stored comments containing given keyword")
+def search(keyword, bvid, since, until, limit, page):
+    """Search stored comments containing given keyword"""
+
+    router = ShardRouter()
+    start = int(since.timestamp()) if since is not None else None
+    end = int(until.timestamp()) if until is not None else None
+    offset = (page - 1) * limit
+
+    results: Iterable[tuple[Reply, float]]
+    if bvid is None and router.sharded:
+        results = router.search_replies(keyword, start, end, limit, offset)
+    else:
+        dbpath = router.path_for_bvid(bvid) if bvid is not None else router.dbpath
+        reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+        results = reply_db.search_replies(
+            keyword,
+            oid=bvid2aid(bvid) if bvid is not None else None,
+            otype=CommentResourceType.VIDEO if bvid is not None else None,
+            start=start,
+            end=end,
+            limit=limit,
+            offset=offset,
+        )
+
+    found = False
+    for index, (reply, _) in enumerate(results, start=offset + 1):
+        found = True
+        ctime = datetime.fromtimestamp(reply.ctime).strftime("%Y-%m-%d %H:%M:%S")
+        location = reply.location or "Unknown"
+        click.echo(f"{index}. [{reply.rpid}] {ctime} {location} (mid {reply.mid})")
+        click.echo(f"   {reply.message}")
+
+    if not found:
+        click.echo(f"No comments found for keyword '{keyword}' on page {page}.")
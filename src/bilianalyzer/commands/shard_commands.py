@@ -0,0 +1,45 @@
+import os
+
+import click
+from ..shards import (
+    DATABASE_PATH,
+    ShardLayout,
+    create_schema,
+    shards_root,
+    split_database,
+)
+
+
+@click.option(
+    "-n",
+    "--shards",
+    type=click.IntRange(min=2),
+    default=16,
+    help="Number of shard files to partition videos into (default: 16)",
+)
+@click.command(help="Partition the database into one SQLite file per shard of videos")
+def shard(shards):
+    """Partition the database into one SQLite file per shard of videos"""
+
+    root = shards_root(DATABASE_PATH)
+    existing = ShardLayout.load(root)
+    if existing is not None:
+        raise click.UsageError(
+            f"Database is already sharded into {existing.count} files under {root}."
+        )
+
+    layout = ShardLayout(root, shards)
+    if not os.path.exists(DATABASE_PATH):
+        layout.save()
+        for dbpath in layout.paths():
+            create_schema(dbpath)
+        print(f"Created {shards} empty shards under {root}.")
+        return
+
+    counts = split_database(DATABASE_PATH, layout)
+    print(
+        f"Split {sum(counts)} replies of {DATABASE_PATH} "
+        f"into {shards} shards under {root}."
+    )
+    print(f"Largest shard holds {max(counts)} replies, smallest {min(counts)}.")
+    print(f"{DATABASE_PATH} is no longer used and can be removed once verified.")
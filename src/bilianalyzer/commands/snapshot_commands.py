@@ -0,0 +1,71 @@
+import os
+import click
+from .. import CommentResourceType
+from ..bvid import aid2bvid, bvid2aid
+from ..database import ReplyDatabase, MemberDatabase, VideoDatabase
+from ..shards import ShardRouter
+from ..snapshot import SnapshotWriter
+
+
+@click.argument("bvid", type=str, required=False)
+@click.option(
+    "-a",
+    "--all",
+    "snapshot_all",
+    is_flag=True,
+    help="Snapshot comments of all stored videos into a single snapshot",
+)
+@click.option(
+    "-o",
+    "--output",
+    type=str,
+    default=None,
+    help="Output directory of the snapshot (default: snapshots/<bvid> or snapshots/all)",
+)
+@click.command(help="Write a memory-mapped columnar snapshot of stored comments")
+def snapshot(bvid, snapshot_all, output):
+    """Write a memory-mapped columnar snapshot of stored comments"""
+
+    if bvid is None and not snapshot_all:
+        raise click.UsageError("Either BVID or '--all' must be given.")
+    if bvid is not None and snapshot_all:
+        raise click.UsageError("BVID and '--all' are mutually exclusive.")
+
+    if output is None:
+        output = os.path.join("snapshots", bvid if bvid is not None else "all")
+
+    router = ShardRouter()
+    if bvid is not None:
+        resources = [(bvid2aid(bvid), CommentResourceType.VIDEO)]
+    else:
+        resources = router.load_resources()
+
+    # NOTE: 每个数据库文件只打开一次，分片布局下按资源所在分片取用
+    databases: dict[str, tuple[VideoDatabase, MemberDatabase, ReplyDatabase]] = {}
+    writer = SnapshotWriter(output)
+    for oid, otype in resources:
+        dbpath = router.path_for(oid)
+        if dbpath not in databases:
+            member_db = MemberDatabase(dbpath)
+            databases[dbpath] = (
+                VideoDatabase(dbpath),
+                member_db,
+                ReplyDatabase(dbpath, member_db),
+            )
+        video_db, member_db, reply_db = databases[dbpath]
+        video = None
+        if otype == CommentResourceType.VIDEO:
+            video = video_db.load_video_by_bvid(aid2bvid(oid))
+        writer.write_resource(
+            oid,
+            otype,
+            reply_db.load_reply_rows(oid, otype),
+            member_db.load_member_rows_by_resource(oid, otype),
+            video,
+        )
+    writer.close()
+
+    print(
+        f"Snapshot of {writer.lengths['replies']} replies and "
+        f"{writer.lengths['members']} members written to {output}"
+    )
@@ -0,0 +1,114 @@
+import click
+from bilibili_api import Credential, sync
+from ..auth import load_credential
+from ..fetch.client import use_api_base
+from ..fetch.uploader import UploaderCrawler
+from ..shards import ShardRouter
+
+
+@click.argument("mid", type=click.IntRange(min=1))
+@click.option(
+    "--comments",
+    is_flag=True,
+    help="Also fetch comments of the videos not fetched before",
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    help="With '--comments', fetch comments of all videos again",
+)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=10,
+    help="Maximum number of comment pages per video, 0 for all (default: 10)",
+)
+@click.option(
+    "--pages",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Maximum number of video list pages, 0 for all (default: 0)",
+)
+@click.option(
+    "-j",
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=2,
+    help="Number of videos fetched concurrently (default: 2)",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=5,
+    help="Maximum number of pages of one list or video fetched concurrently (default: 5)",
+)
+@click.option(
+    "--delay",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Average delay in seconds before each request (default: 1.0)",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=3,
+    help="Retries of a page after rate limit or server errors (default: 3)",
+)
+@click.option(
+    "--no-auth",
+    is_flag=True,
+    help="Skip authentication and fetch without credentials",
+)
+@click.option(
+    "--api-base",
+    type=str,
+    default=None,
+    envvar="BILIANALYZER_API_BASE",
+    help="Send API requests to this base URL instead, e.g. a local mock server",
+)
+@click.command(
+    name="fetch-uploader", help="Fetch all videos of an uploader with given MID"
+)
+def fetch_uploader(
+    mid,
+    comments,
+    refresh,
+    limit,
+    pages,
+    parallel,
+    concurrency,
+    delay,
+    retries,
+    no_auth,
+    api_base,
+):
+    """Fetch all videos of an uploader with given MID"""
+
+    if refresh and not comments:
+        raise click.UsageError("Option '--refresh' requires '--comments'.")
+
+    if api_base is not None:
+        use_api_base(api_base)
+
+    credential: Credential = Credential()
+    if not no_auth:
+        try:
+            credential = load_credential()
+        except ValueError as error:
+            print(f"Authentication Failed: {error}")
+            return
+
+    crawler = UploaderCrawler(
+        ShardRouter(), credential, parallel, concurrency, delay, retries, log=click.echo
+    )
+    stats = sync(crawler.crawl(mid, comments, refresh, pages, limit))
+    summary = crawler.summary
+    if stats.cached:
+        print("Video list unchanged since the last fetch, skipped the remaining pages.")
+    print(f"Videos: {summary.videos} new saved, {stats.known} fetched before.")
+    if comments:
+        print(f"Comments: fetched for {summary.comments} videos.")
+    if summary.failed:
+        print(f"Failed: {len(summary.failed)} videos, run the command again to retry.")
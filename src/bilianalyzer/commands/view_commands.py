@@ -0,0 +1,97 @@
+import click
+from .. import CommentResourceType
+from ..bvid import aid2bvid, bvid2aid
+from ..database import MemberDatabase, ReplyDatabase, VideoDatabase
+from ..shards import ShardRouter
+from .list_commands import format_time, print_reply
+
+
+@click.argument("target", metavar="BVID|RPID", type=str)
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=0),
+    default=5,
+    help="Number of latest comments or earliest replies to show (default: 5)",
+)
+@click.command(help="View a stored video with given BVID or a comment with given RPID")
+def view(target, limit):
+    """View a stored video with given BVID or a comment with given RPID"""
+
+    router = ShardRouter()
+    if target.isdigit():
+        view_reply(router, int(target), limit)
+        return
+    try:
+        aid = bvid2aid(target)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="'BVID|RPID'")
+    view_video(router, target, aid, limit)
+
+
+def view_video(router: ShardRouter, bvid: str, aid: int, limit: int) -> None:
+    dbpath = router.path_for(aid)
+    video = VideoDatabase(dbpath).load_video_by_bvid(bvid)
+    reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath), lazy=True)
+    replies = reply_db.count_replies(aid, CommentResourceType.VIDEO)
+    if video is None and replies == 0:
+        click.echo(f"No video found for BVID {bvid}.")
+        return
+
+    click.echo(f"BVID: {bvid} (av{aid})")
+    if video is not None:
+        click.echo(f"Title: {video.title}")
+        click.echo(f"Published: {format_time(video.publish_time)}")
+        click.echo(f"Uploaded: {format_time(video.upload_time)}")
+        click.echo(f"Description: {video.description or '-'}")
+    roots = reply_db.count_replies(aid, CommentResourceType.VIDEO, root_only=True)
+    click.echo(f"Stored comments: {replies} ({roots} root comments)")
+
+    if limit == 0 or roots == 0:
+        return
+    click.echo()
+    click.echo("Latest comments:")
+    for reply in reply_db.query_replies(
+        aid, CommentResourceType.VIDEO, root_only=True, limit=limit
+    ):
+        print_reply(reply, "  ")
+    if roots > limit:
+        click.echo(f"  ... run 'list comments --bvid {bvid} --roots' for more")
+
+
+def view_reply(router: ShardRouter, rpid: int, limit: int) -> None:
+    reply = router.load_reply_by_rpid(rpid)
+    if reply is None:
+        click.echo(f"No comment found for RPID {rpid}.")
+        return
+
+    # NOTE: 评论为 LazyReply，用户和根/父评论在此处访问时才查询，不会加载整个楼
+    bvid = aid2bvid(reply.oid) if reply.otype == CommentResourceType.VIDEO else None
+    click.echo(f"Resource: {bvid or reply.oid} ({reply.otype.name})")
+    if reply.member is not None:
+        member = reply.member
+        click.echo(
+            f"Member: {member.name} (mid {member.uid}, level {member.level}, "
+            f"{member.vip or '-'})"
+        )
+    if reply.root_reply is not None:
+        click.echo("In thread of:")
+        print_reply(reply.root_reply, "  ")
+    if reply.parent_reply is not None and reply.parent != reply.root:
+        click.echo("Reply to:")
+        print_reply(reply.parent_reply, "  ")
+    click.echo("Comment:")
+    print_reply(reply, "  ")
+
+    if limit == 0 or reply.root != 0:
+        return
+    dbpath = router.path_for(reply.oid)
+    reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath), lazy=True)
+    children = list(reply_db.query_replies(root=rpid, limit=limit + 1, ascending=True))
+    if not children:
+        return
+    click.echo("Replies:")
+    for child in children[:limit]:
+        print_reply(child, "  ")
+    if len(children) > limit:
+        click.echo(f"  ... run 'list comments --thread {rpid} --oldest' for more")
@@ -0,0 +1,180 @@
+import asyncio
+import time
+from datetime import datetime
+
+import click
+from ..database import WatchDatabase
+from ..shards import ShardRouter
+
+
+@click.group()
+def watch():
+    """Keep fetching comments of tracked videos, polling busy videos more often"""
+
+
+@watch.command()
+@click.argument("bvids", type=str, nargs=-1, required=True)
+def add(bvids):
+    """Track videos with given BVIDs"""
+    added = WatchDatabase(ShardRouter().primary_path).add_videos(bvids)
+    click.echo(f"Added {added} videos, {len(bvids) - added} already tracked.")
+
+
+@watch.command()
+@click.argument("bvids", type=str, nargs=-1, required=True)
+def remove(bvids):
+    """Stop tracking videos with given BVIDs"""
+    removed = WatchDatabase(ShardRouter().primary_path).remove_videos(bvids)
+    click.echo(f"Removed {removed} videos.")
+
+
+@watch.command(name="list")
+def list_videos():
+    """List tracked videos and their schedule"""
+    records = WatchDatabase(ShardRouter().primary_path).load_watchlist()
+    if not records:
+        click.echo("No videos tracked, add some with 'watch add <bvid>'.")
+        return
+
+    now = int(time.time())
+    click.echo(f"{'bvid':12} {'last poll':19} {'next poll in':>12} {'comments/h':>10}")
+    for bvid, last_poll, next_poll, velocity, failures in records:
+        last = "-"
+        if last_poll is not None:
+            last = datetime.fromtimestamp(last_poll).strftime("%Y-%m-%d %H:%M:%S")
+        rate = "-" if velocity is None else f"{velocity * 3600:.1f}"
+        status = f" ({failures} failures)" if failures > 0 else ""
+        click.echo(
+            f"{bvid:12} {last:19} {max(next_poll - now, 0):>11}s {rate:>10}{status}"
+        )
+
+
+@watch.command()
+@click.option(
+    "-n",
+    "--limit",
+    type=click.IntRange(min=1),
+    default=10,
+    help="Maximum number of pages fetched per poll (default: 10)",
+)
+@click.option(
+    "-j",
+    "--parallel",
+    type=click.IntRange(min=1),
+    default=4,
+    help="Number of videos polled concurrently (default: 4)",
+)
+@click.option(
+    "-c",
+    "--concurrency",
+    type=click.IntRange(min=1),
+    default=5,
+    help="Maximum number of pages of one video fetched concurrently (default: 5)",
+)
+@click.option(
+    "--rate",
+    type=click.FloatRange(min=0, min_open=True),
+    default=1.0,
+    help="Global budget of API requests per second across all videos (default: 1.0)",
+)
+@click.option(
+    "--burst",
+    type=click.IntRange(min=1),
+    default=5,
+    help="Requests allowed at once before the rate applies (default: 5)",
+)
+@click.option(
+    "--min-interval",
+    type=click.IntRange(min=1),
+    default=300,
+    help="Shortest time in seconds between polls of a video (default: 300)",
+)
+@click.option(
+    "--max-interval",
+    type=click.IntRange(min=1),
+    default=86400,
+    help="Longest time in seconds between polls of a video (default: 86400)",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=3,
+    help="Retries of a page after rate limit or server errors (default: 3)",
+)
+@click.option(
+    "--once",
+    is_flag=True,
+    help="Poll videos that are due once and exit, e.g. when run from cron",
+)
+@click.option(
+    "--no-auth",
+    is_flag=True,
+    help="Skip authentication and fetch comments without credentials",
+)
+@click.option(
+    "--api-base",
+    type=str,
+    default=None,
+    envvar="BILIANALYZER_API_BASE",
+    help="Send API requests to this base URL instead, e.g. a local mock server",
+)
+def run(
+    limit,
+    parallel,
+    concurrency,
+    rate,
+    burst,
+    min_interval,
+    max_interval,
+    retries,
+    once,
+    no_auth,
+    api_base,
+):
+    """Poll tracked videos, scheduling each by its recent comment velocity"""
+    # NOTE: 抓取模块会导入 bilibili_api，只在运行调度时导入
+    from bilibili_api import Credential
+    from ..auth import load_credential
+    from ..fetch.budget import RequestBudget
+    from ..fetch.client import use_api_base
+    from ..fetch.watch import Watcher
+
+    if min_interval > max_interval:
+        raise click.UsageError("'--min-interval' must not exceed '--max-interval'.")
+
+    if api_base is not None:
+        use_api_base(api_base)
+
+    credential: Credential = Credential()
+    if not no_auth:
+        try:
+            credential = load_credential()
+        except ValueError as error:
+            print(f"Authentication Failed: {error}")
+            return
+
+    async def main() -> Watcher:
+        watcher = Watcher(
+            ShardRouter(),
+            credential,
+            RequestBudget(rate, burst),
+            parallel=parallel,
+            limit=limit,
+            concurrency=concurrency,
+            retries=retries,
+            min_interval=min_interval,
+            max_interval=max_interval,
+            log=click.echo,
+        )
+        try:
+            await watcher.run(once)
+        except asyncio.CancelledError:
+            pass
+        return watcher
+
+    try:
+        watcher = asyncio.run(main())
+    except KeyboardInterrupt:
+        click.echo("Stopped, the schedule is kept for the next run.")
+        return
+    click.echo(f"Finished {watcher.polls} polls, {watcher.failures} failed.")
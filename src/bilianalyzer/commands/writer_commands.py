@@ -0,0 +1,41 @@
+import os
+import signal
+
+import click
+from ..fetch.service import SERVICE_PATH, WriterServer
+
+
+@click.option(
+    "--host", type=str, default="127.0.0.1", help="Host to bind (default: 127.0.0.1)"
+)
+@click.option(
+    "-p", "--port", type=int, default=0, help="Port to bind (default: any free port)"
+)
+@click.command(help="Run a single writer process that concurrent fetches send data to")
+def writer(host, port):
+    """Run a single writer process that concurrent fetches send data to"""
+
+    if os.path.exists(SERVICE_PATH):
+        raise click.UsageError(
+            f"{SERVICE_PATH} exists, another writer may be running. "
+            "Remove the file if it is not."
+        )
+
+    server = WriterServer(host, port)
+    info = server.info
+    info.save()
+    print(f"Writer process listening on {info.host}:{info.port}")
+    print("Run 'uv run -m bilianalyzer fetch <bvid> --writer' to send data to it")
+    # NOTE: SIGTERM 与 Ctrl-C 一样先写完已收到的批次再退出
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(SERVICE_PATH)
+    print(
+        f"Wrote {server.batches} batches: raw replies {server.summary}, "
+        f"{server.history} metric observations."
+    )
@@ -1,19 +1,257 @@
 import sqlite3
+import hashlib
 import json
+import random
+import re
+import time
 import zlib
-from typing import Optional
-from collections.abc import Collection
-from bilibili_api.comment import CommentResourceType
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Concatenate, Optional, ParamSpec, TypeVar
+from collections.abc import Collection, Iterator
 
-from . import Member, Reply, Video
-from .parse import MemberParser, ReplyParser, VideoParser, Record, ApiRaw
+from . import CommentResourceType, Member, Reply, Video
+from .parse import LazyReply, MemberParser, ReplyParser, VideoParser, Record, ApiRaw
+from .analyze.sketches import HyperLogLog
+from .metrics import count, timed, timer
+
+P = ParamSpec("P")
+T = TypeVar("T")
+S = TypeVar("S")
+
+SKETCH_WINDOW = 86400
+FETCH_BATCH_SIZE = 1000
+DELETE_BATCH_SIZE = 1000
+VACUUM_STEP_PAGES = 1000
+# NOTE: 等待其他进程释放写锁的时间，超时后写事务回滚并退避重试
+BUSY_TIMEOUT = 30.0
+BUSY_RETRIES = 5
+BUSY_BACKOFF = 0.2
+# NOTE: "3小时前发布" 之类的相对时间每次抓取都会变化，不参与内容哈希
+VOLATILE_PATTERN = re.compile(rb'"time_desc": "[^"]*"')
+
+
+@dataclass
+class SaveSummary:
+    """一次保存中新增、内容变化和内容未变（跳过写入）的行数"""
+
+    new: int = 0
+    changed: int = 0
+    unchanged: int = 0
+
+    def merge(self, other: "SaveSummary") -> None:
+        self.new += other.new
+        self.changed += other.changed
+        self.unchanged += other.unchanged
+
+    def __str__(self) -> str:
+        return f"{self.new} new, {self.changed} changed, {self.unchanged} unchanged"
+
+
+def content_hash(data: bytes) -> int:
+    """64 位内容哈希，转换为有符号整数以便存入 SQLite INTEGER 列"""
+    digest = hashlib.blake2b(data, digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+
+def connect(dbpath: str) -> sqlite3.Connection:
+    """
+    打开数据库连接
+
+    NOTE: auto_vacuum 只对尚未建表的新数据库生效，旧数据库由 `compact` 首次转换；
+    WAL 模式下读不阻塞写，多个进程可以同时读写同一个数据库，写事务之间仍然串行
+    """
+    connection = sqlite3.connect(dbpath, timeout=BUSY_TIMEOUT)
+    connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    connection.execute("PRAGMA journal_mode = WAL")
+    # NOTE: WAL 模式下 NORMAL 不会损坏数据库，断电时最多丢失最近提交的事务
+    connection.execute("PRAGMA synchronous = NORMAL")
+    return connection
+
+
+def is_busy(error: sqlite3.OperationalError) -> bool:
+    """数据库被其他连接锁定，包括 WAL 快照过期（SQLITE_BUSY_SNAPSHOT）"""
+    return error.sqlite_errorcode & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+
+
+def retry_busy(
+    method: Callable[Concatenate[S, P], T],
+) -> Callable[Concatenate[S, P], T]:
+    """
+    写事务遇到数据库被锁时回滚并以指数退避加随机抖动重试，超过 `BUSY_RETRIES` 次后抛出
+
+    NOTE: 被装饰的方法只在最后提交一次，回滚后重新执行不会重复写入
+    """
+
+    @wraps(method)
+    def wrapper(self: S, *args: P.args, **kwargs: P.kwargs) -> T:
+        attempt = 0
+        while True:
+            try:
+                return method(self, *args, **kwargs)
+            except sqlite3.OperationalError as error:
+                if attempt >= BUSY_RETRIES or not is_busy(error):
+                    raise
+                connection: sqlite3.Connection = getattr(self, "connection")
+                connection.rollback()
+                # NOTE: 回滚撤销了本事务中新增的字典取值，清空内存中的编码缓存
+                for value in vars(self).values():
+                    if isinstance(value, StringDictionary):
+                        value.ids.clear()
+                attempt += 1
+                count("db.busy_retries")
+                time.sleep(BUSY_BACKOFF * 2 ** (attempt - 1) * random.random())
+
+    return wrapper
+
+
+def supports_incremental_vacuum(connection: sqlite3.Connection) -> bool:
+    (mode,) = connection.execute("PRAGMA auto_vacuum").fetchone()
+    return mode == 2
+
+
+def compact(
+    connection: sqlite3.Connection,
+    step_pages: int = VACUUM_STEP_PAGES,
+    pause: float = 0.0,
+    full: bool = False,
+) -> int:
+    """
+    分步回收空闲页，返回回收的页数
+
+    NOTE: 每步只释放 `step_pages` 页并立即提交，其他连接的读写只需等待一步；
+    未启用增量模式的旧数据库只有 `full` 为 True 时才执行一次完整 VACUUM 转换，
+    完整 VACUUM 重写整个文件并全程持有写锁，否则不回收任何页
+    """
+    connection.commit()
+    (before,) = connection.execute("PRAGMA freelist_count").fetchone()
+    if not supports_incremental_vacuum(connection):
+        if not full:
+            return 0
+        connection.execute("PRAGMA auto_vacuum = INCREMENTAL")
+        with timer("db.vacuum"):
+            connection.execute("VACUUM")
+        return before
+
+    remaining: int = before
+    while remaining > 0:
+        with timer("db.incremental_vacuum"):
+            connection.execute(f"PRAGMA incremental_vacuum({step_pages})").fetchall()
+            connection.commit()
+        (remaining,) = connection.execute("PRAGMA freelist_count").fetchone()
+        if pause > 0 and remaining > 0:
+            time.sleep(pause)
+    return before - remaining
+
+
+def table_columns(cursor: sqlite3.Cursor, table: str) -> set[str]:
+    """返回表的列名，表不存在时为空集合"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    return {record[1] for record in cursor.fetchall()}
+
+
+def ensure_column(
+    cursor: sqlite3.Cursor, table: str, column: str, definition: str
+) -> None:
+    """为旧版本创建的表补充新增的列"""
+    if column not in table_columns(cursor, table):
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+
+def create_resource_types(cursor: sqlite3.Cursor) -> None:
+    """OTYPE 以 CommentResourceType 的取值存储，RESOURCE_TYPES 记录对应的名称"""
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS RESOURCE_TYPES (
+            ID INTEGER PRIMARY KEY,
+            VALUE TEXT NOT NULL UNIQUE
+        )
+        """
+    )
+    cursor.executemany(
+        """
+        INSERT OR IGNORE INTO RESOURCE_TYPES (ID, VALUE)
+        VALUES (?, ?)
+        """,
+        [(otype.value, otype.name) for otype in CommentResourceType],
+    )
+
+
+class StringDictionary:
+    """
+    重复取值很少的字符串列的字典编码，查找表为 TABLE (ID, VALUE)
+
+    NOTE: 编码结果驻留在内存中，只有首次出现的取值才访问数据库；
+    未命中时先 INSERT OR IGNORE 再查询，其他连接写入的取值也能得到同一 ID
+    """
+
+    def __init__(self, cursor: sqlite3.Cursor, table: str):
+        self.cursor: sqlite3.Cursor = cursor
+        self.table: str = table
+        self.ids: dict[str, int] = {}
+        self.cursor.execute(
+            f"""
+            CREATE TABLE IF NOT EXISTS {table} (
+                ID INTEGER PRIMARY KEY,
+                VALUE TEXT NOT NULL UNIQUE
+            )
+            """
+        )
+
+    def encode(self, value: Optional[str]) -> Optional[int]:
+        if value is None:
+            return None
+        id = self.ids.get(value)
+        if id is None:
+            self.cursor.execute(
+                f"INSERT OR IGNORE INTO {self.table} (VALUE) VALUES (?)", (value,)
+            )
+            self.cursor.execute(f"SELECT ID FROM {self.table} WHERE VALUE = ?", (value,))
+            (id,) = self.cursor.fetchone()
+            self.ids[value] = id
+        return id
+
+
+def load_hashes(
+    cursor: sqlite3.Cursor, table: str, key: str, keys: Collection[Any]
+) -> dict[Any, Optional[int]]:
+    """按主键批量读取已存储行的内容哈希，旧数据没有哈希时为 None"""
+    hashes: dict[Any, Optional[int]] = {}
+    keys = list(keys)
+    for start in range(0, len(keys), FETCH_BATCH_SIZE):
+        batch = keys[start : start + FETCH_BATCH_SIZE]
+        placeholders = ", ".join("?" * len(batch))
+        cursor.execute(
+            f"SELECT {key}, HASH FROM {table} WHERE {key} IN ({placeholders})", batch
+        )
+        hashes.update(cursor.fetchall())
+    return hashes
+
+
+def encode_raw(data: ApiRaw) -> bytes:
+    with timer("db.raw.encode"):
+        return json.dumps(data).encode("utf-8")
+
+
+def compress_raw(data: ApiRaw, encoded: Optional[bytes] = None) -> bytes:
+    if encoded is None:
+        encoded = encode_raw(data)
+    with timer("db.raw.compress"):
+        raw = zlib.compress(encoded)
+    count("db.raw.bytes_written", len(raw))
+    return raw
+
+
+def decompress_raw(raw: bytes) -> ApiRaw:
+    count("db.raw.bytes_read", len(raw))
+    with timer("db.raw.decode"):
+        return ApiRaw(json.loads(zlib.decompress(raw).decode("utf-8")))
 
 
 class RawDatabase:
-    # TODO: add `fetch timestamp` field to raw tables
-    # TODO: add `delete_replies_by_fetch_timestamp` method
     def __init__(self, dbpath: str):
-        self.connection = sqlite3.connect(dbpath)
+        self.dbpath: str = dbpath
+        self.connection = connect(dbpath)
         self.cursor = self.connection.cursor()
         self.cursor.execute(
             """
@@ -22,43 +260,108 @@ class RawDatabase:
                 OID INTEGER NOT NULL,
                 OTYPE TEXT NOT NULL,
                 MID INTEGER,
-                RAW BLOB
+                RAW BLOB,
+                HASH INTEGER,
+                FETCH_TIME INTEGER
             )
             """
         )
+        ensure_column(self.cursor, "RAW_REPLIES", "HASH", "INTEGER")
+        ensure_column(self.cursor, "RAW_REPLIES", "FETCH_TIME", "INTEGER")
+        self.cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS RAW_REPLIES_FETCH_TIME ON RAW_REPLIES (FETCH_TIME)
+            """
+        )
 
         self.cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS RAW_VIDEOS (
                 BVID TEXT PRIMARY KEY,
                 MID INTEGER,
-                RAW BLOB
+                RAW BLOB,
+                FETCH_TIME INTEGER
             )
             """
         )
+        ensure_column(self.cursor, "RAW_VIDEOS", "FETCH_TIME", "INTEGER")
+        self.cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS RAW_VIDEOS_MID ON RAW_VIDEOS (MID)
+            """
+        )
 
-    def save_raw_replies(self, raw_replies: Collection[ApiRaw]) -> None:
+    @timed("db.save_raw_replies")
+    @retry_busy
+    def save_raw_replies(
+        self, raw_replies: Collection[ApiRaw], fetch_time: Optional[int] = None
+    ) -> SaveSummary:
+        """
+        保存原始评论，内容哈希与已存储的相同时跳过压缩和写入
+
+        NOTE: 同一批中重复的 RPID 以最后一条为准；FETCH_TIME 为最近一次抓取到该评论的时间，
+        内容未变的行只更新 FETCH_TIME，保留规则不会删除仍能抓取到的评论
+        """
+        if fetch_time is None:
+            fetch_time = int(time.time())
+        summary = SaveSummary()
+        stored = load_hashes(
+            self.cursor, "RAW_REPLIES", "RPID", {raw["rpid"] for raw in raw_replies}
+        )
+        unchanged: list[int] = []
         for raw_reply in raw_replies:
+            rpid: int = raw_reply["rpid"]
+            encoded = encode_raw(raw_reply)
+            digest = content_hash(VOLATILE_PATTERN.sub(b"", encoded))
+            if rpid not in stored:
+                summary.new += 1
+            elif stored[rpid] == digest:
+                summary.unchanged += 1
+                unchanged.append(rpid)
+                continue
+            else:
+                summary.changed += 1
+            stored[rpid] = digest
             self.cursor.execute(
                 """
-                INSERT OR REPLACE INTO RAW_REPLIES (RPID, OID, OTYPE, MID, RAW)
-                VALUES (?, ?, ?, ?, ?)
+                INSERT OR REPLACE INTO RAW_REPLIES
+                (RPID, OID, OTYPE, MID, RAW, HASH, FETCH_TIME)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
-                    raw_reply["rpid"],
+                    rpid,
                     raw_reply["oid"],
                     CommentResourceType(raw_reply["type"]).name,
                     raw_reply["mid"],
-                    zlib.compress(json.dumps(raw_reply).encode("utf-8")),
+                    compress_raw(raw_reply, encoded),
+                    digest,
+                    fetch_time,
                 ),
             )
-        self.connection.commit()
+        for start in range(0, len(unchanged), FETCH_BATCH_SIZE):
+            batch = unchanged[start : start + FETCH_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            self.cursor.execute(
+                f"""
+                UPDATE RAW_REPLIES
+                SET FETCH_TIME = ?
+                WHERE RPID IN ({placeholders})
+                """,
+                (fetch_time, *batch),
+            )
+        count("db.raw_replies.rows_written", summary.new + summary.changed)
+        count("db.raw_replies.rows_unchanged", summary.unchanged)
+        with timer("db.commit"):
+            self.connection.commit()
+        return summary
 
+    @timed("db.load_raw_replies")
     def load_raw_replies(self) -> list[ApiRaw]:
         self.cursor.execute(
             """
             SELECT RPID
             FROM RAW_REPLIES
+            WHERE RAW IS NOT NULL
             """
         )
         records: list[Record] = self.cursor.fetchall()
@@ -68,6 +371,7 @@ class RawDatabase:
             raw_reply = self.load_raw_reply_by_rpid(rpid)
             if raw_reply is not None:
                 raw_replies.append(raw_reply)
+        count("db.raw_replies.rows_read", len(raw_replies))
         return raw_replies
 
     def load_raw_reply_by_rpid(self, rpid: int) -> Optional[ApiRaw]:
@@ -80,11 +384,29 @@ class RawDatabase:
             (rpid,),
         )
         record: Record = self.cursor.fetchone()
-        if record is None:
+        if record is None or record[0] is None:
             return None
         (raw,) = record
-        return ApiRaw(json.loads(zlib.decompress(raw).decode("utf-8")))
+        return decompress_raw(raw)
 
+    @timed("db.load_raw_reply_blobs_by_resource")
+    def load_raw_reply_blobs_by_resource(
+        self, oid: int, otype: CommentResourceType
+    ) -> list[bytes]:
+        """返回未解压的原始评论，由调用方（例如并行解析的子进程）用 `decompress_raw` 解码"""
+        self.cursor.execute(
+            """
+            SELECT RAW
+            FROM RAW_REPLIES
+            WHERE OID = ? AND OTYPE = ? AND RAW IS NOT NULL
+            """,
+            (oid, otype.name),
+        )
+        blobs: list[bytes] = [raw for (raw,) in self.cursor.fetchall()]
+        count("db.raw_replies.rows_read", len(blobs))
+        return blobs
+
+    @timed("db.load_raw_reply_by_resource")
     def load_raw_reply_by_resource(
         self, oid: int, otype: CommentResourceType
     ) -> list[ApiRaw]:
@@ -92,7 +414,7 @@ class RawDatabase:
             """
             SELECT RPID
             FROM RAW_REPLIES
-            WHERE OID = ? AND OTYPE = ?
+            WHERE OID = ? AND OTYPE = ? AND RAW IS NOT NULL
             """,
             (oid, otype.name),
         )
@@ -103,6 +425,7 @@ class RawDatabase:
             raw_reply = self.load_raw_reply_by_rpid(rpid)
             if raw_reply is not None:
                 raw_replies.append(raw_reply)
+        count("db.raw_replies.rows_read", len(raw_replies))
         return raw_replies
 
     def load_raw_reply_by_mid(self, mid: int) -> list[ApiRaw]:
@@ -110,7 +433,7 @@ class RawDatabase:
             """
             SELECT RPID
             FROM RAW_REPLIES
-            WHERE MID = ?
+            WHERE MID = ? AND RAW IS NOT NULL
             """,
             (mid,),
         )
@@ -121,8 +444,101 @@ class RawDatabase:
             raw_reply = self.load_raw_reply_by_rpid(rpid)
             if raw_reply is not None:
                 raw_replies.append(raw_reply)
+        count("db.raw_replies.rows_read", len(raw_replies))
         return raw_replies
 
+    def load_raw_fetch_time(self, oid: int, otype: CommentResourceType) -> Optional[int]:
+        """返回资源下原始评论最近一次的抓取时间"""
+        self.cursor.execute(
+            """
+            SELECT MAX(FETCH_TIME)
+            FROM RAW_REPLIES
+            WHERE OID = ? AND OTYPE = ?
+            """,
+            (oid, otype.name),
+        )
+        (fetch_time,) = self.cursor.fetchone()
+        return fetch_time
+
+    @timed("db.delete_replies_by_fetch_timestamp")
+    def delete_replies_by_fetch_timestamp(
+        self, before: int, batch_size: int = DELETE_BATCH_SIZE
+    ) -> int:
+        """
+        分批删除抓取时间早于 `before` 的原始评论，返回删除的行数
+
+        NOTE: 没有抓取时间的旧数据视为最早抓取；每批单独提交，避免长时间持有写锁
+        """
+        deleted = 0
+        while True:
+            self.cursor.execute(
+                """
+                DELETE FROM RAW_REPLIES
+                WHERE RPID IN (
+                    SELECT RPID
+                    FROM RAW_REPLIES
+                    WHERE FETCH_TIME IS NULL OR FETCH_TIME < ?
+                    LIMIT ?
+                )
+                """,
+                (before, batch_size),
+            )
+            rows = self.cursor.rowcount
+            self.connection.commit()
+            deleted += rows
+            if rows < batch_size:
+                break
+        count("db.raw_replies.rows_deleted", deleted)
+        return deleted
+
+    @timed("db.prune_parsed_raw_replies")
+    def prune_parsed_raw_replies(
+        self, before: int, batch_size: int = DELETE_BATCH_SIZE
+    ) -> int:
+        """
+        分批清空抓取时间早于 `before` 且已解析到 REPLIES 的原始评论数据，返回清空的行数
+
+        NOTE: 保留 RPID 和内容哈希，再次抓取时仍能识别内容未变的评论
+        """
+        if not table_columns(self.cursor, "REPLIES"):
+            return 0
+        pruned = 0
+        while True:
+            self.cursor.execute(
+                """
+                SELECT RAW_REPLIES.RPID, RAW_REPLIES.OID, RAW_REPLIES.OTYPE,
+                    RAW_REPLIES.MID, RAW_REPLIES.HASH, RAW_REPLIES.FETCH_TIME
+                FROM RAW_REPLIES
+                JOIN REPLIES ON REPLIES.RPID = RAW_REPLIES.RPID
+                WHERE RAW_REPLIES.RAW IS NOT NULL
+                    AND (RAW_REPLIES.FETCH_TIME IS NULL OR RAW_REPLIES.FETCH_TIME < ?)
+                LIMIT ?
+                """,
+                (before, batch_size),
+            )
+            records: list[Record] = self.cursor.fetchall()
+            if not records:
+                break
+            # NOTE: 原地 UPDATE 为 NULL 只会留下稀疏的页，删除后重新插入才能合并出空闲页
+            self.cursor.executemany(
+                """
+                DELETE FROM RAW_REPLIES
+                WHERE RPID = ?
+                """,
+                [(record[0],) for record in records],
+            )
+            self.cursor.executemany(
+                """
+                INSERT INTO RAW_REPLIES (RPID, OID, OTYPE, MID, HASH, FETCH_TIME)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                records,
+            )
+            self.connection.commit()
+            pruned += len(records)
+        count("db.raw_replies.rows_pruned", pruned)
+        return pruned
+
     def delete_raw_reply_by_rpid(self, rpid: int) -> None:
         self.cursor.execute(
             """
@@ -133,20 +549,24 @@ class RawDatabase:
         )
         self.connection.commit()
 
-    def save_raw_video(self, raw_video: ApiRaw) -> None:
+    @timed("db.save_raw_video")
+    @retry_busy
+    def save_raw_video(self, raw_video: ApiRaw, fetch_time: Optional[int] = None) -> None:
         self.cursor.execute(
             """
-            INSERT OR REPLACE INTO RAW_VIDEOS (BVID, MID, RAW)
-            VALUES (?, ?, ?)
+            INSERT OR REPLACE INTO RAW_VIDEOS (BVID, MID, RAW, FETCH_TIME)
+            VALUES (?, ?, ?, ?)
             """,
             (
                 raw_video["bvid"],
                 raw_video.get("owner", {}).get("mid", 0),
-                zlib.compress(json.dumps(raw_video).encode("utf-8")),
+                compress_raw(raw_video),
+                fetch_time if fetch_time is not None else int(time.time()),
             ),
         )
         self.connection.commit()
 
+    @timed("db.load_raw_video_by_bvid")
     def load_raw_video_by_bvid(self, bvid: str) -> Optional[ApiRaw]:
         self.cursor.execute(
             """
@@ -160,7 +580,19 @@ class RawDatabase:
         if record is None:
             return None
         (raw_video,) = record
-        return ApiRaw(json.loads(zlib.decompress(raw_video).decode("utf-8")))
+        return decompress_raw(raw_video)
+
+    def load_raw_video_bvids_by_mid(self, mid: int) -> list[str]:
+        """返回已保存的 UP 主视频的 BVID"""
+        self.cursor.execute(
+            """
+            SELECT BVID
+            FROM RAW_VIDEOS
+            WHERE MID = ?
+            """,
+            (mid,),
+        )
+        return [bvid for (bvid,) in self.cursor.fetchall()]
 
     def delete_raw_video_by_bvid(self, bvid: str) -> None:
         self.cursor.execute(
@@ -175,12 +607,18 @@ class RawDatabase:
 
 class MemberDatabase:
     def __init__(self, dbpath: str, member_parser: Optional[MemberParser] = None):
-        self.connection = sqlite3.connect(dbpath)
+        self.connection = connect(dbpath)
         self.cursor = self.connection.cursor()
         if member_parser is None:
             member_parser = MemberParser()
         self.member_parser = member_parser
 
+        # NOTE: 大会员类型、装扮名称只有几百种取值，以整数 ID 引用查找表
+        self.vips = StringDictionary(self.cursor, "VIPS")
+        self.pendants = StringDictionary(self.cursor, "PENDANTS")
+        self.cardbags = StringDictionary(self.cursor, "CARDBAGS")
+        if "VIP" in table_columns(self.cursor, "MEMBERS"):
+            self.encode_legacy_members()
         self.cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS MEMBERS (
@@ -189,19 +627,92 @@ class MemberDatabase:
                 SEX TEXT,
                 SIGN TEXT,
                 LEVEL INTEGER,
-                VIP TEXT,
-                PENDANT TEXT,
-                CARDBAG TEXT
+                VIP_ID INTEGER REFERENCES VIPS (ID),
+                PENDANT_ID INTEGER REFERENCES PENDANTS (ID),
+                CARDBAG_ID INTEGER REFERENCES CARDBAGS (ID),
+                HASH INTEGER,
+                FETCH_TIME INTEGER
             )
             """
         )
+        ensure_column(self.cursor, "MEMBERS", "FETCH_TIME", "INTEGER")
+        self.connection.commit()
+
+    def encode_legacy_members(self) -> None:
+        """将旧版本以字符串存储 VIP/PENDANT/CARDBAG 的 MEMBERS 表迁移为字典编码"""
+        ensure_column(self.cursor, "MEMBERS", "HASH", "INTEGER")
+        self.cursor.executescript(
+            """
+            BEGIN;
+            INSERT OR IGNORE INTO VIPS (VALUE)
+            SELECT DISTINCT VIP FROM MEMBERS WHERE VIP IS NOT NULL;
+            INSERT OR IGNORE INTO PENDANTS (VALUE)
+            SELECT DISTINCT PENDANT FROM MEMBERS WHERE PENDANT IS NOT NULL;
+            INSERT OR IGNORE INTO CARDBAGS (VALUE)
+            SELECT DISTINCT CARDBAG FROM MEMBERS WHERE CARDBAG IS NOT NULL;
 
-    def save_members(self, members: Collection[Member]) -> None:
+            CREATE TABLE MEMBERS_ENCODED (
+                UID INTEGER PRIMARY KEY,
+                NAME TEXT NOT NULL,
+                SEX TEXT,
+                SIGN TEXT,
+                LEVEL INTEGER,
+                VIP_ID INTEGER REFERENCES VIPS (ID),
+                PENDANT_ID INTEGER REFERENCES PENDANTS (ID),
+                CARDBAG_ID INTEGER REFERENCES CARDBAGS (ID),
+                HASH INTEGER
+            );
+            INSERT INTO MEMBERS_ENCODED
+            SELECT MEMBERS.UID, MEMBERS.NAME, MEMBERS.SEX, MEMBERS.SIGN, MEMBERS.LEVEL,
+                VIPS.ID, PENDANTS.ID, CARDBAGS.ID, MEMBERS.HASH
+            FROM MEMBERS
+            LEFT JOIN VIPS ON VIPS.VALUE = MEMBERS.VIP
+            LEFT JOIN PENDANTS ON PENDANTS.VALUE = MEMBERS.PENDANT
+            LEFT JOIN CARDBAGS ON CARDBAGS.VALUE = MEMBERS.CARDBAG;
+            DROP TABLE MEMBERS;
+            ALTER TABLE MEMBERS_ENCODED RENAME TO MEMBERS;
+            COMMIT;
+            """
+        )
+
+    @timed("db.save_members")
+    @retry_busy
+    def save_members(
+        self, members: Collection[Member], fetch_time: Optional[int] = None
+    ) -> SaveSummary:
+        """保存用户信息，内容哈希与已存储的相同时跳过写入"""
+        if fetch_time is None:
+            fetch_time = int(time.time())
+        summary = SaveSummary()
+        stored = load_hashes(
+            self.cursor, "MEMBERS", "UID", {member.uid for member in members}
+        )
         for member in members:
+            record: Record = (
+                member.uid,
+                member.name,
+                member.sex,
+                member.sign,
+                member.level,
+                member.vip,
+                member.pendant,
+                member.cardbag,
+            )
+            digest = content_hash(json.dumps(record).encode("utf-8"))
+            if member.uid not in stored:
+                summary.new += 1
+            elif stored[member.uid] == digest:
+                summary.unchanged += 1
+                continue
+            else:
+                summary.changed += 1
+            stored[member.uid] = digest
             self.cursor.execute(
                 """
-                INSERT OR REPLACE INTO MEMBERS (UID, NAME, SEX, SIGN, LEVEL, VIP, PENDANT, CARDBAG)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT OR REPLACE INTO MEMBERS
+                (UID, NAME, SEX, SIGN, LEVEL, VIP_ID, PENDANT_ID, CARDBAG_ID,
+                    HASH, FETCH_TIME)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """,
                 (
                     member.uid,
@@ -209,13 +720,20 @@ class MemberDatabase:
                     member.sex,
                     member.sign,
                     member.level,
-                    member.vip,
-                    member.pendant,
-                    member.cardbag,
+                    self.vips.encode(member.vip),
+                    self.pendants.encode(member.pendant),
+                    self.cardbags.encode(member.cardbag),
+                    digest,
+                    fetch_time,
                 ),
             )
-        self.connection.commit()
+        count("db.members.rows_written", summary.new + summary.changed)
+        count("db.members.rows_unchanged", summary.unchanged)
+        with timer("db.commit"):
+            self.connection.commit()
+        return summary
 
+    @timed("db.load_members")
     def load_members(self) -> list[Member]:
         self.cursor.execute(
             """
@@ -230,6 +748,7 @@ class MemberDatabase:
             member = self.load_member_by_uid(uid)
             if member is not None:
                 members.append(member)
+        count("db.members.rows_read", len(members))
         return members
 
     def load_member_by_uid(self, uid: int) -> Optional[Member]:
@@ -239,9 +758,13 @@ class MemberDatabase:
 
         self.cursor.execute(
             """
-            SELECT UID, NAME, SEX, SIGN, LEVEL, VIP, PENDANT, CARDBAG
+            SELECT MEMBERS.UID, MEMBERS.NAME, MEMBERS.SEX, MEMBERS.SIGN, MEMBERS.LEVEL,
+                VIPS.VALUE, PENDANTS.VALUE, CARDBAGS.VALUE
             FROM MEMBERS
-            WHERE UID = ?
+            LEFT JOIN VIPS ON VIPS.ID = MEMBERS.VIP_ID
+            LEFT JOIN PENDANTS ON PENDANTS.ID = MEMBERS.PENDANT_ID
+            LEFT JOIN CARDBAGS ON CARDBAGS.ID = MEMBERS.CARDBAG_ID
+            WHERE MEMBERS.UID = ?
             """,
             (uid,),
         )
@@ -251,6 +774,115 @@ class MemberDatabase:
         member = self.member_parser.parse_from_record(record)
         return member
 
+    def load_members_by_uids(self, uids: Collection[int]) -> dict[int, Member]:
+        """批量读取用户，已在身份映射中的用户不再查询；不存在的 UID 不出现在结果中"""
+        members: dict[int, Member] = {}
+        missing: list[int] = []
+        for uid in uids:
+            member = self.member_parser.fetch_member(uid)
+            if member is None:
+                missing.append(uid)
+            else:
+                members[uid] = member
+        for start in range(0, len(missing), FETCH_BATCH_SIZE):
+            batch = missing[start : start + FETCH_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            self.cursor.execute(
+                f"""
+                SELECT MEMBERS.UID, MEMBERS.NAME, MEMBERS.SEX, MEMBERS.SIGN,
+                    MEMBERS.LEVEL, VIPS.VALUE, PENDANTS.VALUE, CARDBAGS.VALUE
+                FROM MEMBERS
+                LEFT JOIN VIPS ON VIPS.ID = MEMBERS.VIP_ID
+                LEFT JOIN PENDANTS ON PENDANTS.ID = MEMBERS.PENDANT_ID
+                LEFT JOIN CARDBAGS ON CARDBAGS.ID = MEMBERS.CARDBAG_ID
+                WHERE MEMBERS.UID IN ({placeholders})
+                """,
+                batch,
+            )
+            records: list[Record] = self.cursor.fetchall()
+            count("db.members.rows_read", len(records))
+            for record in records:
+                member = self.member_parser.parse_from_record(record)
+                members[member.uid] = member
+        return members
+
+    def load_member_rows_by_resource(
+        self, oid: int, otype: CommentResourceType, batch_size: int = FETCH_BATCH_SIZE
+    ) -> Iterator[list[Record]]:
+        """逐批读取在给定资源下发表过评论的用户记录，按 UID 排序"""
+        cursor = self.connection.cursor()
+        cursor.execute(
+            """
+            SELECT MEMBERS.UID, MEMBERS.NAME, MEMBERS.SEX, MEMBERS.SIGN, MEMBERS.LEVEL,
+                VIPS.VALUE, PENDANTS.VALUE, CARDBAGS.VALUE
+            FROM MEMBERS
+            LEFT JOIN VIPS ON VIPS.ID = MEMBERS.VIP_ID
+            LEFT JOIN PENDANTS ON PENDANTS.ID = MEMBERS.PENDANT_ID
+            LEFT JOIN CARDBAGS ON CARDBAGS.ID = MEMBERS.CARDBAG_ID
+            WHERE MEMBERS.UID IN (
+                SELECT MID
+                FROM REPLIES
+                WHERE OID = ? AND OTYPE = ?
+            )
+            ORDER BY MEMBERS.UID
+            """,
+            (oid, otype.value),
+        )
+        while records := cursor.fetchmany(batch_size):
+            count("db.members.rows_read", len(records))
+            yield records
+        cursor.close()
+
+
+class ReplyLoader:
+    """
+    为 `ReplyDatabase` 加载的 `LazyReply` 按需加载关联对象
+
+    NOTE: 某条评论首次访问某个关联时，同一数据库加载的、尚未加载该关联的评论一并按批查询，
+    逐条访问 N 条评论的用户只需 N / FETCH_BATCH_SIZE 次查询；
+    查询结果经由解析器的身份映射，已加载的用户和评论不再查询，也不会递归加载整个楼
+    """
+
+    def __init__(self, reply_db: "ReplyDatabase"):
+        self.reply_db: "ReplyDatabase" = reply_db
+        self.pending: dict[str, dict[int, LazyReply]] = {
+            name: {} for name in LazyReply.RELATIONS
+        }
+
+    def track(self, replies: Collection[Reply]) -> None:
+        for reply in replies:
+            if isinstance(reply, LazyReply) and reply.loader is self:
+                for waiting in self.pending.values():
+                    if reply.rpid not in waiting:
+                        waiting[reply.rpid] = reply
+
+    def __call__(self, reply: LazyReply, name: str) -> None:
+        waiting = self.pending[name]
+        waiting[reply.rpid] = reply
+        replies = [reply for reply in waiting.values() if not reply.is_loaded(name)]
+        waiting.clear()
+        count(f"db.lazy.{name}", len(replies))
+        with timer("db.lazy_load"):
+            if name == "member":
+                members = self.reply_db.member_db.load_members_by_uids(
+                    {reply.mid for reply in replies}
+                )
+                for reply in replies:
+                    reply.member = members.get(reply.mid)
+            elif name == "child_replies":
+                children = self.reply_db.load_child_replies(
+                    [reply.rpid for reply in replies]
+                )
+                for reply in replies:
+                    reply.child_replies = children.get(reply.rpid)
+            else:
+                key = "root" if name == "root_reply" else "parent"
+                related = self.reply_db.load_replies_by_rpids(
+                    {getattr(reply, key) for reply in replies} - {0}
+                )
+                for reply in replies:
+                    setattr(reply, name, related.get(getattr(reply, key)))
+
 
 class ReplyDatabase:
     def __init__(
@@ -258,55 +890,193 @@ class ReplyDatabase:
         dbpath: str,
         member_db: MemberDatabase,
         reply_parser: Optional[ReplyParser] = None,
+        lazy: bool = False,
     ):
-        self.connection = sqlite3.connect(dbpath)
+        self.connection = connect(dbpath)
         self.cursor = self.connection.cursor()
         if reply_parser is None:
             reply_parser = ReplyParser(member_parser=member_db.member_parser)
         self.reply_parser = reply_parser
+        # NOTE: lazy 为 True 时加载的评论为 LazyReply，用户、根/父评论和楼中楼在首次访问时加载；
+        # 否则 `load_reply_by_rpid` 立即递归加载全部关联
+        self.loader: Optional[ReplyLoader] = ReplyLoader(self) if lazy else None
 
+        create_resource_types(self.cursor)
+        self.locations = StringDictionary(self.cursor, "LOCATIONS")
+        if "LOCATION" in table_columns(self.cursor, "REPLIES"):
+            self.encode_legacy_replies()
         self.cursor.execute(
             """
             CREATE TABLE IF NOT EXISTS REPLIES (
                 RPID INTEGER PRIMARY KEY,
                 OID INTEGER NOT NULL,
-                OTYPE TEXT NOT NULL,
+                OTYPE INTEGER NOT NULL REFERENCES RESOURCE_TYPES (ID),
                 MID INTEGER NOT NULL,
                 ROOT INTEGER NOT NULL,
                 PARENT INTEGER NOT NULL,
                 MESSAGE TEXT NOT NULL,
                 CTIME INTEGER NOT NULL,
-                LOCATION TEXT
+                LOCATION_ID INTEGER REFERENCES LOCATIONS (ID),
+                FETCH_TIME INTEGER
             )
             """
         )
+        ensure_column(self.cursor, "REPLIES", "FETCH_TIME", "INTEGER")
+        # NOTE: 列出评论时沿索引按发布时间顺序读取，RPID 即 rowid，索引项隐含 (CTIME, RPID)
+        # 的顺序；(OID, OTYPE, CTIME) 同时替代旧的 (OID, OTYPE) 索引
+        self.cursor.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS REPLIES_RESOURCE_TIME
+            ON REPLIES (OID, OTYPE, CTIME);
+            DROP INDEX IF EXISTS REPLIES_RESOURCE;
+            CREATE INDEX IF NOT EXISTS REPLIES_MEMBER_TIME
+            ON REPLIES (MID, CTIME);
+            CREATE INDEX IF NOT EXISTS REPLIES_TIME
+            ON REPLIES (CTIME);
+            """
+        )
+        # NOTE: 按楼加载楼中楼回复
+        self.cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS REPLIES_ROOT ON REPLIES (ROOT)
+            """
+        )
         self.member_db = member_db
+        self.create_search_index()
 
-    def save_replies(self, replies: Collection[Reply]) -> None:
+    def encode_legacy_replies(self) -> None:
+        """
+        将旧版本以字符串存储 OTYPE/LOCATION 的 REPLIES 表迁移为字典编码
+
+        NOTE: RPID 即全文索引的 rowid 且正文不变，REPLIES_FTS 无需重建；
+        旧表上的触发器随旧表删除，之后由 `create_search_index` 重新创建
+        """
+        self.cursor.executescript(
+            """
+            BEGIN;
+            INSERT OR IGNORE INTO LOCATIONS (VALUE)
+            SELECT DISTINCT LOCATION FROM REPLIES WHERE LOCATION IS NOT NULL;
+
+            CREATE TABLE REPLIES_ENCODED (
+                RPID INTEGER PRIMARY KEY,
+                OID INTEGER NOT NULL,
+                OTYPE INTEGER NOT NULL REFERENCES RESOURCE_TYPES (ID),
+                MID INTEGER NOT NULL,
+                ROOT INTEGER NOT NULL,
+                PARENT INTEGER NOT NULL,
+                MESSAGE TEXT NOT NULL,
+                CTIME INTEGER NOT NULL,
+                LOCATION_ID INTEGER REFERENCES LOCATIONS (ID)
+            );
+            INSERT INTO REPLIES_ENCODED
+            SELECT REPLIES.RPID, REPLIES.OID, RESOURCE_TYPES.ID, REPLIES.MID,
+                REPLIES.ROOT, REPLIES.PARENT, REPLIES.MESSAGE, REPLIES.CTIME, LOCATIONS.ID
+            FROM REPLIES
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.VALUE = REPLIES.OTYPE
+            LEFT JOIN LOCATIONS ON LOCATIONS.VALUE = REPLIES.LOCATION;
+            DROP TABLE REPLIES;
+            ALTER TABLE REPLIES_ENCODED RENAME TO REPLIES;
+            COMMIT;
+            """
+        )
 
+    def create_search_index(self) -> None:
+        # NOTE: trigram 分词支持中文子串匹配，外部内容表不重复存储评论正文
+        self.cursor.execute(
+            """
+            SELECT 1
+            FROM sqlite_master
+            WHERE type = 'table' AND name = 'REPLIES_FTS'
+            """
+        )
+        exists: bool = self.cursor.fetchone() is not None
+        self.cursor.executescript(
+            """
+            CREATE VIRTUAL TABLE IF NOT EXISTS REPLIES_FTS USING fts5 (
+                MESSAGE,
+                content = 'REPLIES',
+                content_rowid = 'RPID',
+                tokenize = 'trigram'
+            );
+
+            CREATE TRIGGER IF NOT EXISTS REPLIES_FTS_INSERT AFTER INSERT ON REPLIES
+            BEGIN
+                INSERT INTO REPLIES_FTS (rowid, MESSAGE) VALUES (new.RPID, new.MESSAGE);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS REPLIES_FTS_DELETE AFTER DELETE ON REPLIES
+            BEGIN
+                INSERT INTO REPLIES_FTS (REPLIES_FTS, rowid, MESSAGE)
+                VALUES ('delete', old.RPID, old.MESSAGE);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS REPLIES_FTS_UPDATE
+            AFTER UPDATE OF MESSAGE ON REPLIES
+            BEGIN
+                INSERT INTO REPLIES_FTS (REPLIES_FTS, rowid, MESSAGE)
+                VALUES ('delete', old.RPID, old.MESSAGE);
+                INSERT INTO REPLIES_FTS (rowid, MESSAGE) VALUES (new.RPID, new.MESSAGE);
+            END;
+            """
+        )
+        if not exists:
+            self.cursor.execute(
+                """
+                INSERT INTO REPLIES_FTS (REPLIES_FTS) VALUES ('rebuild')
+                """
+            )
+        self.connection.commit()
+
+    @timed("db.save_replies")
+    @retry_busy
+    def save_replies(
+        self, replies: Collection[Reply], fetch_time: Optional[int] = None
+    ) -> None:
+        # NOTE: 使用 UPSERT 而非 INSERT OR REPLACE，保证 REPLIES_FTS 的触发器正确触发
+        if fetch_time is None:
+            fetch_time = int(time.time())
         for reply in self.reply_parser.unroll_replies(replies):
             self.cursor.execute(
                 """
-                INSERT OR REPLACE INTO REPLIES
-                (RPID, OID, OTYPE, MESSAGE, CTIME, MID, ROOT, PARENT, LOCATION)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                INSERT INTO REPLIES
+                (RPID, OID, OTYPE, MESSAGE, CTIME, MID, ROOT, PARENT, LOCATION_ID,
+                    FETCH_TIME)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (RPID) DO UPDATE SET
+                    OID = excluded.OID,
+                    OTYPE = excluded.OTYPE,
+                    MESSAGE = excluded.MESSAGE,
+                    CTIME = excluded.CTIME,
+                    MID = excluded.MID,
+                    ROOT = excluded.ROOT,
+                    PARENT = excluded.PARENT,
+                    LOCATION_ID = excluded.LOCATION_ID,
+                    FETCH_TIME = excluded.FETCH_TIME
                 """,
                 (
                     reply.rpid,
                     reply.oid,
-                    reply.otype.name,
+                    reply.otype.value,
                     reply.message,
                     reply.ctime,
                     reply.mid,
                     reply.root,
                     reply.parent,
-                    reply.location,
+                    self.locations.encode(reply.location),
+                    fetch_time,
                 ),
             )
+            count("db.replies.rows_written")
 
-        self.connection.commit()
+        with timer("db.commit"):
+            self.connection.commit()
 
+    @timed("db.load_replies")
     def load_replies(self) -> list[Reply]:
+        if self.loader is not None:
+            replies = self.select_replies()
+            count("db.replies.rows_read", len(replies))
+            return replies
         self.cursor.execute(
             """
             SELECT RPID
@@ -320,18 +1090,26 @@ class ReplyDatabase:
             reply = self.load_reply_by_rpid(rpid)
             if reply is not None:
                 replies.append(reply)
+        count("db.replies.rows_read", len(replies))
         return replies
 
+    @timed("db.load_replies_by_resource")
     def load_replies_by_resource(
         self, oid: int, otype: CommentResourceType
     ) -> list[Reply]:
+        if self.loader is not None:
+            replies = self.select_replies(
+                "WHERE REPLIES.OID = ? AND REPLIES.OTYPE = ?", (oid, otype.value)
+            )
+            count("db.replies.rows_read", len(replies))
+            return replies
         self.cursor.execute(
             """
             SELECT RPID
             FROM REPLIES
             WHERE OID = ? AND OTYPE = ?
             """,
-            (oid, otype.name),
+            (oid, otype.value),
         )
         records: list[Record] = self.cursor.fetchall()
         replies: list[Reply] = []
@@ -340,18 +1118,24 @@ class ReplyDatabase:
             reply = self.load_reply_by_rpid(rpid)
             if reply is not None:
                 replies.append(reply)
+        count("db.replies.rows_read", len(replies))
         return replies
 
     def load_reply_by_rpid(self, rpid: int) -> Optional[Reply]:
         reply: Optional[Reply] = self.reply_parser.fetch_reply(rpid)
         if reply is not None:
             return reply
+        if self.loader is not None:
+            return self.load_replies_by_rpids([rpid]).get(rpid)
 
         self.cursor.execute(
             """
-            SELECT RPID, OID, OTYPE, MESSAGE, CTIME, MID, ROOT, PARENT, LOCATION
+            SELECT REPLIES.RPID, REPLIES.OID, RESOURCE_TYPES.VALUE, REPLIES.MESSAGE,
+                REPLIES.CTIME, REPLIES.MID, REPLIES.ROOT, REPLIES.PARENT, LOCATIONS.VALUE
             FROM REPLIES
-            WHERE RPID = ?
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.ID = REPLIES.OTYPE
+            LEFT JOIN LOCATIONS ON LOCATIONS.ID = REPLIES.LOCATION_ID
+            WHERE REPLIES.RPID = ?
             """,
             (rpid,),
         )
@@ -386,10 +1170,335 @@ class ReplyDatabase:
 
         return reply
 
+    def select_replies(
+        self, condition: str = "", parameters: Collection[Any] = ()
+    ) -> list[Reply]:
+        """按条件一次查询评论，关联对象不在此加载"""
+        self.cursor.execute(
+            f"""
+            SELECT REPLIES.RPID, REPLIES.OID, RESOURCE_TYPES.VALUE, REPLIES.MESSAGE,
+                REPLIES.CTIME, REPLIES.MID, REPLIES.ROOT, REPLIES.PARENT, LOCATIONS.VALUE
+            FROM REPLIES
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.ID = REPLIES.OTYPE
+            LEFT JOIN LOCATIONS ON LOCATIONS.ID = REPLIES.LOCATION_ID
+            {condition}
+            """,
+            tuple(parameters),
+        )
+        return self.parse_records(self.cursor.fetchall())
+
+    def parse_records(self, records: Collection[Record]) -> list[Reply]:
+        """懒加载模式下解析为 LazyReply 并登记到 `loader`，否则为关联为 None 的 Reply"""
+        replies = [
+            self.reply_parser.parse_from_record(record, self.loader) for record in records
+        ]
+        if self.loader is not None:
+            self.loader.track(replies)
+        return replies
+
+    def load_replies_by_rpids(self, rpids: Collection[int]) -> dict[int, Reply]:
+        """批量读取评论，已在身份映射中的评论不再查询；不存在的 RPID 不出现在结果中"""
+        replies: dict[int, Reply] = {}
+        missing: list[int] = []
+        for rpid in rpids:
+            reply = self.reply_parser.fetch_reply(rpid)
+            if reply is None:
+                missing.append(rpid)
+            else:
+                replies[rpid] = reply
+        for start in range(0, len(missing), FETCH_BATCH_SIZE):
+            batch = missing[start : start + FETCH_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            loaded = self.select_replies(f"WHERE REPLIES.RPID IN ({placeholders})", batch)
+            count("db.replies.rows_read", len(loaded))
+            for reply in loaded:
+                replies[reply.rpid] = reply
+        return replies
+
+    def load_child_replies(self, rpids: Collection[int]) -> dict[int, list[Reply]]:
+        """批量读取各根评论的楼中楼回复，按 RPID 排序；没有回复的评论不出现在结果中"""
+        children: dict[int, list[Reply]] = {}
+        rpids = list(rpids)
+        for start in range(0, len(rpids), FETCH_BATCH_SIZE):
+            batch = rpids[start : start + FETCH_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            replies = self.select_replies(
+                f"WHERE REPLIES.ROOT IN ({placeholders}) ORDER BY REPLIES.RPID", batch
+            )
+            count("db.replies.rows_read", len(replies))
+            for reply in replies:
+                children.setdefault(reply.root, []).append(reply)
+        return children
+
+    def load_resources(self) -> list[tuple[int, CommentResourceType]]:
+        self.cursor.execute(
+            """
+            SELECT DISTINCT OID, OTYPE
+            FROM REPLIES
+            ORDER BY OID, OTYPE
+            """
+        )
+        records: list[Record] = self.cursor.fetchall()
+        return [(oid, CommentResourceType(otype)) for oid, otype in records]
+
+    def count_replies(
+        self, oid: int, otype: CommentResourceType, root_only: bool = False
+    ) -> int:
+        self.cursor.execute(
+            f"""
+            SELECT COUNT(*)
+            FROM REPLIES
+            WHERE OID = ? AND OTYPE = ? {"AND ROOT = 0" if root_only else ""}
+            """,
+            (oid, otype.value),
+        )
+        (replies,) = self.cursor.fetchone()
+        return replies
+
+    def load_recent_ctimes(
+        self, oid: int, otype: CommentResourceType, limit: int
+    ) -> list[int]:
+        """返回资源下最近发布的 `limit` 条根评论的发布时间，从新到旧"""
+        self.cursor.execute(
+            """
+            SELECT CTIME
+            FROM REPLIES
+            WHERE OID = ? AND OTYPE = ? AND ROOT = 0
+            ORDER BY CTIME DESC
+            LIMIT ?
+            """,
+            (oid, otype.value, limit),
+        )
+        return [ctime for (ctime,) in self.cursor.fetchall()]
+
+    def load_reply_rows(
+        self,
+        oid: Optional[int] = None,
+        otype: Optional[CommentResourceType] = None,
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> Iterator[list[Record]]:
+        """
+        逐批读取评论及其用户信息的扁平记录，按 (OID, OTYPE, RPID) 排序，内存占用与表大小无关
+
+        记录字段为 RPID, OID, OTYPE, MID, ROOT, PARENT, MESSAGE, CTIME, LOCATION,
+        NAME, SEX, SIGN, LEVEL, VIP, PENDANT, CARDBAG
+        """
+        condition: str = ""
+        parameters: tuple[int | str, ...] = ()
+        if oid is not None and otype is not None:
+            condition = "WHERE REPLIES.OID = ? AND REPLIES.OTYPE = ?"
+            parameters = (oid, otype.value)
+
+        # NOTE: 字典编码的列在查询中连接查找表解码，返回的记录与编码前相同
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT REPLIES.RPID, REPLIES.OID, RESOURCE_TYPES.VALUE, REPLIES.MID,
+                REPLIES.ROOT, REPLIES.PARENT, REPLIES.MESSAGE, REPLIES.CTIME,
+                LOCATIONS.VALUE, MEMBERS.NAME, MEMBERS.SEX, MEMBERS.SIGN, MEMBERS.LEVEL,
+                VIPS.VALUE, PENDANTS.VALUE, CARDBAGS.VALUE
+            FROM REPLIES
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.ID = REPLIES.OTYPE
+            LEFT JOIN LOCATIONS ON LOCATIONS.ID = REPLIES.LOCATION_ID
+            LEFT JOIN MEMBERS ON MEMBERS.UID = REPLIES.MID
+            LEFT JOIN VIPS ON VIPS.ID = MEMBERS.VIP_ID
+            LEFT JOIN PENDANTS ON PENDANTS.ID = MEMBERS.PENDANT_ID
+            LEFT JOIN CARDBAGS ON CARDBAGS.ID = MEMBERS.CARDBAG_ID
+            {condition}
+            ORDER BY REPLIES.OID, REPLIES.OTYPE, REPLIES.RPID
+            """,
+            parameters,
+        )
+        while records := cursor.fetchmany(batch_size):
+            count("db.replies.rows_read", len(records))
+            yield records
+        cursor.close()
+
+    def load_thread_rows(
+        self,
+        oid: Optional[int] = None,
+        otype: Optional[CommentResourceType] = None,
+        batch_size: int = FETCH_BATCH_SIZE,
+    ) -> Iterator[list[Record]]:
+        """
+        逐批读取评论的回复关系，同一楼（根评论及其楼中楼）的评论相邻，根评论在前
+
+        记录字段为 RPID, ROOT, PARENT, MID, PARENT_MID；被回复的评论未保存时 PARENT_MID 为 NULL
+        """
+        condition: str = ""
+        parameters: tuple[int, ...] = ()
+        if oid is not None and otype is not None:
+            condition = "WHERE REPLIES.OID = ? AND REPLIES.OTYPE = ?"
+            parameters = (oid, otype.value)
+
+        # NOTE: 楼号为根评论的 RPID，RPID 随发布时间递增，楼内被回复的评论总在回复之前
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT REPLIES.RPID, REPLIES.ROOT, REPLIES.PARENT, REPLIES.MID, PARENTS.MID
+            FROM REPLIES
+            LEFT JOIN REPLIES AS PARENTS ON PARENTS.RPID = REPLIES.PARENT
+            {condition}
+            ORDER BY
+                CASE REPLIES.ROOT WHEN 0 THEN REPLIES.RPID ELSE REPLIES.ROOT END,
+                REPLIES.RPID
+            """,
+            parameters,
+        )
+        while records := cursor.fetchmany(batch_size):
+            count("db.replies.rows_read", len(records))
+            yield records
+        cursor.close()
+
+    def search_replies(
+        self,
+        keyword: str,
+        oid: Optional[int] = None,
+        otype: Optional[CommentResourceType] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> Iterator[tuple[Reply, float]]:
+        """
+        按关键词搜索评论，逐批返回 (评论, 相关度)，相关度越小越相关
+
+        NOTE: trigram 索引要求关键词至少 3 个字符，更短的关键词退化为 LIKE 扫描，
+        此时按发布时间倒序返回且相关度恒为 0
+        """
+        conditions: list[str] = []
+        parameters: list[str | int] = []
+        if len(keyword) >= 3:
+            source = "REPLIES_FTS JOIN REPLIES ON REPLIES.RPID = REPLIES_FTS.rowid"
+            conditions.append("REPLIES_FTS MATCH ?")
+            parameters.append('"' + keyword.replace('"', '""') + '"')
+            rank, order = "bm25(REPLIES_FTS)", "bm25(REPLIES_FTS), REPLIES.RPID"
+        else:
+            source = "REPLIES"
+            conditions.append("REPLIES.MESSAGE LIKE ? ESCAPE '\\'")
+            escaped = keyword.replace("\\", "\\\\")
+            escaped = escaped.replace("%", "\\%").replace("_", "\\_")
+            parameters.append(f"%{escaped}%")
+            rank, order = "0.0", "REPLIES.CTIME DESC, REPLIES.RPID DESC"
+        if oid is not None:
+            conditions.append("REPLIES.OID = ?")
+            parameters.append(oid)
+        if otype is not None:
+            conditions.append("REPLIES.OTYPE = ?")
+            parameters.append(otype.value)
+        if start is not None:
+            conditions.append("REPLIES.CTIME >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("REPLIES.CTIME < ?")
+            parameters.append(end)
+        parameters.extend((limit, offset))
+
+        # NOTE: 使用独立游标，避免迭代过程中被其他查询覆盖结果集
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT REPLIES.RPID, REPLIES.OID, RESOURCE_TYPES.VALUE, REPLIES.MESSAGE,
+                REPLIES.CTIME, REPLIES.MID, REPLIES.ROOT, REPLIES.PARENT,
+                LOCATIONS.VALUE, {rank}
+            FROM {source}
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.ID = REPLIES.OTYPE
+            LEFT JOIN LOCATIONS ON LOCATIONS.ID = REPLIES.LOCATION_ID
+            WHERE {" AND ".join(conditions)}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+            """,
+            parameters,
+        )
+        while records := cursor.fetchmany(FETCH_BATCH_SIZE):
+            count("db.search.rows_read", len(records))
+            for record in records:
+                yield self.reply_parser.parse_from_record(record[:-1]), record[-1]
+        cursor.close()
+
+    def query_replies(
+        self,
+        oid: Optional[int] = None,
+        otype: Optional[CommentResourceType] = None,
+        mid: Optional[int] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        location: Optional[str] = None,
+        root_only: bool = False,
+        root: Optional[int] = None,
+        after: Optional[tuple[int, int]] = None,
+        limit: Optional[int] = None,
+        ascending: bool = False,
+    ) -> Iterator[Reply]:
+        """
+        按条件逐条返回评论，按 (CTIME, RPID) 排序，默认从新到旧
+
+        `after` 为上一页最后一条评论的 (CTIME, RPID)，从其后继续（键集分页）；
+        `root_only` 只返回根评论，`root` 只返回该楼的楼中楼回复
+
+        NOTE: 键集分页不像 OFFSET 那样跳过前面的行，任意一页都只读取本页的行；
+        给出 OID/OTYPE 或 MID 时沿 REPLIES_RESOURCE_TIME/REPLIES_MEMBER_TIME 索引读取，
+        百万条评论的视频首页也只需几毫秒
+        """
+        conditions: list[str] = []
+        parameters: list[int | str] = []
+        if oid is not None:
+            conditions.append("REPLIES.OID = ?")
+            parameters.append(oid)
+        if otype is not None:
+            conditions.append("REPLIES.OTYPE = ?")
+            parameters.append(otype.value)
+        if mid is not None:
+            conditions.append("REPLIES.MID = ?")
+            parameters.append(mid)
+        if start is not None:
+            conditions.append("REPLIES.CTIME >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("REPLIES.CTIME < ?")
+            parameters.append(end)
+        if location is not None:
+            conditions.append(
+                "REPLIES.LOCATION_ID = (SELECT ID FROM LOCATIONS WHERE VALUE = ?)"
+            )
+            parameters.append(location)
+        if root_only:
+            conditions.append("REPLIES.ROOT = 0")
+        if root is not None:
+            conditions.append("REPLIES.ROOT = ?")
+            parameters.append(root)
+        operator, direction = (">", "ASC") if ascending else ("<", "DESC")
+        if after is not None:
+            conditions.append(f"(REPLIES.CTIME, REPLIES.RPID) {operator} (?, ?)")
+            parameters.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        if limit is not None:
+            parameters.append(limit)
+
+        # NOTE: 使用独立游标，调用方逐条处理时可以照常执行其他查询（例如懒加载关联）
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT REPLIES.RPID, REPLIES.OID, RESOURCE_TYPES.VALUE, REPLIES.MESSAGE,
+                REPLIES.CTIME, REPLIES.MID, REPLIES.ROOT, REPLIES.PARENT, LOCATIONS.VALUE
+            FROM REPLIES
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.ID = REPLIES.OTYPE
+            LEFT JOIN LOCATIONS ON LOCATIONS.ID = REPLIES.LOCATION_ID
+            {where}
+            ORDER BY REPLIES.CTIME {direction}, REPLIES.RPID {direction}
+            {"LIMIT ?" if limit is not None else ""}
+            """,
+            parameters,
+        )
+        while records := cursor.fetchmany(FETCH_BATCH_SIZE):
+            count("db.replies.rows_read", len(records))
+            yield from self.parse_records(records)
+        cursor.close()
+
 
 class VideoDatabase:
     def __init__(self, dbpath: str, video_parser: Optional[VideoParser] = None):
-        self.connection = sqlite3.connect(dbpath)
+        self.connection = connect(dbpath)
         self.cursor = self.connection.cursor()
         if video_parser is None:
             video_parser = VideoParser()
@@ -402,16 +1511,28 @@ class VideoDatabase:
                 TITLE TEXT NOT NULL,
                 DESCRIPTION TEXT,
                 PUBLISH_TIME INTEGER NOT NULL,
-                UPLOAD_TIME INTEGER NOT NULL
+                UPLOAD_TIME INTEGER NOT NULL,
+                FETCH_TIME INTEGER
             )
             """
         )
+        ensure_column(self.cursor, "VIDEOS", "FETCH_TIME", "INTEGER")
+        # NOTE: 列出视频时沿索引按 (PUBLISH_TIME, BVID) 顺序读取，分页位置直接定位
+        self.cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS VIDEOS_PUBLISH_TIME
+            ON VIDEOS (PUBLISH_TIME, BVID)
+            """
+        )
 
-    def save_video(self, video: Video) -> None:
+    @timed("db.save_video")
+    @retry_busy
+    def save_video(self, video: Video, fetch_time: Optional[int] = None) -> None:
         self.cursor.execute(
             """
-            INSERT OR REPLACE INTO VIDEOS (BVID, TITLE, DESCRIPTION, PUBLISH_TIME, UPLOAD_TIME)
-            VALUES (?, ?, ?, ?, ?)
+            INSERT OR REPLACE INTO VIDEOS
+            (BVID, TITLE, DESCRIPTION, PUBLISH_TIME, UPLOAD_TIME, FETCH_TIME)
+            VALUES (?, ?, ?, ?, ?, ?)
             """,
             (
                 video.bvid,
@@ -419,10 +1540,12 @@ class VideoDatabase:
                 video.description,
                 video.publish_time,
                 video.upload_time,
+                fetch_time if fetch_time is not None else int(time.time()),
             ),
         )
         self.connection.commit()
 
+    @timed("db.load_video_by_bvid")
     def load_video_by_bvid(self, bvid: str) -> Optional[Video]:
         self.cursor.execute(
             """
@@ -437,3 +1560,543 @@ class VideoDatabase:
             return None
         video = self.video_parser.parse_from_record(record)
         return video
+
+    def query_videos(
+        self,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        after: Optional[tuple[int, str]] = None,
+        limit: Optional[int] = None,
+        ascending: bool = False,
+    ) -> Iterator[Video]:
+        """
+        按发布时间逐个返回视频，按 (PUBLISH_TIME, BVID) 排序，默认从新到旧
+
+        `after` 为上一页最后一个视频的 (PUBLISH_TIME, BVID)，从其后继续（键集分页）
+        """
+        conditions: list[str] = []
+        parameters: list[int | str] = []
+        if start is not None:
+            conditions.append("PUBLISH_TIME >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append("PUBLISH_TIME < ?")
+            parameters.append(end)
+        operator, direction = (">", "ASC") if ascending else ("<", "DESC")
+        if after is not None:
+            conditions.append(f"(PUBLISH_TIME, BVID) {operator} (?, ?)")
+            parameters.extend(after)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        if limit is not None:
+            parameters.append(limit)
+
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"""
+            SELECT BVID, TITLE, DESCRIPTION, PUBLISH_TIME, UPLOAD_TIME
+            FROM VIDEOS
+            {where}
+            ORDER BY PUBLISH_TIME {direction}, BVID {direction}
+            {"LIMIT ?" if limit is not None else ""}
+            """,
+            parameters,
+        )
+        while records := cursor.fetchmany(FETCH_BATCH_SIZE):
+            for record in records:
+                yield self.video_parser.parse_from_record(record)
+        cursor.close()
+
+
+class SketchDatabase:
+    """
+    按视频、按时间窗口（默认一天）保存的 HyperLogLog 去重计数草图
+
+    NAME 为统计对象，目前有 "members"（评论用户 UID）和 "locations"（IP 属地）
+    """
+
+    def __init__(self, dbpath: str, window: int = SKETCH_WINDOW):
+        self.connection = connect(dbpath)
+        self.cursor = self.connection.cursor()
+        self.window: int = window
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS SKETCHES (
+                OID INTEGER NOT NULL,
+                OTYPE TEXT NOT NULL,
+                NAME TEXT NOT NULL,
+                WINDOW INTEGER NOT NULL,
+                SKETCH BLOB NOT NULL,
+                PRIMARY KEY (OID, OTYPE, NAME, WINDOW)
+            )
+            """
+        )
+
+    @timed("db.save_sketches")
+    @retry_busy
+    def save_replies(self, replies: Collection[Reply]) -> None:
+        sketches: dict[tuple[int, str, str, int], HyperLogLog] = {}
+        for reply in ReplyParser.unroll_replies(replies):
+            window = reply.ctime - reply.ctime % self.window
+            values = {"members": reply.mid, "locations": reply.location}
+            for name, value in values.items():
+                if value is None:
+                    continue
+                key = (reply.oid, reply.otype.name, name, window)
+                if key not in sketches:
+                    sketches[key] = HyperLogLog()
+                sketches[key].add(value)
+
+        for (oid, otype, name, window), sketch in sketches.items():
+            self.cursor.execute(
+                """
+                SELECT SKETCH
+                FROM SKETCHES
+                WHERE OID = ? AND OTYPE = ? AND NAME = ? AND WINDOW = ?
+                """,
+                (oid, otype, name, window),
+            )
+            record: Record = self.cursor.fetchone()
+            if record is not None:
+                (stored,) = record
+                sketch = sketch.merge(HyperLogLog.from_bytes(stored))
+            self.cursor.execute(
+                """
+                INSERT OR REPLACE INTO SKETCHES (OID, OTYPE, NAME, WINDOW, SKETCH)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (oid, otype, name, window, sketch.to_bytes()),
+            )
+        self.connection.commit()
+
+    @timed("db.load_sketch")
+    def load_sketch(
+        self,
+        name: str,
+        oid: Optional[int] = None,
+        otype: Optional[CommentResourceType] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> Optional[HyperLogLog]:
+        """合并满足条件的所有草图，`oid` 为空时跨视频合并，[start, end) 限定时间窗口"""
+        conditions: list[str] = ["NAME = ?"]
+        parameters: list[str | int] = [name]
+        if oid is not None:
+            conditions.append("OID = ?")
+            parameters.append(oid)
+        if otype is not None:
+            conditions.append("OTYPE = ?")
+            parameters.append(otype.name)
+        if start is not None:
+            conditions.append("WINDOW >= ?")
+            parameters.append(start - start % self.window)
+        if end is not None:
+            conditions.append("WINDOW < ?")
+            parameters.append(end)
+        self.cursor.execute(
+            f"""
+            SELECT SKETCH
+            FROM SKETCHES
+            WHERE {" AND ".join(conditions)}
+            """,
+            parameters,
+        )
+        merged: Optional[HyperLogLog] = None
+        for (stored,) in self.cursor:
+            sketch = HyperLogLog.from_bytes(stored)
+            merged = sketch if merged is None else merged.merge(sketch)
+        return merged
+
+
+class MetricDatabase:
+    """
+    评论点赞数和回复数的追加式历史，每行为 (RPID, FETCH_TIME) 时相对上一次观测的增量
+
+    NOTE: 首次观测记录绝对值，之后数值未变化的评论不追加新行；
+    最新的绝对值和评论所属的资源单独存放在 REPLY_METRICS_LATEST 中，每条评论一行，
+    计算增量时无需回放历史，历史行也不必重复存储 OID/OTYPE
+    """
+
+    def __init__(self, dbpath: str):
+        self.connection = connect(dbpath)
+        self.cursor = self.connection.cursor()
+        create_resource_types(self.cursor)
+        if "OID" in table_columns(self.cursor, "REPLY_METRICS"):
+            self.encode_legacy_metrics()
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS REPLY_METRICS (
+                RPID INTEGER NOT NULL,
+                FETCH_TIME INTEGER NOT NULL,
+                LIKE_DELTA INTEGER NOT NULL,
+                RCOUNT_DELTA INTEGER NOT NULL,
+                PRIMARY KEY (RPID, FETCH_TIME)
+            ) WITHOUT ROWID
+            """
+        )
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS REPLY_METRICS_LATEST (
+                RPID INTEGER PRIMARY KEY,
+                OID INTEGER NOT NULL,
+                OTYPE INTEGER NOT NULL REFERENCES RESOURCE_TYPES (ID),
+                FETCH_TIME INTEGER NOT NULL,
+                LIKES INTEGER NOT NULL,
+                RCOUNT INTEGER NOT NULL
+            )
+            """
+        )
+        self.cursor.execute(
+            """
+            CREATE INDEX IF NOT EXISTS REPLY_METRICS_LATEST_RESOURCE
+            ON REPLY_METRICS_LATEST (OID, OTYPE)
+            """
+        )
+        self.connection.commit()
+
+    def encode_legacy_metrics(self) -> None:
+        """将旧版本每行历史都存储 OID/OTYPE 的数值历史迁移为按评论存储资源"""
+        self.cursor.executescript(
+            """
+            BEGIN;
+            CREATE TABLE REPLY_METRICS_LATEST_ENCODED (
+                RPID INTEGER PRIMARY KEY,
+                OID INTEGER NOT NULL,
+                OTYPE INTEGER NOT NULL REFERENCES RESOURCE_TYPES (ID),
+                FETCH_TIME INTEGER NOT NULL,
+                LIKES INTEGER NOT NULL,
+                RCOUNT INTEGER NOT NULL
+            );
+            INSERT INTO REPLY_METRICS_LATEST_ENCODED
+            SELECT LATEST.RPID, RESOURCES.OID, RESOURCE_TYPES.ID, LATEST.FETCH_TIME,
+                LATEST.LIKES, LATEST.RCOUNT
+            FROM REPLY_METRICS_LATEST AS LATEST
+            JOIN (
+                SELECT RPID, MIN(OID) AS OID, MIN(OTYPE) AS OTYPE
+                FROM REPLY_METRICS
+                GROUP BY RPID
+            ) AS RESOURCES ON RESOURCES.RPID = LATEST.RPID
+            JOIN RESOURCE_TYPES ON RESOURCE_TYPES.VALUE = RESOURCES.OTYPE;
+
+            CREATE TABLE REPLY_METRICS_ENCODED (
+                RPID INTEGER NOT NULL,
+                FETCH_TIME INTEGER NOT NULL,
+                LIKE_DELTA INTEGER NOT NULL,
+                RCOUNT_DELTA INTEGER NOT NULL,
+                PRIMARY KEY (RPID, FETCH_TIME)
+            ) WITHOUT ROWID;
+            INSERT INTO REPLY_METRICS_ENCODED
+            SELECT RPID, FETCH_TIME, LIKE_DELTA, RCOUNT_DELTA
+            FROM REPLY_METRICS;
+
+            DROP TABLE REPLY_METRICS;
+            DROP TABLE REPLY_METRICS_LATEST;
+            ALTER TABLE REPLY_METRICS_ENCODED RENAME TO REPLY_METRICS;
+            ALTER TABLE REPLY_METRICS_LATEST_ENCODED RENAME TO REPLY_METRICS_LATEST;
+            COMMIT;
+            """
+        )
+
+    def load_latest(self, rpids: Collection[int]) -> dict[int, Record]:
+        """返回各评论最近一次观测的 (FETCH_TIME, LIKES, RCOUNT)"""
+        latest: dict[int, Record] = {}
+        rpids = list(rpids)
+        for start in range(0, len(rpids), FETCH_BATCH_SIZE):
+            batch = rpids[start : start + FETCH_BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            self.cursor.execute(
+                f"""
+                SELECT RPID, FETCH_TIME, LIKES, RCOUNT
+                FROM REPLY_METRICS_LATEST
+                WHERE RPID IN ({placeholders})
+                """,
+                batch,
+            )
+            for rpid, *record in self.cursor.fetchall():
+                latest[rpid] = tuple(record)
+        return latest
+
+    @timed("db.save_metrics")
+    @retry_busy
+    def save_metrics(self, raw_replies: Collection[ApiRaw], fetch_time: int) -> int:
+        """记录一次抓取观测到的评论数值（含子评论），返回追加的历史行数"""
+        observed: dict[int, ApiRaw] = {}
+        pending: list[ApiRaw] = list(raw_replies)
+        while pending:
+            raw_reply = pending.pop()
+            observed[raw_reply["rpid"]] = raw_reply
+            if raw_reply.get("replies") is not None:
+                pending.extend(raw_reply["replies"])
+
+        latest = self.load_latest(observed)
+        history: list[Record] = []
+        updates: list[Record] = []
+        for rpid, raw_reply in observed.items():
+            likes: int = raw_reply.get("like", 0)
+            rcount: int = raw_reply.get("rcount", 0)
+            previous = latest.get(rpid)
+            if previous is None:
+                previous_likes, previous_rcount = 0, 0
+            else:
+                previous_time, previous_likes, previous_rcount = previous
+                # NOTE: 忽略早于或等于最近一次观测的数据，例如重复导入同一次抓取
+                if fetch_time <= previous_time:
+                    continue
+                if likes == previous_likes and rcount == previous_rcount:
+                    continue
+            history.append(
+                (rpid, fetch_time, likes - previous_likes, rcount - previous_rcount)
+            )
+            updates.append(
+                (
+                    rpid,
+                    raw_reply["oid"],
+                    CommentResourceType(raw_reply["type"]).value,
+                    fetch_time,
+                    likes,
+                    rcount,
+                )
+            )
+
+        self.cursor.executemany(
+            """
+            INSERT OR REPLACE INTO REPLY_METRICS
+                (RPID, FETCH_TIME, LIKE_DELTA, RCOUNT_DELTA)
+            VALUES (?, ?, ?, ?)
+            """,
+            history,
+        )
+        self.cursor.executemany(
+            """
+            INSERT OR REPLACE INTO REPLY_METRICS_LATEST
+                (RPID, OID, OTYPE, FETCH_TIME, LIKES, RCOUNT)
+            VALUES (?, ?, ?, ?, ?, ?)
+            """,
+            updates,
+        )
+        count("db.metrics.rows_written", len(history))
+        with timer("db.commit"):
+            self.connection.commit()
+        return len(history)
+
+    def _load_history(
+        self,
+        conditions: list[str],
+        parameters: list[Any],
+        start: Optional[int],
+        end: Optional[int],
+    ) -> list[Record]:
+        # NOTE: 绝对值由窗口函数对增量累加得到，因此只限制结束时间，开始时间在外层过滤
+        if end is not None:
+            conditions.append("FETCH_TIME < ?")
+            parameters.append(end)
+        parameters.append(start or 0)
+        self.cursor.execute(
+            f"""
+            SELECT FETCH_TIME, LIKES, RCOUNT
+            FROM (
+                SELECT FETCH_TIME,
+                    SUM(SUM(LIKE_DELTA)) OVER (ORDER BY FETCH_TIME) AS LIKES,
+                    SUM(SUM(RCOUNT_DELTA)) OVER (ORDER BY FETCH_TIME) AS RCOUNT
+                FROM REPLY_METRICS
+                WHERE {" AND ".join(conditions)}
+                GROUP BY FETCH_TIME
+            )
+            WHERE FETCH_TIME >= ?
+            ORDER BY FETCH_TIME
+            """,
+            parameters,
+        )
+        return self.cursor.fetchall()
+
+    def load_reply_resource(self, rpid: int) -> Optional[tuple[int, CommentResourceType]]:
+        """返回有数值历史的评论所属的 (OID, OTYPE)，没有历史时返回 None"""
+        self.cursor.execute(
+            """
+            SELECT OID, OTYPE
+            FROM REPLY_METRICS_LATEST
+            WHERE RPID = ?
+            """,
+            (rpid,),
+        )
+        record: Optional[Record] = self.cursor.fetchone()
+        if record is None:
+            return None
+        oid, otype = record
+        return oid, CommentResourceType(otype)
+
+    def load_reply_history(
+        self, rpid: int, start: Optional[int] = None, end: Optional[int] = None
+    ) -> list[Record]:
+        """返回评论在 [start, end) 内每次数值变化后的 (FETCH_TIME, LIKES, RCOUNT)"""
+        return self._load_history(["RPID = ?"], [rpid], start, end)
+
+    def load_resource_history(
+        self,
+        oid: int,
+        otype: CommentResourceType,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+    ) -> list[Record]:
+        """返回资源下全部评论在 [start, end) 内每次抓取后的 (FETCH_TIME, 总点赞数, 总回复数)"""
+        # NOTE: 沿 REPLY_METRICS_LATEST 的资源索引找到评论，再按主键读取各评论的历史
+        return self._load_history(
+            [
+                """
+                RPID IN (
+                    SELECT RPID
+                    FROM REPLY_METRICS_LATEST
+                    WHERE OID = ? AND OTYPE = ?
+                )
+                """
+            ],
+            [oid, otype.value],
+            start,
+            end,
+        )
+
+
+class SampleDatabase:
+    """
+    按页抽样抓取时抽中的根评论，每个视频只保留最近一次抽样
+
+    NOTE: 数据库中还可能有之前完整抓取或其他抽样留下的评论，
+    `analyze --confidence` 只统计这里记录的评论，保证估计只基于随机抽中的页
+    """
+
+    def __init__(self, dbpath: str):
+        self.connection = connect(dbpath)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS REPLY_SAMPLES (
+                OID INTEGER NOT NULL,
+                OTYPE TEXT NOT NULL,
+                RPID INTEGER NOT NULL,
+                FETCH_TIME INTEGER NOT NULL,
+                PRIMARY KEY (OID, OTYPE, RPID)
+            ) WITHOUT ROWID
+            """
+        )
+
+    @retry_busy
+    def save_sample(
+        self,
+        oid: int,
+        otype: CommentResourceType,
+        rpids: Collection[int],
+        fetch_time: Optional[int] = None,
+    ) -> None:
+        """以新的抽样替换资源之前的抽样"""
+        if fetch_time is None:
+            fetch_time = int(time.time())
+        self.cursor.execute(
+            """
+            DELETE FROM REPLY_SAMPLES
+            WHERE OID = ? AND OTYPE = ?
+            """,
+            (oid, otype.name),
+        )
+        self.cursor.executemany(
+            """
+            INSERT OR IGNORE INTO REPLY_SAMPLES (OID, OTYPE, RPID, FETCH_TIME)
+            VALUES (?, ?, ?, ?)
+            """,
+            [(oid, otype.name, rpid, fetch_time) for rpid in rpids],
+        )
+        self.connection.commit()
+
+    def load_sample(self, oid: int, otype: CommentResourceType) -> list[int]:
+        """返回资源最近一次抽样的根评论 RPID，没有抽样时返回空列表"""
+        self.cursor.execute(
+            """
+            SELECT RPID
+            FROM REPLY_SAMPLES
+            WHERE OID = ? AND OTYPE = ?
+            """,
+            (oid, otype.name),
+        )
+        return [rpid for (rpid,) in self.cursor.fetchall()]
+
+
+class WatchDatabase:
+    """
+    持续抓取的视频列表及其调度状态，`watch` 重启后从 NEXT_POLL 继续调度
+
+    VELOCITY 为最近一次抓取后估计的根评论发布速度（条/秒），FAILURES 为连续失败次数
+    """
+
+    def __init__(self, dbpath: str):
+        self.connection = connect(dbpath)
+        self.cursor = self.connection.cursor()
+        self.cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS WATCHLIST (
+                BVID TEXT PRIMARY KEY,
+                ADDED_TIME INTEGER NOT NULL,
+                LAST_POLL INTEGER,
+                NEXT_POLL INTEGER NOT NULL,
+                VELOCITY REAL,
+                FAILURES INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+
+    @retry_busy
+    def add_videos(self, bvids: Collection[str], now: Optional[int] = None) -> int:
+        """加入视频并立即调度，已在列表中的视频保持原有调度，返回新加入的数量"""
+        if now is None:
+            now = int(time.time())
+        before = self.connection.total_changes
+        self.cursor.executemany(
+            """
+            INSERT OR IGNORE INTO WATCHLIST (BVID, ADDED_TIME, NEXT_POLL)
+            VALUES (?, ?, ?)
+            """,
+            [(bvid, now, now) for bvid in bvids],
+        )
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    @retry_busy
+    def remove_videos(self, bvids: Collection[str]) -> int:
+        before = self.connection.total_changes
+        self.cursor.executemany(
+            """
+            DELETE FROM WATCHLIST
+            WHERE BVID = ?
+            """,
+            [(bvid,) for bvid in bvids],
+        )
+        self.connection.commit()
+        return self.connection.total_changes - before
+
+    def load_watchlist(self) -> list[Record]:
+        """返回 (BVID, LAST_POLL, NEXT_POLL, VELOCITY, FAILURES)，按 NEXT_POLL 排序"""
+        self.cursor.execute(
+            """
+            SELECT BVID, LAST_POLL, NEXT_POLL, VELOCITY, FAILURES
+            FROM WATCHLIST
+            ORDER BY NEXT_POLL, BVID
+            """
+        )
+        return self.cursor.fetchall()
+
+    @retry_busy
+    def save_schedule(
+        self,
+        bvid: str,
+        last_poll: int,
+        next_poll: int,
+        velocity: Optional[float],
+        failures: int,
+    ) -> None:
+        # NOTE: 只更新仍在列表中的视频，抓取期间被移除的视频不会被重新加入
+        self.cursor.execute(
+            """
+            UPDATE WATCHLIST
+            SET LAST_POLL = ?, NEXT_POLL = ?, VELOCITY = ?, FAILURES = ?
+            WHERE BVID = ?
+            """,
+            (last_poll, next_poll, velocity, failures, bvid),
+        )
+        self.connection.commit()
@@ -0,0 +1,227 @@
+import csv
+import gzip
+import json
+import os
+from typing import IO, Any, Optional, Protocol
+from collections.abc import Iterable
+
+from .bvid import aid2bvid
+from .parse import Record
+
+EXPORT_FIELDS: tuple[str, ...] = (
+    "bvid",
+    "rpid",
+    "oid",
+    "otype",
+    "mid",
+    "root",
+    "parent",
+    "message",
+    "ctime",
+    "location",
+    "name",
+    "sex",
+    "sign",
+    "level",
+    "vip",
+    "pendant",
+    "cardbag",
+)
+
+
+def to_row(record: Record) -> tuple[Any, ...]:
+    """将 ReplyDatabase.load_reply_rows 的记录补上 BVID 列"""
+    oid, otype = record[1], record[2]
+    bvid: Optional[str] = aid2bvid(oid) if otype == "VIDEO" else None
+    return (bvid, *record)
+
+
+class Exporter(Protocol):
+    extension: str
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None: ...
+
+    def close(self) -> None: ...
+
+
+def _open_text(filepath: str, compress: bool) -> IO[str]:
+    if compress:
+        return gzip.open(filepath, "wt", encoding="utf-8", newline="")
+    return open(filepath, "w", encoding="utf-8", newline="")
+
+
+class CsvExporter:
+    extension = "csv"
+
+    def __init__(self, filepath: str, compress: bool = False):
+        self.file: IO[str] = _open_text(filepath, compress)
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(EXPORT_FIELDS)
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class JsonlExporter:
+    extension = "jsonl"
+
+    def __init__(self, filepath: str, compress: bool = False):
+        self.file: IO[str] = _open_text(filepath, compress)
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        self.file.writelines(
+            json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _arrow_schema():
+    try:
+        import pyarrow
+    except ImportError as error:
+        raise ImportError("Columnar export requires 'pyarrow' to be installed") from error
+
+    integer, string = pyarrow.int64(), pyarrow.string()
+    types = {
+        "rpid": integer,
+        "oid": integer,
+        "mid": integer,
+        "root": integer,
+        "parent": integer,
+        "ctime": integer,
+        "level": integer,
+    }
+    return pyarrow, pyarrow.schema(
+        [(field, types.get(field, string)) for field in EXPORT_FIELDS]
+    )
+
+
+def _arrow_batch(pyarrow, schema, rows: list[tuple[Any, ...]]):
+    columns = list(zip(*rows))
+    return pyarrow.record_batch(
+        [
+            pyarrow.array(column, type=field.type)
+            for column, field in zip(columns, schema)
+        ],
+        schema=schema,
+    )
+
+
+class ParquetExporter:
+    extension = "parquet"
+
+    def __init__(self, filepath: str, compress: bool = False):
+        self.pyarrow, self.schema = _arrow_schema()
+        import pyarrow.parquet
+
+        self.writer = pyarrow.parquet.ParquetWriter(
+            filepath, self.schema, compression="gzip" if compress else "snappy"
+        )
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        self.writer.write_batch(_arrow_batch(self.pyarrow, self.schema, rows))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+class ArrowExporter:
+    extension = "arrow"
+
+    def __init__(self, filepath: str, compress: bool = False):
+        self.pyarrow, self.schema = _arrow_schema()
+        # NOTE: Arrow IPC 不支持 gzip，压缩时使用 zstd
+        options = self.pyarrow.ipc.IpcWriteOptions(
+            compression="zstd" if compress else None
+        )
+        self.writer = self.pyarrow.ipc.new_file(filepath, self.schema, options=options)
+
+    def write(self, rows: list[tuple[Any, ...]]) -> None:
+        self.writer.write_batch(_arrow_batch(self.pyarrow, self.schema, rows))
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+EXPORTERS: dict[str, type] = {
+    "csv": CsvExporter,
+    "jsonl": JsonlExporter,
+    "parquet": ParquetExporter,
+    "arrow": ArrowExporter,
+}
+
+
+def export_filename(name: str, file_format: str, compress: bool) -> str:
+    filename = f"{name}.{EXPORTERS[file_format].extension}"
+    if compress and file_format in ("csv", "jsonl"):
+        filename += ".gz"
+    return filename
+
+
+def export_replies(
+    batches: Iterable[list[Record]],
+    output: str,
+    file_format: str = "csv",
+    compress: bool = False,
+    split: bool = False,
+) -> dict[str, int]:
+    """
+    流式导出评论，返回每个输出文件写入的行数
+
+    `split` 为真时 `output` 为目录，每个视频一个文件，要求记录按视频排序
+    """
+    exporter_type = EXPORTERS[file_format]
+    counts: dict[str, int] = {}
+    exporter: Optional[Exporter] = None
+    current: Optional[tuple[int, str]] = None
+    filepath: str = output
+
+    if split:
+        os.makedirs(output, exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    try:
+        for batch in batches:
+            rows = [to_row(record) for record in batch]
+            if not split:
+                if exporter is None:
+                    exporter = exporter_type(filepath, compress)
+                    counts[filepath] = 0
+                exporter.write(rows)
+                counts[filepath] += len(rows)
+                continue
+
+            start = 0
+            for index, row in enumerate(rows):
+                resource = (row[2], row[3])
+                if resource == current:
+                    continue
+                if exporter is not None and index > start:
+                    exporter.write(rows[start:index])
+                    counts[filepath] += index - start
+                if exporter is not None:
+                    # NOTE: 新文件创建失败时 finally 中不能再次关闭已关闭的文件
+                    exporter.close()
+                    exporter = None
+                current, start = resource, index
+                name = row[0] if row[0] is not None else f"{row[3]}-{row[2]}"
+                filepath = os.path.join(
+                    output, export_filename(name, file_format, compress)
+                )
+                exporter = exporter_type(filepath, compress)
+                counts[filepath] = 0
+            if exporter is not None and start < len(rows):
+                exporter.write(rows[start:])
+                counts[filepath] += len(rows) - start
+    finally:
+        if exporter is not None:
+            exporter.close()
+
+    return counts
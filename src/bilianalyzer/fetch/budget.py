@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from ..metrics import count
+
+
+class RequestBudget:
+    """
+    多个抓取任务共享的全局请求速率限制（令牌桶），每个请求前 `acquire` 一个令牌
+
+    NOTE: 只在事件循环线程中使用，不需要加锁；令牌不足时按缺口计算等待时间
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate: float = rate
+        self.capacity: float = float(burst)
+        self.tokens: float = float(burst)
+        self.updated: float = time.monotonic()
+
+    async def acquire(self) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            count("fetch.budget_waits")
+            await asyncio.sleep((1 - self.tokens) / self.rate)
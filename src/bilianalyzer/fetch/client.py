@@ -0,0 +1,33 @@
+from typing import Any
+from urllib.parse import urlsplit
+
+from bilibili_api import register_client
+from bilibili_api.clients.HTTPXClient import HTTPXClient
+from bilibili_api.utils.network import BiliAPIResponse
+
+CLIENT_NAME = "bilianalyzer"
+
+
+def rewrite_url(url: str, api_base: str) -> str:
+    """将 *.bilibili.com 的请求地址改写到 `api_base`，保留路径"""
+    parts = urlsplit(url)
+    if parts.hostname is None or not parts.hostname.endswith("bilibili.com"):
+        return url
+    return api_base.rstrip("/") + parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class RewriteClient(HTTPXClient):
+    """请求前改写 API 地址的 httpx 客户端，用于指向本地 mock 服务器"""
+
+    api_base: str = ""
+
+    async def request(
+        self, method: str = "", url: str = "", **kwargs: Any
+    ) -> BiliAPIResponse:
+        return await super().request(method, rewrite_url(url, self.api_base), **kwargs)
+
+
+def use_api_base(api_base: str) -> None:
+    """让 bilibili_api 的所有请求都发往 `api_base`，例如 http://127.0.0.1:8000"""
+    RewriteClient.api_base = api_base
+    register_client(CLIENT_NAME, RewriteClient, {"http2": False})
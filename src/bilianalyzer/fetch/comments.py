@@ -1,17 +1,84 @@
 import asyncio
 import math
 import random
-from typing import Optional
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional
 from collections.abc import Collection
 
-from bilibili_api import Credential, bvid2aid
-from bilibili_api.comment import CommentResourceType, get_comments
+from bilibili_api import Credential, NetworkException, ResponseCodeException
+from bilibili_api.comment import get_comments
 
-from .. import Reply
-from ..parse import ApiRaw, ReplyParser
-from ..database import RawDatabase, ReplyDatabase
+from .. import CommentResourceType, Reply
+from ..bvid import bvid2aid
+from ..parse import ApiRaw, MemberParser, ReplyParser, VideoParser
+from ..database import (
+    MemberDatabase,
+    MetricDatabase,
+    RawDatabase,
+    ReplyDatabase,
+    SaveSummary,
+    SketchDatabase,
+    VideoDatabase,
+)
+from ..metrics import count, gauge, timed, timer
+from .budget import RequestBudget
+from .service import ServiceInfo, WriterClient
+from .writer import RawReplyWriter
 
 COMMENTS_PER_PAGE = 20
+# NOTE: -412 为请求被风控拦截，-500/-503 为服务端临时错误
+RETRY_CODES: set[int] = {-412, -500, -503, -509}
+RETRY_STATUSES: set[int] = {412, 429, 500, 502, 503, 504}
+RETRY_BACKOFF = 1.0
+
+
+@dataclass
+class FetchStats:
+    """抓取过程的页数、重试次数、每页请求耗时、原始评论的新增/变化/未变行数和追加的数值历史行数"""
+
+    pages: int = 0
+    retries: int = 0
+    latencies: list[float] = field(default_factory=list)
+    raw: SaveSummary = field(default_factory=SaveSummary)
+    history: int = 0
+    # NOTE: 评论区的总页数；抽样抓取时 pages 远小于 page_count
+    page_count: int = 0
+    # NOTE: 抽样抓取时抽中的页数，第 1 页未被抽中时比 pages 少 1
+    sampled: int = 0
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, NetworkException):
+        return error.status in RETRY_STATUSES
+    if isinstance(error, ResponseCodeException):
+        return error.code in RETRY_CODES
+    return False
+
+
+def sample_page_indices(
+    page_count: int,
+    sample: int,
+    stratified: bool = False,
+    rng: Optional[random.Random] = None,
+) -> list[int]:
+    """
+    从第 1 页到第 `page_count` 页中抽取 `sample` 页，返回升序的页码
+
+    NOTE: 评论按时间倒序分页，分层抽样把页码等分为 `sample` 段、每段随机抽一页，
+    保证新老评论都被覆盖；简单随机抽样可能集中在某一时段
+    """
+    if rng is None:
+        rng = random.Random()
+    candidates = range(1, page_count + 1)
+    if sample >= len(candidates):
+        return list(candidates)
+    if not stratified:
+        return sorted(rng.sample(candidates, sample))
+    bounds = [len(candidates) * stratum // sample for stratum in range(sample + 1)]
+    return [
+        candidates[rng.randrange(start, stop)] for start, stop in zip(bounds, bounds[1:])
+    ]
 
 
 class ReplyFetcher:
@@ -22,6 +89,15 @@ class ReplyFetcher:
         reply_parser: Optional[ReplyParser] = None,
         reply_db: Optional[ReplyDatabase] = None,
         raw_db: Optional[RawDatabase] = None,
+        concurrency: int = 5,
+        delay: float = 1.0,
+        retries: int = 3,
+        metric_db: Optional[MetricDatabase | WriterClient] = None,
+        service: Optional[ServiceInfo] = None,
+        budget: Optional[RequestBudget] = None,
+        sample: int = 0,
+        stratified: bool = False,
+        seed: Optional[int] = None,
     ):
         self.bvid: str = bvid
         self.credential: Optional[Credential] = credential
@@ -30,38 +106,127 @@ class ReplyFetcher:
         self.reply_parser: ReplyParser = reply_parser
         self.reply_db: Optional[ReplyDatabase] = reply_db
         self.raw_db: Optional[RawDatabase] = raw_db
+        self.concurrency: int = concurrency
+        # NOTE: 每页请求前平均等待 delay 秒（±50% 随机抖动），为 0 时不等待
+        self.delay: float = delay
+        self.retries: int = retries
+        self.metric_db: Optional[MetricDatabase | WriterClient] = metric_db
+        # NOTE: 给出写入进程时原始评论交给写入进程保存
+        self.service: Optional[ServiceInfo] = service
+        # NOTE: 多个视频同时抓取时共享的请求速率限制，重试的请求同样计入
+        self.budget: Optional[RequestBudget] = budget
+        # NOTE: sample > 0 时从全部页中抽取 sample 页，不受 limit 限制；第 1 页只用于获取总页数，
+        # 未被抽中时不保存，也不保存置顶和热门评论，抽中的根评论记录在 sample_rpids 中
+        self.sample: int = sample
+        self.stratified: bool = stratified
+        self.rng: random.Random = random.Random(seed)
+        self.sample_rpids: list[int] = []
+        # NOTE: 同一次抓取写入的原始评论、解析结果和数值历史使用相同的抓取时间
+        self.fetch_time: Optional[int] = None
+        self.stats: FetchStats = FetchStats()
+        self.writer: Optional[RawReplyWriter] = None
 
-    async def fetch_page(self, index: int = 1) -> ApiRaw:
-        page: ApiRaw = await get_comments(
-            bvid2aid(self.bvid),
-            CommentResourceType.VIDEO,
-            index,
-            credential=self.credential,
-        )
-        if self.raw_db is not None:
-            self.raw_db.save_raw_replies(self.unroll_page(page))
+    async def fetch_page(self, index: int = 1, save: bool = True) -> ApiRaw:
+        attempt = 0
+        while True:
+            if self.budget is not None:
+                await self.budget.acquire()
+            start = time.perf_counter()
+            count("fetch.requests")
+            try:
+                with timer("fetch.request"):
+                    page: ApiRaw = await get_comments(
+                        bvid2aid(self.bvid),
+                        CommentResourceType.VIDEO,
+                        index,
+                        credential=self.credential,
+                    )
+                break
+            except (NetworkException, ResponseCodeException) as error:
+                if attempt >= self.retries or not is_retryable(error):
+                    count("fetch.failures")
+                    raise
+                # NOTE: 指数退避并加入随机抖动，避免并发请求同时重试
+                attempt += 1
+                self.stats.retries += 1
+                count("fetch.retries")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1) * random.random())
+        self.stats.pages += 1
+        self.stats.latencies.append(time.perf_counter() - start)
+        count("fetch.pages")
+        if save:
+            await self.save_page(page)
         return page
 
+    async def save_page(self, page: ApiRaw) -> None:
+        if self.writer is not None:
+            await self.writer.put(self.unroll_page(page))
+        elif self.raw_db is not None:
+            self.stats.raw.merge(
+                self.raw_db.save_raw_replies(self.unroll_page(page), self.fetch_time)
+            )
+
+    @timed("fetch.raw_replies")
     async def fetch_raw_replies(self, limit: int = 20) -> list[ApiRaw]:
+        self.fetch_time = fetch_time = int(time.time())
+        # NOTE: 原始评论交给写入线程保存，磁盘 I/O 不阻塞事件循环上的其他请求
+        if self.raw_db is None:
+            raw_replies = await self._fetch_raw_replies(limit)
+        else:
+            self.writer = RawReplyWriter(
+                self.raw_db.dbpath, fetch_time=fetch_time, service=self.service
+            )
+            self.writer.start()
+            try:
+                raw_replies = await self._fetch_raw_replies(limit)
+            finally:
+                writer, self.writer = self.writer, None
+                await writer.close()
+                self.stats.raw.merge(writer.summary)
+        if self.metric_db is not None:
+            self.stats.history += self.metric_db.save_metrics(raw_replies, fetch_time)
+        return raw_replies
+
+    async def _fetch_raw_replies(self, limit: int) -> list[ApiRaw]:
         # TODO: recursively fetch sub-replies
-        page: ApiRaw = await self.fetch_page()
+        page: ApiRaw = await self.fetch_page(save=self.sample == 0)
         reply_count: int = page.get("page", {}).get("count", 0)
         page_count: int = math.ceil(reply_count / COMMENTS_PER_PAGE)
-        raw_replies: list[ApiRaw] = self.unroll_page(page) + self.unroll_hots(page)
-        page_indices: Collection[int] = (
-            range(2, page_count + 1)
-            if limit == 0
-            else range(2, min(page_count, limit) + 1)
-        )
+        self.stats.page_count = page_count
+        raw_replies: list[ApiRaw] = []
+        page_indices: Collection[int]
+        if self.sample > 0:
+            # NOTE: 第 1 页与其他页同等地参与抽样，抽中时直接使用已请求的结果
+            page_indices = sample_page_indices(
+                page_count, self.sample, self.stratified, self.rng
+            )
+            self.stats.sampled = len(page_indices)
+            if page_indices[:1] == [1]:
+                await self.save_page(page)
+                raw_replies.extend(self.unroll_page(page))
+                page_indices = page_indices[1:]
+        else:
+            raw_replies.extend(self.unroll_page(page) + self.unroll_hots(page))
+            page_indices = (
+                range(2, page_count + 1)
+                if limit == 0
+                else range(2, min(page_count, limit) + 1)
+            )
         # TODO: refactor page_index_range
 
         # TODO: early termination if empty page is fetched
-        semaphore = asyncio.Semaphore(5)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # NOTE: 等待信号量的页数即请求队列深度
+        waiting: int = len(page_indices)
 
         async def fetch_page_with_semaphore(page_index: int) -> ApiRaw:
+            nonlocal waiting
             async with semaphore:
-                # sleep 0.5-1.5s to avoid rate limit
-                await asyncio.sleep(0.5 + random.random())
+                waiting -= 1
+                gauge("fetch.queue_depth", waiting)
+                # sleep 0.5-1.5x delay to avoid rate limit
+                if self.delay > 0:
+                    await asyncio.sleep(self.delay * (0.5 + random.random()))
                 return await self.fetch_page(page_index)
 
         fetch_tasks = [fetch_page_with_semaphore(page_index) for page_index in page_indices]
@@ -69,6 +234,8 @@ class ReplyFetcher:
 
         for page in pages:
             raw_replies.extend(self.unroll_page(page))
+        if self.sample > 0:
+            self.sample_rpids = [raw_reply["rpid"] for raw_reply in raw_replies]
 
         return raw_replies
 
@@ -76,7 +243,7 @@ class ReplyFetcher:
         raw_replies: list[ApiRaw] = await self.fetch_raw_replies(limit)
         replies: list[Reply] =  self.reply_parser.batch_parse_from_api(raw_replies)
         if self.reply_db is not None:
-            self.reply_db.save_replies(replies)
+            self.reply_db.save_replies(replies, self.fetch_time)
         return replies
 
     @staticmethod
@@ -93,3 +260,64 @@ class ReplyFetcher:
         if page.get("upper") is not None and page["upper"].get("top") is not None:
             raw_replies.append(page["upper"]["top"])
         return raw_replies
+
+
+@dataclass
+class CrawlDatabases:
+    """
+    抓取一个视频的评论时写入的数据库，按数据库文件（分片）缓存复用
+
+    NOTE: 各数据库的解析器使用独立的身份映射，不与同一进程中的其他解析器共享
+    """
+
+    raw: RawDatabase
+    video: VideoDatabase
+    member: MemberDatabase
+    reply: ReplyDatabase
+    sketch: SketchDatabase
+    metric: MetricDatabase
+
+    @classmethod
+    def open(cls, dbpath: str) -> "CrawlDatabases":
+        member_parser = MemberParser(shared=False)
+        member_db = MemberDatabase(dbpath, member_parser)
+        return cls(
+            RawDatabase(dbpath),
+            VideoDatabase(dbpath, VideoParser(shared=False)),
+            member_db,
+            ReplyDatabase(dbpath, member_db, ReplyParser(member_parser, shared=False)),
+            SketchDatabase(dbpath),
+            MetricDatabase(dbpath),
+        )
+
+
+async def crawl_comments(
+    bvid: str,
+    credential: Optional[Credential],
+    databases: CrawlDatabases,
+    limit: int = 10,
+    **options: Any,
+) -> ReplyFetcher:
+    """
+    抓取并保存一个视频的评论、评论者和评论摘要，返回抓取器以读取统计
+
+    NOTE: 供多个视频并发抓取时使用；每次抓取的解析器使用独立的身份映射，
+    并发的抓取不会读取或清空彼此解析的对象，抓取结束后映射随解析器释放
+    """
+    member_parser = MemberParser(shared=False)
+    reply_parser = ReplyParser(member_parser, shared=False)
+    reply_fetcher = ReplyFetcher(
+        bvid,
+        credential,
+        reply_parser,
+        databases.reply,
+        databases.raw,
+        metric_db=databases.metric,
+        **options,
+    )
+    replies = await reply_fetcher.fetch_replies(limit=limit)
+    databases.member.save_members(
+        list(member_parser.unroll_members(replies)), reply_fetcher.fetch_time
+    )
+    databases.sketch.save_replies(replies)
+    return reply_fetcher
@@ -0,0 +1,230 @@
+import base64
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from ..bvid import bvid2aid
+from ..parse import ApiRaw
+from ..synthetic import SyntheticConfig, SyntheticGenerator
+
+
+@dataclass
+class MockConfig:
+    """mock 服务器的延迟、限流和错误注入参数"""
+
+    latency: float = 0.05
+    jitter: float = 0.02
+    # NOTE: 令牌桶限流，每秒 rate_limit 个请求，突发 burst 个；为 0 时不限流
+    rate_limit: float = 0.0
+    burst: int = 10
+    error_rate: float = 0.0
+    seed: int = 0
+
+
+@dataclass
+class MockStats:
+    requests: int = 0
+    rate_limited: int = 0
+    errors: int = 0
+
+
+class MockHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # NOTE: 默认监听队列长度为 5，高并发时连接被丢弃会引入约 1 秒的 SYN 重传延迟
+    request_queue_size = 128
+
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate: float = rate
+        self.capacity: float = float(burst)
+        self.tokens: float = float(burst)
+        self.updated: float = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity, self.tokens + (now - self.updated) * self.rate
+            )
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class MockApiServer:
+    """
+    在本地提供评论、视频信息和投稿列表接口的 HTTP 服务器，数据来自 SyntheticGenerator
+
+    配合 `fetch.client.use_api_base` 使用，bilibili_api 的请求会被改写到此服务器
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        config: Optional[MockConfig] = None,
+        synthetic: Optional[SyntheticConfig] = None,
+    ):
+        if config is None:
+            config = MockConfig()
+        self.config: MockConfig = config
+        self.generator: SyntheticGenerator = SyntheticGenerator(synthetic)
+        self.stats: MockStats = MockStats()
+        self.bucket: Optional[TokenBucket] = None
+        if config.rate_limit > 0:
+            self.bucket = TokenBucket(config.rate_limit, config.burst)
+        self.random: random.Random = random.Random(config.seed)
+        self.lock = threading.Lock()
+        self.routes = {
+            "/x/v2/reply": self.handle_reply,
+            "/x/web-interface/view": self.handle_view,
+            "/x/web-interface/wbi/view": self.handle_view,
+            "/x/space/wbi/arc/search": self.handle_uploader,
+            "/x/web-interface/nav": self.handle_nav,
+            "/x/frontend/finger/spi": self.handle_spi,
+            "/x/internal/gaia-gateway/ExClimbWuzhi": self.handle_ok,
+        }
+        self.server = MockHTTPServer((host, port), self._handler_class())
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                server.dispatch(self)
+
+            def do_POST(self) -> None:
+                length = int(self.headers.get("Content-Length") or 0)
+                self.rfile.read(length)
+                server.dispatch(self)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        return Handler
+
+    def dispatch(self, request: BaseHTTPRequestHandler) -> None:
+        parts = urlsplit(request.path)
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        route = self.routes.get(parts.path)
+        # NOTE: 投稿列表接口需要的 w_webid 来自 UP 主动态页面 space.bilibili.com/<mid>/dynamic
+        if route is None and parts.path.endswith("/dynamic"):
+            route = self.handle_space
+
+        with self.lock:
+            self.stats.requests += 1
+            injected = self.random.random() < self.config.error_rate
+            delay = self.config.latency + self.random.uniform(0, self.config.jitter)
+        time.sleep(delay)
+
+        # NOTE: 只对评论和视频接口限流和注入错误，buvid/wbi 等辅助接口总是成功
+        limited = route in (self.handle_reply, self.handle_view, self.handle_uploader)
+        if limited and self.bucket is not None and not self.bucket.acquire():
+            with self.lock:
+                self.stats.rate_limited += 1
+            self.respond(request, 412, {"code": -412, "message": "请求被拦截"})
+        elif limited and injected:
+            with self.lock:
+                self.stats.errors += 1
+            self.respond(request, 500, {"code": -500, "message": "服务器错误"})
+        elif route is None:
+            self.respond(request, 404, {"code": -404, "message": "啥都木有"})
+        elif route == self.handle_space:
+            self.respond(request, 200, self.handle_space(params), "text/html")
+        else:
+            self.respond(request, 200, {"code": 0, "message": "0", "data": route(params)})
+
+    @staticmethod
+    def respond(
+        request: BaseHTTPRequestHandler,
+        status: int,
+        body: ApiRaw | str,
+        content_type: str = "application/json",
+    ) -> None:
+        if isinstance(body, str):
+            data = body.encode("utf-8")
+        else:
+            data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        request.send_response(status)
+        request.send_header("Content-Type", f"{content_type}; charset=utf-8")
+        request.send_header("Content-Length", str(len(data)))
+        request.end_headers()
+        request.wfile.write(data)
+
+    @staticmethod
+    def _aid(params: dict[str, str]) -> int:
+        if params.get("aid"):
+            return int(params["aid"])
+        return bvid2aid(params["bvid"])
+
+    def handle_reply(self, params: dict[str, str]) -> ApiRaw:
+        return self.generator.generate_page(int(params["oid"]), int(params.get("pn", 1)))
+
+    def handle_view(self, params: dict[str, str]) -> ApiRaw:
+        return self.generator.generate_video(self._aid(params))
+
+    def handle_uploader(self, params: dict[str, str]) -> ApiRaw:
+        return self.generator.generate_uploader_page(
+            int(params["mid"]), int(params.get("pn", 1)), int(params.get("ps", 30))
+        )
+
+    def handle_space(self, params: dict[str, str]) -> str:
+        # NOTE: access_id 为 JWT，bilibili_api 不校验签名，只读取 iat 和 ttl 判断何时过期
+        def encode(data: ApiRaw) -> str:
+            return (
+                base64.urlsafe_b64encode(json.dumps(data).encode()).decode().rstrip("=")
+            )
+
+        header = encode({"alg": "HS256", "typ": "JWT"})
+        payload = encode({"iat": int(time.time()), "ttl": 86400})
+        render_data = json.dumps({"access_id": f"{header}.{payload}.bW9jaw"})
+        return (
+            '<html><body><script id="__RENDER_DATA__" type="application/json">'
+            f"{render_data}</script></body></html>"
+        )
+
+    def handle_nav(self, params: dict[str, str]) -> ApiRaw:
+        base = "https://i0.hdslb.com/bfs/wbi/"
+        return {
+            "isLogin": False,
+            "wbi_img": {
+                "img_url": base + "7cd084941338484aae1ad9425b84077c.png",
+                "sub_url": base + "4932caff0ff746eab6f01bf08b70ac45.png",
+            },
+        }
+
+    def handle_spi(self, params: dict[str, str]) -> ApiRaw:
+        return {"b_3": "00000000-0000-0000-0000-000000000000infoc", "b_4": "mock"}
+
+    def handle_ok(self, params: dict[str, str]) -> ApiRaw:
+        return {}
+
+    def start(self) -> "MockApiServer":
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
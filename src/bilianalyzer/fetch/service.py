@@ -0,0 +1,163 @@
+import json
+import os
+import queue
+import secrets
+import threading
+from dataclasses import dataclass
+from multiprocessing.connection import Client, Connection, Listener
+from typing import Any, Optional
+from collections.abc import Collection
+
+from ..database import MetricDatabase, RawDatabase, SaveSummary
+from ..metrics import count, timer
+from ..parse import ApiRaw
+
+SERVICE_PATH = "bilianalyzer.writer"
+# NOTE: 写入进程只接受这些方法，请求中的 dbpath 决定写入哪个数据库（或分片）
+WRITER_METHODS: dict[str, type] = {
+    "save_raw_replies": RawDatabase,
+    "save_metrics": MetricDatabase,
+}
+
+Request = tuple[str, str, tuple[Any, ...]]
+
+
+class WriterError(Exception):
+    """写入进程执行请求失败"""
+
+
+@dataclass
+class ServiceInfo:
+    """写入进程的监听地址和认证密钥，保存在仅当前用户可读的文件中"""
+
+    host: str
+    port: int
+    authkey: bytes
+
+    @classmethod
+    def load(cls, path: str = SERVICE_PATH) -> Optional["ServiceInfo"]:
+        if not os.path.isfile(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["host"], data["port"], bytes.fromhex(data["authkey"]))
+
+    def save(self, path: str = SERVICE_PATH) -> None:
+        descriptor = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(descriptor, "w", encoding="utf-8") as f:
+            json.dump(
+                {"host": self.host, "port": self.port, "authkey": self.authkey.hex()}, f
+            )
+
+
+class WriterServer:
+    """
+    单写入进程：多个抓取进程通过本地 socket 发送原始评论和数值历史，由一个线程依次写入
+
+    NOTE: 每个连接由独立线程接收请求，写入线程为每个数据库文件只保留一个连接，
+    写事务在进程内串行执行，不再与其他进程争用数据库锁
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.authkey: bytes = secrets.token_bytes(32)
+        self.listener: Listener = Listener((host, port), authkey=self.authkey)
+        self.requests: queue.SimpleQueue[
+            Optional[tuple[Request, queue.SimpleQueue[tuple[bool, Any]]]]
+        ] = queue.SimpleQueue()
+        self.databases: dict[tuple[str, str], Any] = {}
+        self.summary: SaveSummary = SaveSummary()
+        self.history: int = 0
+        self.batches: int = 0
+
+    @property
+    def info(self) -> ServiceInfo:
+        host, port = self.listener.address
+        return ServiceInfo(host, port, self.authkey)
+
+    def serve_forever(self) -> None:
+        writer = threading.Thread(
+            target=self.write_loop, name="writer-service", daemon=True
+        )
+        writer.start()
+        try:
+            while True:
+                try:
+                    connection = self.listener.accept()
+                except OSError:
+                    break
+                threading.Thread(
+                    target=self.handle,
+                    args=(connection,),
+                    name="writer-client",
+                    daemon=True,
+                ).start()
+        finally:
+            self.requests.put(None)
+            writer.join()
+
+    def close(self) -> None:
+        self.listener.close()
+
+    def handle(self, connection: Connection) -> None:
+        replies: queue.SimpleQueue[tuple[bool, Any]] = queue.SimpleQueue()
+        with connection:
+            while True:
+                try:
+                    request: Request = connection.recv()
+                except EOFError:
+                    return
+                self.requests.put((request, replies))
+                connection.send(replies.get())
+
+    def write_loop(self) -> None:
+        while (item := self.requests.get()) is not None:
+            (method, dbpath, args), replies = item
+            try:
+                replies.put((True, self.execute(method, dbpath, args)))
+            except Exception as error:
+                replies.put((False, f"{type(error).__name__}: {error}"))
+        for database in self.databases.values():
+            database.connection.close()
+
+    def execute(self, method: str, dbpath: str, args: tuple[Any, ...]) -> Any:
+        if method not in WRITER_METHODS:
+            raise WriterError(f"Unsupported method: {method}")
+        database = self.databases.get((method, dbpath))
+        if database is None:
+            database = self.databases[(method, dbpath)] = WRITER_METHODS[method](dbpath)
+        with timer("service.write"):
+            result = getattr(database, method)(*args)
+        self.batches += 1
+        count("service.batches")
+        if isinstance(result, SaveSummary):
+            self.summary.merge(result)
+        elif isinstance(result, int):
+            self.history += result
+        return result
+
+
+class WriterClient:
+    """
+    写入进程的客户端，提供与 RawDatabase/MetricDatabase 相同的写入方法
+
+    NOTE: 连接不是线程安全的，每个写入线程各自创建客户端
+    """
+
+    def __init__(self, info: ServiceInfo, dbpath: str):
+        self.dbpath: str = dbpath
+        self.connection: Connection = Client((info.host, info.port), authkey=info.authkey)
+
+    def call(self, method: str, *args: Any) -> Any:
+        self.connection.send((method, self.dbpath, args))
+        ok, result = self.connection.recv()
+        if not ok:
+            raise WriterError(result)
+        return result
+
+    def save_raw_replies(
+        self, raw_replies: Collection[ApiRaw], fetch_time: Optional[int] = None
+    ) -> SaveSummary:
+        return self.call("save_raw_replies", list(raw_replies), fetch_time)
+
+    def save_metrics(self, raw_replies: Collection[ApiRaw], fetch_time: int) -> int:
+        return self.call("save_metrics", list(raw_replies), fetch_time)
@@ -0,0 +1,268 @@
+import asyncio
+import math
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+from collections.abc import Awaitable, Collection
+
+from bilibili_api import Credential, NetworkException, ResponseCodeException
+from bilibili_api.user import User
+
+from .. import CommentResourceType
+from ..bvid import bvid2aid
+from ..database import RawDatabase
+from ..parse import ApiRaw, VideoParser
+from ..metrics import count, gauge, timer
+from ..shards import ShardRouter
+from .budget import RequestBudget
+from .comments import RETRY_BACKOFF, CrawlDatabases, crawl_comments, is_retryable
+from .videos import VideoFetcher
+
+VIDEOS_PER_PAGE = 30
+
+
+@dataclass
+class UploaderStats:
+    """列出投稿的页数、重试次数、列出的视频数，以及其中已保存过的视频数"""
+
+    pages: int = 0
+    retries: int = 0
+    videos: int = 0
+    known: int = 0
+    # NOTE: 第一页与上次抓取一致时跳过其余页
+    cached: bool = False
+    bvids: list[str] = field(default_factory=list)
+
+
+class UploaderFetcher:
+    """按页并发列出 UP 主的全部投稿"""
+
+    def __init__(
+        self,
+        mid: int,
+        credential: Optional[Credential] = None,
+        concurrency: int = 5,
+        delay: float = 1.0,
+        retries: int = 3,
+        budget: Optional[RequestBudget] = None,
+    ):
+        self.mid: int = mid
+        self.credential: Optional[Credential] = credential
+        self.api_user = User(mid, credential=credential)
+        self.concurrency: int = concurrency
+        self.delay: float = delay
+        self.retries: int = retries
+        self.budget: Optional[RequestBudget] = budget
+        self.stats: UploaderStats = UploaderStats()
+
+    async def fetch_page(self, index: int = 1) -> ApiRaw:
+        attempt = 0
+        while True:
+            if self.budget is not None:
+                await self.budget.acquire()
+            count("fetch.requests")
+            try:
+                with timer("fetch.uploader_request"):
+                    page: ApiRaw = await self.api_user.get_videos(
+                        pn=index, ps=VIDEOS_PER_PAGE
+                    )
+                break
+            except (NetworkException, ResponseCodeException) as error:
+                if attempt >= self.retries or not is_retryable(error):
+                    count("fetch.failures")
+                    raise
+                attempt += 1
+                self.stats.retries += 1
+                count("fetch.retries")
+                await asyncio.sleep(RETRY_BACKOFF * 2 ** (attempt - 1) * random.random())
+        self.stats.pages += 1
+        count("fetch.uploader_pages")
+        return page
+
+    async def fetch_bvids(self, known: Collection[str] = (), limit: int = 0) -> list[str]:
+        """
+        列出投稿的 BVID，`known` 为已保存的该 UP 主的视频，`limit` 为最多抓取的页数（0 为不限）
+
+        NOTE: 投稿按发布时间倒序分页；若第一页的视频都已保存且投稿总数与已保存数相同，
+        说明上次抓取后没有新投稿，不再请求其余页
+        """
+        page = await self.fetch_page()
+        video_count: int = page.get("page", {}).get("count", 0)
+        bvids: list[str] = self.unroll_page(page)
+        if bvids and video_count == len(known) and all(bvid in known for bvid in bvids):
+            self.stats.cached = True
+            self.stats.bvids = list(known)
+            self.stats.videos = self.stats.known = len(known)
+            return self.stats.bvids
+
+        page_count = math.ceil(video_count / VIDEOS_PER_PAGE)
+        if limit > 0:
+            page_count = min(page_count, limit)
+        page_indices = range(2, page_count + 1)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        waiting: int = len(page_indices)
+
+        async def fetch_page_with_semaphore(page_index: int) -> ApiRaw:
+            nonlocal waiting
+            async with semaphore:
+                waiting -= 1
+                gauge("fetch.queue_depth", waiting)
+                if self.delay > 0:
+                    await asyncio.sleep(self.delay * (0.5 + random.random()))
+                return await self.fetch_page(page_index)
+
+        pages: list[ApiRaw] = await asyncio.gather(
+            *(fetch_page_with_semaphore(page_index) for page_index in page_indices)
+        )
+        for page in pages:
+            bvids.extend(self.unroll_page(page))
+
+        # NOTE: 分页期间有新投稿时列表整体后移，前一页末尾的视频会在下一页重复出现
+        self.stats.bvids = list(dict.fromkeys(bvids))
+        self.stats.videos = len(self.stats.bvids)
+        self.stats.known = sum(bvid in known for bvid in self.stats.bvids)
+        return self.stats.bvids
+
+    @staticmethod
+    def unroll_page(page: ApiRaw) -> list[str]:
+        videos = (page.get("list") or {}).get("vlist") or []
+        return [video["bvid"] for video in videos]
+
+
+@dataclass
+class CrawlSummary:
+    """UP 主抓取的结果：新保存信息的视频数、抓取评论的视频数和失败的视频"""
+
+    videos: int = 0
+    comments: int = 0
+    failed: list[str] = field(default_factory=list)
+
+
+class UploaderCrawler:
+    """
+    抓取 UP 主的全部投稿：列出投稿，保存未保存过的视频信息，并可对视频并发抓取评论
+
+    NOTE: 视频按 BVID 写入各自的分片；已保存信息的视频不再请求，
+    评论默认只抓取从未抓取过的视频，`refresh` 为 True 时重新抓取全部视频
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        credential: Optional[Credential] = None,
+        parallel: int = 2,
+        concurrency: int = 5,
+        delay: float = 1.0,
+        retries: int = 3,
+        log: Callable[[str], None] = print,
+    ):
+        self.router: ShardRouter = router
+        self.credential: Optional[Credential] = credential
+        self.parallel: int = parallel
+        self.concurrency: int = concurrency
+        self.delay: float = delay
+        self.retries: int = retries
+        self.log: Callable[[str], None] = log
+        self.databases: dict[str, CrawlDatabases] = {}
+        self.summary: CrawlSummary = CrawlSummary()
+
+    def open(self, bvid: str) -> CrawlDatabases:
+        dbpath = self.router.path_for_bvid(bvid)
+        if dbpath not in self.databases:
+            self.databases[dbpath] = CrawlDatabases.open(dbpath)
+        return self.databases[dbpath]
+
+    def load_known(self, mid: int) -> set[str]:
+        def load(dbpath: str) -> list[str]:
+            return RawDatabase(dbpath).load_raw_video_bvids_by_mid(mid)
+
+        return {bvid for bvids in self.router.map(load) for bvid in bvids}
+
+    async def gather(
+        self, bvids: list[str], crawl: Callable[[str], Awaitable[None]]
+    ) -> None:
+        """以 `parallel` 为并发上限对每个视频执行 `crawl`，单个视频失败不影响其他视频"""
+        semaphore = asyncio.Semaphore(self.parallel)
+
+        async def crawl_with_semaphore(bvid: str) -> None:
+            async with semaphore:
+                try:
+                    await crawl(bvid)
+                except Exception as error:
+                    count("fetch.uploader_failures")
+                    self.summary.failed.append(bvid)
+                    self.log(f"Failed to fetch {bvid}: {error}")
+
+        await asyncio.gather(*(crawl_with_semaphore(bvid) for bvid in bvids))
+
+    async def fetch_video(self, bvid: str) -> None:
+        databases = self.open(bvid)
+        if self.delay > 0:
+            await asyncio.sleep(self.delay * (0.5 + random.random()))
+        video_fetcher = VideoFetcher(
+            bvid,
+            self.credential,
+            VideoParser(shared=False),
+            databases.video,
+            databases.raw,
+        )
+        await video_fetcher.fetch_video()
+        self.summary.videos += 1
+
+    async def fetch_comments(self, bvid: str, limit: int) -> None:
+        reply_fetcher = await crawl_comments(
+            bvid,
+            self.credential,
+            self.open(bvid),
+            limit,
+            concurrency=self.concurrency,
+            delay=self.delay,
+            retries=self.retries,
+        )
+        self.summary.comments += 1
+        self.log(f"Fetched comments of {bvid}: raw replies {reply_fetcher.stats.raw}")
+
+    async def crawl(
+        self,
+        mid: int,
+        comments: bool = False,
+        refresh: bool = False,
+        pages: int = 0,
+        limit: int = 10,
+    ) -> UploaderStats:
+        """抓取 UP 主的投稿，`pages` 为最多列出的投稿页数，`limit` 为每个视频最多抓取的评论页数"""
+        known = self.load_known(mid)
+        uploader_fetcher = UploaderFetcher(
+            mid, self.credential, self.concurrency, self.delay, self.retries
+        )
+        bvids = await uploader_fetcher.fetch_bvids(known, pages)
+        stats = uploader_fetcher.stats
+        self.log(
+            f"Listed {stats.videos} videos of uploader {mid} in {stats.pages} pages, "
+            f"{stats.known} fetched before."
+        )
+
+        # NOTE: 通过 `fetch` 抓取的视频只在 VIDEOS 中有记录时同样跳过
+        missing = [
+            bvid
+            for bvid in bvids
+            if bvid not in known
+            and self.open(bvid).video.load_video_by_bvid(bvid) is None
+        ]
+        await self.gather(missing, self.fetch_video)
+
+        if comments:
+            targets = [
+                bvid
+                for bvid in bvids
+                if bvid not in self.summary.failed
+                and (
+                    refresh
+                    or self.open(bvid).raw.load_raw_fetch_time(
+                        bvid2aid(bvid), CommentResourceType.VIDEO
+                    )
+                    is None
+                )
+            ]
+            await self.gather(targets, lambda bvid: self.fetch_comments(bvid, limit))
+        return stats
@@ -5,6 +5,8 @@ from bilibili_api.video import Video as ApiVideo
 from .. import Video
 from ..parse import ApiRaw, VideoParser
 from ..database import RawDatabase, VideoDatabase
+from ..metrics import timed
+from .budget import RequestBudget
 
 
 class VideoFetcher:
@@ -15,6 +17,7 @@ class VideoFetcher:
         video_parser: Optional[VideoParser] = None,
         video_db: Optional[VideoDatabase] = None,
         raw_db: Optional[RawDatabase] = None,
+        budget: Optional[RequestBudget] = None,
     ):
         self.bvid: str = bvid
         self.credential: Optional[Credential] = credential
@@ -24,8 +27,12 @@ class VideoFetcher:
         self.video_parser: VideoParser = video_parser
         self.video_db: Optional[VideoDatabase] = video_db
         self.raw_db: Optional[RawDatabase] = raw_db
+        self.budget: Optional[RequestBudget] = budget
 
+    @timed("fetch.video")
     async def fetch_raw_video(self) -> ApiRaw:
+        if self.budget is not None:
+            await self.budget.acquire()
         raw_video: ApiRaw = await self.api_video.get_info()
         if self.raw_db is not None:
             self.raw_db.save_raw_video(raw_video)
@@ -33,4 +40,7 @@ class VideoFetcher:
 
     async def fetch_video(self) -> Optional[Video]:
         raw_video: ApiRaw = await self.fetch_raw_video()
-        return self.video_parser.parse_from_api(raw_video)
+        video: Video = self.video_parser.parse_from_api(raw_video)
+        if self.video_db is not None:
+            self.video_db.save_video(video)
+        return video
@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from bilibili_api import Credential
+
+from .. import CommentResourceType
+from ..bvid import bvid2aid
+from ..database import WatchDatabase
+from ..metrics import count, gauge
+from ..parse import VideoParser
+from ..shards import ShardRouter
+from .budget import RequestBudget
+from .comments import COMMENTS_PER_PAGE, CrawlDatabases, crawl_comments
+from .videos import VideoFetcher
+
+MIN_INTERVAL = 300
+MAX_INTERVAL = 86400
+# NOTE: 定期重新读取视频列表，运行期间通过 `watch add/remove` 修改的列表随之生效
+RELOAD_INTERVAL = 60
+
+
+@dataclass(order=True)
+class WatchEntry:
+    """调度队列中的视频，按下次抓取时间排序"""
+
+    next_poll: int
+    bvid: str
+    last_poll: Optional[int] = field(default=None, compare=False)
+    velocity: Optional[float] = field(default=None, compare=False)
+    failures: int = field(default=0, compare=False)
+
+
+def comment_velocity(ctimes: list[int], now: int) -> float:
+    """由最近根评论的发布时间（从新到旧）估计发布速度（条/秒），没有评论时为 0"""
+    if len(ctimes) == 0:
+        return 0.0
+    return len(ctimes) / max(now - ctimes[-1], 1)
+
+
+def poll_interval(
+    velocity: float, target: int, min_interval: int, max_interval: int
+) -> int:
+    """预计新增 `target` 条根评论所需的时间，限制在 [min_interval, max_interval] 内"""
+    if velocity <= 0:
+        return max_interval
+    return int(min(max(target / velocity, min_interval), max_interval))
+
+
+class Watcher:
+    """
+    按评论发布速度调度的持续抓取：每个视频抓取后根据最近评论的发布速度计算下次抓取时间，
+    到期的视频并发抓取，所有请求共享全局请求速率限制
+
+    NOTE: 评论按时间倒序分页，每次抓取 `limit` 页；调度目标是在新增评论填满一半页数时再次抓取，
+    热门视频不漏抓，没有新评论的视频逐渐退到 `max_interval`
+    """
+
+    def __init__(
+        self,
+        router: ShardRouter,
+        credential: Optional[Credential],
+        budget: RequestBudget,
+        parallel: int = 4,
+        limit: int = 10,
+        concurrency: int = 5,
+        retries: int = 3,
+        min_interval: int = MIN_INTERVAL,
+        max_interval: int = MAX_INTERVAL,
+        log: Callable[[str], None] = print,
+    ):
+        self.router: ShardRouter = router
+        self.credential: Optional[Credential] = credential
+        self.budget: RequestBudget = budget
+        self.parallel: int = parallel
+        self.limit: int = limit
+        self.concurrency: int = concurrency
+        self.retries: int = retries
+        self.min_interval: int = min_interval
+        self.max_interval: int = max_interval
+        self.log: Callable[[str], None] = log
+        self.target: int = max(limit * COMMENTS_PER_PAGE // 2, 1)
+        self.watch_db: WatchDatabase = WatchDatabase(router.primary_path)
+        # NOTE: 小根堆按 next_poll 排序；entries 记录每个视频当前有效的条目，
+        # 被移除或重新调度的视频在出堆时跳过
+        self.queue: list[WatchEntry] = []
+        self.entries: dict[str, WatchEntry] = {}
+        self.databases: dict[str, CrawlDatabases] = {}
+        self.wakeup: asyncio.Event = asyncio.Event()
+        self.polls: int = 0
+        self.failures: int = 0
+
+    def schedule(self, entry: WatchEntry) -> None:
+        self.entries[entry.bvid] = entry
+        heapq.heappush(self.queue, entry)
+        self.wakeup.set()
+
+    def reload(self) -> None:
+        bvids: set[str] = set()
+        for (
+            bvid,
+            last_poll,
+            next_poll,
+            velocity,
+            failures,
+        ) in self.watch_db.load_watchlist():
+            bvids.add(bvid)
+            if bvid not in self.entries:
+                self.schedule(WatchEntry(next_poll, bvid, last_poll, velocity, failures))
+        for bvid in list(self.entries):
+            if bvid not in bvids:
+                del self.entries[bvid]
+        gauge("watch.videos", len(self.entries))
+
+    def open(self, dbpath: str) -> CrawlDatabases:
+        if dbpath not in self.databases:
+            self.databases[dbpath] = CrawlDatabases.open(dbpath)
+        return self.databases[dbpath]
+
+    async def run(self, once: bool = False) -> None:
+        """持续调度，`once` 为 True 时只抓取当前到期的视频各一次"""
+        semaphore = asyncio.Semaphore(self.parallel)
+        tasks: set[asyncio.Task[None]] = set()
+        self.reload()
+        reloaded = time.monotonic()
+
+        async def poll_with_semaphore(entry: WatchEntry) -> None:
+            async with semaphore:
+                await self.poll(entry)
+
+        try:
+            while True:
+                if time.monotonic() - reloaded >= RELOAD_INTERVAL:
+                    self.reload()
+                    reloaded = time.monotonic()
+                now = int(time.time())
+                while self.queue and self.queue[0].next_poll <= now:
+                    entry = heapq.heappop(self.queue)
+                    if self.entries.get(entry.bvid) is not entry:
+                        continue
+                    task = asyncio.create_task(poll_with_semaphore(entry))
+                    tasks.add(task)
+                    task.add_done_callback(tasks.discard)
+                gauge("watch.running", len(tasks))
+                if once:
+                    await asyncio.gather(*tasks)
+                    return
+
+                timeout: float = RELOAD_INTERVAL
+                if self.queue:
+                    timeout = min(timeout, max(self.queue[0].next_poll - time.time(), 0))
+                self.wakeup.clear()
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def poll(self, entry: WatchEntry) -> None:
+        bvid = entry.bvid
+        databases = self.open(self.router.path_for_bvid(bvid))
+        now = int(time.time())
+        try:
+            # NOTE: 视频信息只在首次抓取时获取，之后的请求全部用于评论
+            if databases.video.load_video_by_bvid(bvid) is None:
+                video_fetcher = VideoFetcher(
+                    bvid,
+                    self.credential,
+                    VideoParser(shared=False),
+                    databases.video,
+                    databases.raw,
+                    budget=self.budget,
+                )
+                await video_fetcher.fetch_video()
+            reply_fetcher = await crawl_comments(
+                bvid,
+                self.credential,
+                databases,
+                self.limit,
+                concurrency=self.concurrency,
+                delay=0.0,
+                retries=self.retries,
+                budget=self.budget,
+            )
+            ctimes = databases.reply.load_recent_ctimes(
+                bvid2aid(bvid), CommentResourceType.VIDEO, self.target
+            )
+        except Exception as error:
+            self.failures += 1
+            count("watch.failures")
+            # NOTE: 连续失败时指数退避，成功一次后恢复按速度调度
+            interval = min(self.min_interval * 2**entry.failures, self.max_interval)
+            self.watch_db.save_schedule(
+                bvid, now, now + interval, entry.velocity, entry.failures + 1
+            )
+            self.log(f"Failed to poll {bvid}: {error}; retrying in {interval}s")
+            if bvid in self.entries:
+                self.schedule(
+                    WatchEntry(
+                        now + interval, bvid, now, entry.velocity, entry.failures + 1
+                    )
+                )
+            return
+
+        self.polls += 1
+        count("watch.polls")
+        velocity = comment_velocity(ctimes, now)
+        interval = poll_interval(
+            velocity, self.target, self.min_interval, self.max_interval
+        )
+        self.watch_db.save_schedule(bvid, now, now + interval, velocity, 0)
+        self.log(
+            f"Polled {bvid}: raw replies {reply_fetcher.stats.raw}, "
+            f"{velocity * 3600:.1f} comments/hour, next poll in {interval}s"
+        )
+        if bvid in self.entries:
+            self.schedule(WatchEntry(now + interval, bvid, now, velocity, 0))
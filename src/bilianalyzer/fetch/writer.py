@@ -0,0 +1,117 @@
+import asyncio
+import queue
+import threading
+from typing import Optional
+
+from ..database import RawDatabase, SaveSummary
+from ..metrics import count, gauge, timer
+from ..parse import ApiRaw
+from .service import ServiceInfo, WriterClient
+
+WRITER_MAX_PENDING = 32
+WRITER_BATCH_SIZE = 500
+
+
+class RawReplyWriter:
+    """
+    在独立线程中写入原始评论，抓取协程只负责入队
+
+    线程持有自己的数据库连接，每次取出队列中积压的多页评论合并为一次提交；
+    队列中未写入的页数超过 `max_pending` 时 `put` 挂起等待，形成背压。
+    给出 `service` 时不直接写入数据库，而是把每批评论发送给写入进程
+    """
+
+    def __init__(
+        self,
+        dbpath: str,
+        max_pending: int = WRITER_MAX_PENDING,
+        batch_size: int = WRITER_BATCH_SIZE,
+        fetch_time: Optional[int] = None,
+        service: Optional[ServiceInfo] = None,
+    ):
+        self.dbpath: str = dbpath
+        self.service: Optional[ServiceInfo] = service
+        self.fetch_time: Optional[int] = fetch_time
+        self.batch_size: int = batch_size
+        self.queue: queue.SimpleQueue[Optional[list[ApiRaw]]] = queue.SimpleQueue()
+        self.slots: asyncio.Semaphore = asyncio.Semaphore(max_pending)
+        self.pending: int = 0
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.thread: Optional[threading.Thread] = None
+        self.error: Optional[BaseException] = None
+        # NOTE: 仅由写入线程更新，close 返回后才可读取
+        self.summary: SaveSummary = SaveSummary()
+
+    def start(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self.thread = threading.Thread(
+            target=self.run, name="raw-reply-writer", daemon=True
+        )
+        self.thread.start()
+
+    async def put(self, raw_replies: list[ApiRaw]) -> None:
+        if self.error is not None:
+            raise self.error
+        await self.slots.acquire()
+        self.pending += 1
+        gauge("fetch.writer.queue_depth", self.pending)
+        self.queue.put(raw_replies)
+
+    async def close(self) -> None:
+        """等待队列中的评论全部写入并提交后结束线程，写入出错时在此抛出"""
+        if self.thread is None:
+            return
+        self.queue.put(None)
+        await asyncio.to_thread(self.thread.join)
+        self.thread = None
+        if self.error is not None:
+            raise self.error
+
+    def _release(self, pages: Optional[int] = None) -> None:
+        if pages is None:
+            pages = self.pending
+        self.pending -= pages
+        for _ in range(pages):
+            self.slots.release()
+
+    def run(self) -> None:
+        assert self.loop is not None
+        raw_db: Optional[RawDatabase | WriterClient] = None
+        closing = False
+        try:
+            if self.service is None:
+                raw_db = RawDatabase(self.dbpath)
+            else:
+                raw_db = WriterClient(self.service, self.dbpath)
+            while not closing:
+                # NOTE: 阻塞等待第一页，然后取走已积压的页一起写入
+                pages: list[list[ApiRaw]] = []
+                rows = 0
+                item = self.queue.get()
+                while item is not None:
+                    pages.append(item)
+                    rows += len(item)
+                    if rows >= self.batch_size:
+                        break
+                    try:
+                        item = self.queue.get_nowait()
+                    except queue.Empty:
+                        break
+                closing = item is None
+                if not pages:
+                    continue
+                with timer("fetch.writer.flush"):
+                    self.summary.merge(
+                        raw_db.save_raw_replies(
+                            [raw for page in pages for raw in page], self.fetch_time
+                        )
+                    )
+                count("fetch.writer.batches")
+                self.loop.call_soon_threadsafe(self._release, len(pages))
+        except BaseException as error:
+            self.error = error
+            # NOTE: 出错后丢弃剩余数据并释放全部名额，避免 put 永久挂起
+            self.loop.call_soon_threadsafe(self._release)
+        finally:
+            if raw_db is not None:
+                raw_db.connection.close()
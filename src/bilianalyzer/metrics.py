@@ -0,0 +1,218 @@
+import inspect
+import json
+import threading
+import time
+from contextlib import AbstractContextManager, nullcontext
+from dataclasses import dataclass
+from functools import wraps
+from typing import Any, Callable, Optional, ParamSpec, TypeVar
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+@dataclass
+class TimerStat:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+
+@dataclass
+class GaugeStat:
+    last: float = 0.0
+    max: float = 0.0
+
+    def set(self, value: float) -> None:
+        self.last = value
+        if value > self.max:
+            self.max = value
+
+
+class Metrics:
+    """
+    各阶段耗时（timer）、行数/字节数/请求数（counter）和队列深度（gauge）的汇总
+
+    未启用时 timer 返回共享的空上下文，count/gauge 只做一次属性判断
+
+    NOTE: 写入线程和分片线程池同样会更新统计，读-改-写在锁内完成，避免丢失更新
+    """
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.lock: threading.Lock = threading.Lock()
+        self.timers: dict[str, TimerStat] = {}
+        self.counters: dict[str, int] = {}
+        self.gauges: dict[str, GaugeStat] = {}
+
+    def reset(self) -> None:
+        with self.lock:
+            self.timers.clear()
+            self.counters.clear()
+            self.gauges.clear()
+
+    def add_time(self, name: str, seconds: float) -> None:
+        with self.lock:
+            stat = self.timers.get(name)
+            if stat is None:
+                stat = self.timers[name] = TimerStat()
+            stat.add(seconds)
+
+    def add_count(self, name: str, value: int) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        with self.lock:
+            stat = self.gauges.get(name)
+            if stat is None:
+                stat = self.gauges[name] = GaugeStat()
+            stat.set(value)
+
+    def to_dict(self) -> dict[str, Any]:
+        with self.lock:
+            return {
+                "timers": {
+                    name: {"count": stat.count, "total": stat.total, "max": stat.max}
+                    for name, stat in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "gauges": {
+                    name: {"last": stat.last, "max": stat.max}
+                    for name, stat in sorted(self.gauges.items())
+                },
+            }
+
+    def dump(self, filepath: str) -> None:
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    def report(self) -> str:
+        stats = self.to_dict()
+        lines: list[str] = []
+        if stats["timers"]:
+            lines.append(f"{'timer':32} {'count':>8} {'total(s)':>10} {'max(s)':>10}")
+            for name, stat in sorted(
+                stats["timers"].items(), key=lambda item: -item[1]["total"]
+            ):
+                lines.append(
+                    f"{name:32} {stat['count']:>8} {stat['total']:>10.4f} "
+                    f"{stat['max']:>10.4f}"
+                )
+        if stats["counters"]:
+            lines.append(f"{'counter':32} {'value':>8}")
+            for name, value in stats["counters"].items():
+                lines.append(f"{name:32} {value:>8}")
+        if stats["gauges"]:
+            lines.append(f"{'gauge':32} {'last':>12} {'max':>12}")
+            for name, stat in stats["gauges"].items():
+                lines.append(f"{name:32} {stat['last']:>12.0f} {stat['max']:>12.0f}")
+        return "\n".join(lines)
+
+
+metrics = Metrics()
+NULL_TIMER: AbstractContextManager[None] = nullcontext()
+
+
+class Timer(AbstractContextManager[None]):
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name: str = name
+        self.start: float = 0.0
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        metrics.add_time(self.name, time.perf_counter() - self.start)
+
+
+def timer(name: str) -> AbstractContextManager[None]:
+    if not metrics.enabled:
+        return NULL_TIMER
+    return Timer(name)
+
+
+def timed(name: str) -> Callable[[Callable[P, T]], Callable[P, T]]:
+    """按调用计时的装饰器，异步函数计时到协程完成"""
+
+    def decorator(function: Callable[P, T]) -> Callable[P, T]:
+        if inspect.iscoroutinefunction(function):
+
+            @wraps(function)
+            async def async_wrapper(*args: P.args, **kwargs: P.kwargs) -> Any:
+                if not metrics.enabled:
+                    return await function(*args, **kwargs)
+                with Timer(name):
+                    return await function(*args, **kwargs)
+
+            return async_wrapper  # type: ignore[return-value]
+
+        @wraps(function)
+        def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+            if not metrics.enabled:
+                return function(*args, **kwargs)
+            with Timer(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def count(name: str, value: int = 1) -> None:
+    if metrics.enabled:
+        metrics.add_count(name, value)
+
+
+def gauge(name: str, value: float) -> None:
+    if metrics.enabled:
+        metrics.set_gauge(name, value)
+
+
+class Profiler:
+    """按需启用 cProfile 和 tracemalloc，在命令结束时输出报告"""
+
+    def __init__(self, cprofile_out: Optional[str] = None, trace_memory: bool = False):
+        self.cprofile_out: Optional[str] = cprofile_out
+        self.trace_memory: bool = trace_memory
+        self.profile: Any = None
+
+    def start(self) -> None:
+        if self.cprofile_out is not None:
+            import cProfile
+
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        if self.trace_memory:
+            import tracemalloc
+
+            tracemalloc.start()
+
+    def stop(self, top: int = 10) -> list[str]:
+        lines: list[str] = []
+        if self.profile is not None:
+            self.profile.disable()
+            self.profile.dump_stats(self.cprofile_out)
+            lines.append(f"cProfile stats written to {self.cprofile_out}")
+        if self.trace_memory:
+            import tracemalloc
+
+            # NOTE: 同时启用 cProfile 时排除其自身的内存分配
+            snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, "*/cProfile.py")]
+            )
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            gauge("memory.peak_bytes", peak)
+            lines.append(f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB")
+            for stat in snapshot.statistics("lineno")[:top]:
+                lines.append(str(stat))
+        return lines
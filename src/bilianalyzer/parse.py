@@ -1,17 +1,30 @@
-from typing import Any, Optional, TypeAlias
-from collections.abc import Iterable, Collection
-from bilibili_api.comment import CommentResourceType
+from typing import Any, Callable, Optional, TypeAlias
+from collections.abc import Iterable, Iterator, Collection, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
 
-from . import Member, Reply, Video
+from . import CommentResourceType, Member, Reply, Video
+from .metrics import count, timed
 
 ApiRaw: TypeAlias = dict[str, Any]
 Record: TypeAlias = tuple[Any, ...]
+# NOTE: (评论记录, 用户记录或 None, 子评论的 CompactReply 元组或 None)
+CompactReply: TypeAlias = tuple[Record, Optional[Record], Optional[tuple[Any, ...]]]
+
+PARSE_CHUNK_SIZE = 2000
 
 
 class MemberParser:
     members: list[Member] = []
     members_by_uid: dict[int, Member] = {}
 
+    def __init__(self, shared: bool = True):
+        # NOTE: 默认所有解析器共享类属性上的身份映射；shared 为 False 时使用实例自己的映射，
+        # 并发的抓取互不读取或清空对方解析的对象，映射随解析器一起释放
+        if not shared:
+            self.members = []
+            self.members_by_uid = {}
+
     def fetch_member(self, uid: int) -> Optional[Member]:
         return self.members_by_uid.get(uid)
 
@@ -33,6 +46,17 @@ class MemberParser:
         if uid in self.members_by_uid:
             return self.members_by_uid[uid]
 
+        return self.parse_from_record(self.record_from_api(data))
+
+    @staticmethod
+    def record_from_api(data: ApiRaw) -> Record:
+        """将 API 返回的用户数据转换为与 `parse_from_record` 相同字段顺序的记录"""
+        if "mid" not in data:
+            raise ValueError("Invalid member data: field 'mid' missing")
+        if "uname" not in data:
+            raise ValueError("Invalid member data: field 'uname' missing")
+
+        uid: int = int(data["mid"])
         name: str = data["uname"]
         sex: Optional[str] = None
         if data.get("sex", "保密") != "保密":
@@ -60,19 +84,7 @@ class MemberParser:
             if user_sailing["cardbg"] is not None:
                 cardbag = user_sailing["cardbg"]["name"].strip()
 
-        member: Member = Member(
-            uid=uid,
-            name=name,
-            sex=sex,
-            sign=sign,
-            level=level,
-            vip=vip,
-            pendant=pendant,
-            cardbag=cardbag,
-        )
-
-        self.insert_member(member)
-        return member
+        return (uid, name, sex, sign, level, vip, pendant, cardbag)
 
     def parse_from_record(self, record: Record) -> Member:
         uid, name, sex, sign, level, vip, pendant, cardbag = record
@@ -92,25 +104,85 @@ class MemberParser:
         self.insert_member(member)
         return member
 
+    @timed("parse.members_from_api")
     def batch_parse_from_api(self, data: Collection[ApiRaw]) -> list[Member]:
         members = []
         for raw_member in data:
             members.append(self.parse_from_api(raw_member))
+        count("parse.members_from_api", len(members))
         return members
 
+    @timed("parse.members_from_record")
     def batch_parse_from_record(self, data: Collection[Record]) -> list[Member]:
         members = []
         for record in data:
             members.append(self.parse_from_record(record))
+        count("parse.members_from_record", len(members))
         return members
 
     def unroll_members(self, replies: Iterable[Reply]) -> Iterable[Member]:
-        # FIXME: member 在reply中出现多次时 在返回时也出现了多次
-        for reply in replies:
-            if reply.member is not None:
-                yield reply.member
-            if reply.child_replies is not None:
-                yield from self.unroll_members(reply.child_replies)
+        # NOTE: member 在 reply 中出现多次时只返回一次
+        uids: set[int] = set()
+        for reply in ReplyParser.unroll_replies(replies):
+            if reply.member is None or reply.member.uid in uids:
+                continue
+            uids.add(reply.member.uid)
+            yield reply.member
+
+
+class LazyRelation:
+    """`LazyReply` 的关联属性：首次读取时调用评论的 `loader` 加载，之后与普通属性相同"""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name: str = name
+
+    def __get__(self, reply: Optional["LazyReply"], owner: Optional[type] = None) -> Any:
+        if reply is None:
+            return None
+        if self.name not in reply.__dict__ and reply.loader is not None:
+            reply.loader(reply, self.name)
+        return reply.__dict__.get(self.name)
+
+    def __set__(self, reply: "LazyReply", value: Any) -> None:
+        reply.__dict__[self.name] = value
+
+
+RelationLoader: TypeAlias = Callable[["LazyReply", str], None]
+
+
+class LazyReply(Reply):
+    """
+    member、root_reply、parent_reply、child_replies 在首次访问时才加载的评论
+
+    NOTE: 只读取 rpid、message 等列的查询不会触发任何关联查询；
+    `loader` 负责为该属性赋值（查不到时赋值为 None），为 None 时未加载的属性视为 None
+    """
+
+    RELATIONS: tuple[str, ...] = ("member", "root_reply", "parent_reply", "child_replies")
+
+    member = LazyRelation()
+    root_reply = LazyRelation()
+    parent_reply = LazyRelation()
+    child_replies = LazyRelation()
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        # NOTE: dataclass 的 __init__ 已将各关联赋值为默认的 None，删除后才会按需加载
+        for name in self.RELATIONS:
+            self.__dict__.pop(name, None)
+        self.loader: Optional[RelationLoader] = None
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self.__dict__
+
+    def __repr__(self) -> str:
+        # NOTE: dataclass 生成的 __repr__ 会读取全部关联，进而加载整个楼
+        loaded = ", ".join(name for name in self.RELATIONS if self.is_loaded(name))
+        return (
+            f"LazyReply(rpid={self.rpid}, oid={self.oid}, otype={self.otype}, "
+            f"mid={self.mid}, root={self.root}, parent={self.parent}, "
+            f"ctime={self.ctime}, loaded=[{loaded}])"
+        )
 
 
 class ReplyParser:
@@ -118,10 +190,13 @@ class ReplyParser:
     replies: list[Reply] = []
     replies_by_rpid: dict[int, Reply] = {}
 
-    def __init__(self, member_parser: Optional[MemberParser] = None):
+    def __init__(self, member_parser: Optional[MemberParser] = None, shared: bool = True):
         if member_parser is None:
-            member_parser = MemberParser()
+            member_parser = MemberParser(shared)
         self.member_parser = member_parser
+        if not shared:
+            self.replies = []
+            self.replies_by_rpid = {}
 
     def insert_reply(self, reply: Reply) -> None:
         if reply.rpid in self.replies_by_rpid:
@@ -192,12 +267,66 @@ class ReplyParser:
         self.insert_reply(reply)
         return reply
 
-    def parse_from_record(self, record: Record) -> Reply:
+    def parse_from_compact(self, compact: CompactReply) -> Reply:
+        """
+        合并子进程返回的紧凑评论
+
+        NOTE: 去重、用户关联和根/父评论关联的顺序与 `parse_from_api` 完全一致，
+        因此按原顺序合并的结果与串行解析相同
+        """
+        record, member_record, children = compact
         rpid, oid, otype, message, ctime, mid, root, parent, location = record
+
+        if rpid in self.replies_by_rpid:
+            return self.replies_by_rpid[rpid]
+
         reply = Reply(
             rpid=rpid,
             oid=oid,
-            otype=otype,
+            otype=CommentResourceType[otype],
+            message=message,
+            ctime=ctime,
+            mid=mid,
+            root=root,
+            parent=parent,
+        )
+
+        member: Optional[Member] = self.member_parser.fetch_member(mid)
+        if member is None and member_record is not None:
+            member = self.member_parser.parse_from_record(member_record)
+
+        root_reply: Optional[Reply] = None
+        if root != 0:
+            root_reply = self.fetch_reply(root)
+
+        parent_reply: Optional[Reply] = None
+        if parent != 0:
+            parent_reply = self.fetch_reply(parent)
+
+        child_replies: Optional[list[Reply]] = None
+        if children is not None:
+            child_replies = [self.parse_from_compact(child) for child in children]
+
+        reply.member = member
+        reply.root_reply = root_reply
+        reply.parent_reply = parent_reply
+        reply.child_replies = child_replies
+        reply.location = location
+
+        self.insert_reply(reply)
+        return reply
+
+    def parse_from_record(
+        self, record: Record, loader: Optional[RelationLoader] = None
+    ) -> Reply:
+        """给出 `loader` 时返回关联对象按需加载的 `LazyReply`"""
+        rpid, oid, otype, message, ctime, mid, root, parent, location = record
+        if rpid in self.replies_by_rpid:
+            return self.replies_by_rpid[rpid]
+        reply = (Reply if loader is None else LazyReply)(
+            rpid=rpid,
+            oid=oid,
+            otype=CommentResourceType[otype],
             message=message,
             ctime=ctime,
             mid=mid,
@@ -205,19 +334,55 @@ class ReplyParser:
             parent=parent,
             location=location,
         )
+        if isinstance(reply, LazyReply):
+            reply.loader = loader
         self.insert_reply(reply)
         return reply
 
+    @timed("parse.replies_from_api")
     def batch_parse_from_api(self, data: Collection[ApiRaw]) -> list[Reply]:
         replies = []
         for raw_reply in data:
             replies.append(self.parse_from_api(raw_reply))
+        count("parse.replies_from_api", len(replies))
         return replies
 
+    @timed("parse.replies_from_record")
     def batch_parse_from_record(self, data: Collection[Record]) -> list[Reply]:
         replies = []
         for record in data:
             replies.append(self.parse_from_record(record))
+        count("parse.replies_from_record", len(replies))
+        return replies
+
+    @timed("parse.replies_parallel")
+    def parallel_parse_from_api(
+        self,
+        data: Sequence[Any],
+        workers: int,
+        chunk_size: int = PARSE_CHUNK_SIZE,
+        decode: Optional[Callable[[Any], ApiRaw]] = None,
+    ) -> list[Reply]:
+        """
+        将原始评论分片交给进程池转换为紧凑元组，再在主进程按原顺序合并到身份映射中
+
+        `decode` 用于在子进程中解码原始数据，例如直接传入数据库中的压缩数据，
+        避免在主进程解压和序列化字典
+        """
+        replies: list[Reply] = []
+        if workers <= 1 or len(data) <= chunk_size:
+            for chunk in chunks(data, chunk_size):
+                for compact in compact_replies(chunk, decode):
+                    replies.append(self.parse_from_compact(compact))
+        else:
+            with ProcessPoolExecutor(workers) as executor:
+                # NOTE: map 按提交顺序返回结果，保证合并顺序与串行解析一致
+                for compacts in executor.map(
+                    partial(compact_replies, decode=decode), chunks(data, chunk_size)
+                ):
+                    for compact in compacts:
+                        replies.append(self.parse_from_compact(compact))
+        count("parse.replies_parallel", len(replies))
         return replies
 
     @staticmethod
@@ -228,11 +393,59 @@ class ReplyParser:
                 yield from ReplyParser.unroll_replies(reply.child_replies)
 
 
+def chunks(data: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+def compact_reply(data: ApiRaw) -> CompactReply:
+    """将 API 返回的评论及其子评论转换为可跨进程传递的紧凑元组"""
+    otype: CommentResourceType = CommentResourceType(data["type"])
+    location: Optional[str] = data.get("reply_control", {}).get("location")
+    if location is not None and location.startswith("IP属地："):
+        location = location[5:]
+    record: Record = (
+        data["rpid"],
+        data["oid"],
+        otype.name,
+        data.get("content", {}).get("message", ""),
+        data["ctime"],
+        data["mid"],
+        data["root"],
+        data["parent"],
+        location,
+    )
+
+    member_record: Optional[Record] = None
+    try:
+        member_record = MemberParser.record_from_api(data["member"])
+    except ValueError:
+        pass
+
+    children: Optional[tuple[CompactReply, ...]] = None
+    if data.get("replies") is not None:
+        children = tuple(compact_reply(raw_reply) for raw_reply in data["replies"])
+    return record, member_record, children
+
+
+def compact_replies(
+    chunk: Iterable[Any], decode: Optional[Callable[[Any], ApiRaw]] = None
+) -> list[CompactReply]:
+    if decode is None:
+        return [compact_reply(raw_reply) for raw_reply in chunk]
+    return [compact_reply(decode(raw_reply)) for raw_reply in chunk]
+
+
 class VideoParser:
 
     videos: list[Video] = []
     videos_by_bvid: dict[str, Video] = {}
 
+    def __init__(self, shared: bool = True):
+        if not shared:
+            self.videos = []
+            self.videos_by_bvid = {}
+
     def fetch_video(self, bvid: str) -> Optional[Video]:
         return self.videos_by_bvid.get(bvid)
 
@@ -283,3 +496,13 @@ class VideoParser:
 
         self.insert_video(video)
         return video
+
+
+def reset_identity_maps() -> None:
+    """清空各解析器共享的按 UID/RPID/BVID 缓存的对象，不影响 shared 为 False 的解析器"""
+    MemberParser.members.clear()
+    MemberParser.members_by_uid.clear()
+    ReplyParser.replies.clear()
+    ReplyParser.replies_by_rpid.clear()
+    VideoParser.videos.clear()
+    VideoParser.videos_by_bvid.clear()
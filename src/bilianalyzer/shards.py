@@ -0,0 +1,302 @@
+import heapq
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Callable, Optional, TypeVar
+from collections.abc import Iterable, Iterator
+
+from . import CommentResourceType, Reply, Video
+from .bvid import bvid2aid
+from .database import (
+    FETCH_BATCH_SIZE,
+    MemberDatabase,
+    MetricDatabase,
+    RawDatabase,
+    ReplyDatabase,
+    SampleDatabase,
+    SketchDatabase,
+    VideoDatabase,
+    WatchDatabase,
+    connect,
+)
+from .parse import Record
+
+T = TypeVar("T")
+
+DATABASE_PATH = "bilianalyzer.db"
+MANIFEST_NAME = "manifest.json"
+
+# NOTE: 按拆分顺序排列，MEMBERS 和 REPLY_METRICS 依赖先拆分出的表；
+# 查找表整表复制，保证各分片中的编码 ID 与原数据库一致；不属于任何视频的表放在第一个分片
+SPLIT_TABLES: tuple[tuple[str, str], ...] = (
+    ("RESOURCE_TYPES", "1"),
+    ("LOCATIONS", "1"),
+    ("VIPS", "1"),
+    ("PENDANTS", "1"),
+    ("CARDBAGS", "1"),
+    ("RAW_REPLIES", "OID % :count = :index"),
+    ("RAW_VIDEOS", "BVID2AID(BVID) % :count = :index"),
+    ("VIDEOS", "BVID2AID(BVID) % :count = :index"),
+    ("REPLIES", "OID % :count = :index"),
+    (
+        "MEMBERS",
+        "UID IN (SELECT MID FROM main.REPLIES UNION SELECT MID FROM main.RAW_REPLIES)",
+    ),
+    ("SKETCHES", "OID % :count = :index"),
+    ("REPLY_METRICS_LATEST", "OID % :count = :index"),
+    ("REPLY_METRICS", "RPID IN (SELECT RPID FROM main.REPLY_METRICS_LATEST)"),
+    ("REPLY_SAMPLES", "OID % :count = :index"),
+    ("WATCHLIST", ":index = 0"),
+)
+
+
+@dataclass
+class ShardLayout:
+    """
+    分片布局：目录中的 `count` 个 SQLite 文件，视频 AID 对 `count` 取模决定所在分片
+
+    NOTE: AID 与 BV 号一一对应，取模即为 BV 号的哈希；同一视频的原始数据、评论、
+    用户、草图和历史都在同一分片中，每个分片都是结构完整的独立数据库
+    """
+
+    root: str
+    count: int
+
+    @classmethod
+    def load(cls, root: str) -> Optional["ShardLayout"]:
+        manifest = os.path.join(root, MANIFEST_NAME)
+        if not os.path.isfile(manifest):
+            return None
+        with open(manifest, "r", encoding="utf-8") as f:
+            return cls(root, json.load(f)["shards"])
+
+    def save(self) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, MANIFEST_NAME), "w", encoding="utf-8") as f:
+            json.dump({"shards": self.count}, f)
+
+    def shard_of(self, oid: int) -> int:
+        return oid % self.count
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.root, f"shard-{index:03d}.db")
+
+    def paths(self) -> list[str]:
+        return [self.path(index) for index in range(self.count)]
+
+
+def shards_root(dbpath: str) -> str:
+    """分片目录与单文件数据库同名，例如 bilianalyzer.db 对应 bilianalyzer.shards"""
+    return os.path.splitext(dbpath)[0] + ".shards"
+
+
+class ShardRouter:
+    """
+    将数据库请求路由到单文件数据库或分片
+
+    单个视频的读写由 `path_for`/`path_for_bvid` 定位到所在的数据库文件，
+    照常使用 RawDatabase/ReplyDatabase 等类；跨视频的读取在各分片上并行查询后合并
+    """
+
+    def __init__(self, dbpath: str = DATABASE_PATH):
+        self.dbpath: str = dbpath
+        self.layout: Optional[ShardLayout] = ShardLayout.load(shards_root(dbpath))
+
+    @property
+    def sharded(self) -> bool:
+        return self.layout is not None
+
+    def path_for(self, oid: int) -> str:
+        if self.layout is None:
+            return self.dbpath
+        return self.layout.path(self.layout.shard_of(oid))
+
+    def path_for_bvid(self, bvid: str) -> str:
+        # NOTE: 单文件布局下不解析 BV 号，无效 BV 号由各命令照常报告
+        if self.layout is None:
+            return self.dbpath
+        return self.path_for(bvid2aid(bvid))
+
+    @property
+    def primary_path(self) -> str:
+        """保存不属于任何视频的数据（例如 watch 的视频列表）的数据库文件"""
+        if self.layout is None:
+            return self.dbpath
+        return self.layout.path(0)
+
+    def paths(self) -> list[str]:
+        if self.layout is None:
+            return [self.dbpath]
+        return self.layout.paths()
+
+    def map(self, function: Callable[[str], T], workers: Optional[int] = None) -> list[T]:
+        """
+        在每个数据库文件上调用 `function(dbpath)`，按分片顺序返回结果
+
+        NOTE: sqlite3 执行查询时释放 GIL，各分片在独立线程中各自打开连接
+        """
+        paths = self.paths()
+        if len(paths) == 1:
+            return [function(paths[0])]
+        with ThreadPoolExecutor(max_workers=workers or min(len(paths), 8)) as executor:
+            return list(executor.map(function, paths))
+
+    def load_resources(self) -> list[tuple[int, CommentResourceType]]:
+        def load(dbpath: str) -> list[tuple[int, CommentResourceType]]:
+            return ReplyDatabase(dbpath, MemberDatabase(dbpath)).load_resources()
+
+        return list(
+            heapq.merge(*self.map(load), key=lambda item: (item[0], item[1].value))
+        )
+
+    def load_reply_rows(
+        self, batch_size: int = FETCH_BATCH_SIZE
+    ) -> Iterator[list[Record]]:
+        """
+        逐批读取全部评论的扁平记录，顺序与单文件数据库的 `load_reply_rows` 相同
+
+        NOTE: 同一 OID 的评论只在一个分片中，按 OID 归并各分片的有序结果即可
+        """
+        streams: list[Iterable[Record]] = []
+        for dbpath in self.paths():
+            reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+            batches = reply_db.load_reply_rows(batch_size=batch_size)
+            streams.append(record for batch in batches for record in batch)
+        rows = heapq.merge(*streams, key=lambda record: record[1])
+        while batch := list(islice(rows, batch_size)):
+            yield batch
+
+    def search_replies(
+        self,
+        keyword: str,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> list[tuple[Reply, float]]:
+        """
+        在所有分片中搜索评论，合并后按与 `ReplyDatabase.search_replies` 相同的顺序分页
+
+        NOTE: bm25 相关度按各分片自身的词频统计计算，跨分片的排序是近似的
+        """
+
+        def search(dbpath: str) -> list[tuple[Reply, float]]:
+            reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+            return list(
+                reply_db.search_replies(
+                    keyword, start=start, end=end, limit=limit + offset, offset=0
+                )
+            )
+
+        key: Callable[[tuple[Reply, float]], tuple[float, int]]
+        if len(keyword) >= 3:
+            key = lambda item: (item[1], item[0].rpid)
+        else:
+            key = lambda item: (-item[0].ctime, -item[0].rpid)
+        results = heapq.merge(*self.map(search), key=key)
+        return list(islice(results, offset, offset + limit))
+
+    def query_replies(
+        self,
+        oid: Optional[int] = None,
+        otype: Optional[CommentResourceType] = None,
+        limit: Optional[int] = None,
+        ascending: bool = False,
+        **filters: Any,
+    ) -> Iterator[Reply]:
+        """
+        按条件查询评论，顺序与 `ReplyDatabase.query_replies` 相同，其余条件见该方法
+
+        NOTE: 给出 OID 时只查询所在的分片；否则各分片各自有序读取至多 `limit` 条，
+        归并后取前 `limit` 条。返回的评论为 LazyReply，用户等关联在访问时按分片批量加载
+        """
+        paths = [self.path_for(oid)] if oid is not None else self.paths()
+        streams: list[Iterator[Reply]] = []
+        for dbpath in paths:
+            reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath), lazy=True)
+            streams.append(
+                reply_db.query_replies(
+                    oid=oid, otype=otype, limit=limit, ascending=ascending, **filters
+                )
+            )
+        replies = heapq.merge(
+            *streams, key=lambda reply: (reply.ctime, reply.rpid), reverse=not ascending
+        )
+        return islice(replies, limit)
+
+    def query_videos(
+        self, limit: Optional[int] = None, ascending: bool = False, **filters: Any
+    ) -> Iterator[Video]:
+        """在所有分片中按发布时间查询视频，顺序与 `VideoDatabase.query_videos` 相同"""
+        streams = [
+            VideoDatabase(dbpath).query_videos(
+                limit=limit, ascending=ascending, **filters
+            )
+            for dbpath in self.paths()
+        ]
+        videos = heapq.merge(
+            *streams,
+            key=lambda video: (video.publish_time, video.bvid),
+            reverse=not ascending,
+        )
+        return islice(videos, limit)
+
+    def load_reply_by_rpid(self, rpid: int) -> Optional[Reply]:
+        """在所有分片中查找评论，返回的评论为 LazyReply"""
+        for dbpath in self.paths():
+            reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath), lazy=True)
+            reply = reply_db.load_reply_by_rpid(rpid)
+            if reply is not None:
+                return reply
+        return None
+
+
+def create_schema(dbpath: str) -> None:
+    """创建所有表，旧版本的表在此完成迁移"""
+    member_db = MemberDatabase(dbpath)
+    ReplyDatabase(dbpath, member_db)
+    RawDatabase(dbpath)
+    VideoDatabase(dbpath)
+    SketchDatabase(dbpath)
+    MetricDatabase(dbpath)
+    SampleDatabase(dbpath)
+    WatchDatabase(dbpath)
+
+
+def split_database(source: str, layout: ShardLayout) -> list[int]:
+    """
+    将单文件数据库按视频拆分到分片中，返回各分片的评论数
+
+    NOTE: 在每个分片上 ATTACH 原数据库并用 INSERT ... SELECT 复制所属的行，
+    评论写入时由触发器同步建立全文索引；全部分片写完后才保存清单，中途失败不影响原数据库
+    """
+    create_schema(source)
+    os.makedirs(layout.root, exist_ok=True)
+    counts: list[int] = []
+    for index, dbpath in enumerate(layout.paths()):
+        create_schema(dbpath)
+        connection: sqlite3.Connection = connect(dbpath)
+        connection.create_function("BVID2AID", 1, bvid2aid, deterministic=True)
+        connection.execute("ATTACH DATABASE ? AS source", (source,))
+        parameters = {"count": layout.count, "index": index}
+        for table, condition in SPLIT_TABLES:
+            cursor = connection.execute(f"PRAGMA main.table_info({table})")
+            columns = ", ".join(record[1] for record in cursor.fetchall())
+            connection.execute(
+                f"""
+                INSERT OR IGNORE INTO main.{table} ({columns})
+                SELECT {columns} FROM source.{table}
+                WHERE {condition}
+                """,
+                parameters,
+            )
+        connection.commit()
+        connection.execute("DETACH DATABASE source")
+        (replies,) = connection.execute("SELECT COUNT(*) FROM REPLIES").fetchone()
+        counts.append(replies)
+        connection.close()
+    layout.save()
+    return counts
@@ -0,0 +1,314 @@
+import json
+import mmap
+import os
+from array import array
+from bisect import bisect_left
+from dataclasses import asdict
+from typing import Any, Optional, TypeAlias
+from collections.abc import Iterable, Iterator
+
+from . import CommentResourceType, Member, Reply, Video
+from .parse import Record
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# NOTE: numpy 可用时为 ndarray 视图，否则为 memoryview，二者都不复制 mmap 中的数据
+Column: TypeAlias = Any
+
+SNAPSHOT_VERSION = 1
+NULL_CODE = -1
+
+# NOTE: 列类型: "q" 定长 int64，"i" 字典编码的 int32，"s" 变长 UTF-8 文本（int64 偏移量）
+REPLY_COLUMNS: dict[str, str] = {
+    "rpid": "q",
+    "oid": "q",
+    "otype": "i",
+    "mid": "q",
+    "root": "q",
+    "parent": "q",
+    "message": "s",
+    "ctime": "q",
+    "location": "i",
+}
+MEMBER_COLUMNS: dict[str, str] = {
+    "uid": "q",
+    "name": "s",
+    "sex": "i",
+    "sign": "s",
+    "level": "q",
+    "vip": "i",
+    "pendant": "i",
+    "cardbag": "i",
+}
+TABLES: dict[str, dict[str, str]] = {"replies": REPLY_COLUMNS, "members": MEMBER_COLUMNS}
+
+
+class SnapshotWriter:
+    """
+    将评论和用户写成列式二进制快照，按资源（视频）依次追加
+
+    每个资源在各列中占据连续区间，记录在 meta.json 的 resources 中
+    """
+
+    def __init__(self, path: str):
+        os.makedirs(path, exist_ok=True)
+        self.path: str = path
+        self.files: dict[str, Any] = {}
+        self.lengths: dict[str, int] = {table: 0 for table in TABLES}
+        self.text_offsets: dict[str, int] = {}
+        self.dictionaries: dict[str, dict[str, int]] = {}
+        self.resources: list[dict[str, Any]] = []
+
+        for table, columns in TABLES.items():
+            for column, kind in columns.items():
+                name = f"{table}.{column}"
+                self.files[name] = open(os.path.join(path, f"{name}.bin"), "wb")
+                if kind == "s":
+                    self.files[f"{name}.text"] = open(
+                        os.path.join(path, f"{name}.text"), "wb"
+                    )
+                    self.text_offsets[name] = 0
+                    array("q", [0]).tofile(self.files[name])
+                elif kind == "i":
+                    self.dictionaries[name] = {}
+
+    def _encode(self, name: str, value: Optional[str]) -> int:
+        if value is None:
+            return NULL_CODE
+        dictionary = self.dictionaries[name]
+        if value not in dictionary:
+            dictionary[value] = len(dictionary)
+        return dictionary[value]
+
+    def _write(self, table: str, records: list[Record]) -> None:
+        for column, (name, kind) in zip(zip(*records), TABLES[table].items()):
+            name = f"{table}.{name}"
+            if kind == "q":
+                values = [NULL_CODE if value is None else value for value in column]
+                array("q", values).tofile(self.files[name])
+            elif kind == "i":
+                array("i", [self._encode(name, value) for value in column]).tofile(
+                    self.files[name]
+                )
+            else:
+                offsets = array("q")
+                for value in column:
+                    data = (value or "").encode("utf-8")
+                    self.files[f"{name}.text"].write(data)
+                    self.text_offsets[name] += len(data)
+                    offsets.append(self.text_offsets[name])
+                offsets.tofile(self.files[name])
+        self.lengths[table] += len(records)
+
+    def write_resource(
+        self,
+        oid: int,
+        otype: CommentResourceType,
+        reply_batches: Iterable[list[Record]],
+        member_batches: Iterable[list[Record]],
+        video: Optional[Video] = None,
+    ) -> None:
+        """写入一个资源，评论记录为 REPLIES 表字段顺序，用户记录为 MEMBERS 表字段顺序"""
+        resource: dict[str, Any] = {
+            "oid": oid,
+            "otype": otype.name,
+            "video": asdict(video) if video is not None else None,
+            "replies": [self.lengths["replies"], 0],
+            "members": [self.lengths["members"], 0],
+        }
+        for records in reply_batches:
+            self._write("replies", [record[:9] for record in records])
+        for records in member_batches:
+            self._write("members", records)
+        resource["replies"][1] = self.lengths["replies"]
+        resource["members"][1] = self.lengths["members"]
+        self.resources.append(resource)
+
+    def close(self) -> None:
+        for file in self.files.values():
+            file.close()
+        meta = {
+            "version": SNAPSHOT_VERSION,
+            "lengths": self.lengths,
+            "dictionaries": {
+                name: list(dictionary) for name, dictionary in self.dictionaries.items()
+            },
+            "resources": self.resources,
+        }
+        with open(os.path.join(self.path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+
+class Snapshot:
+    """以 mmap 只读打开列式快照，多个进程打开同一快照时共享页缓存"""
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version: {meta.get('version')}")
+        self.path: str = path
+        self.lengths: dict[str, int] = meta["lengths"]
+        self.dictionaries: dict[str, list[str]] = meta["dictionaries"]
+        self.resources: list[dict[str, Any]] = meta["resources"]
+        self.maps: dict[str, mmap.mmap] = {}
+        self.views: dict[str, memoryview] = {}
+        self.offsets: dict[str, memoryview] = {}
+
+    def _buffer(self, filename: str) -> memoryview:
+        if filename not in self.views:
+            with open(os.path.join(self.path, filename), "rb") as f:
+                if os.fstat(f.fileno()).st_size == 0:
+                    self.views[filename] = memoryview(b"")
+                else:
+                    buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self.maps[filename] = buffer
+                    self.views[filename] = memoryview(buffer)
+        return self.views[filename]
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> Column:
+        table, column = name.split(".")
+        kind = TABLES[table][column]
+        buffer = self._buffer(f"{name}.bin")
+        if numpy is not None:
+            dtype = numpy.int64 if kind != "i" else numpy.int32
+            values = numpy.frombuffer(buffer, dtype=dtype)
+        else:
+            values = buffer.cast("q" if kind != "i" else "i")
+        if kind == "s":
+            # NOTE: 文本列的 .bin 为 n + 1 个偏移量
+            return values[start : (stop if stop is not None else len(values) - 1) + 1]
+        return values[start:stop]
+
+    def text(self, name: str, index: int) -> str:
+        if name not in self.offsets:
+            self.offsets[name] = self._buffer(f"{name}.bin").cast("q")
+        offsets = self.offsets[name]
+        data = self._buffer(f"{name}.text")
+        return str(data[offsets[index] : offsets[index + 1]], "utf-8")
+
+    def decode(self, name: str, code: int) -> Optional[str]:
+        return None if code == NULL_CODE else self.dictionaries[name][code]
+
+    def resource(self, oid: int, otype: CommentResourceType) -> Optional[dict[str, Any]]:
+        for resource in self.resources:
+            if resource["oid"] == oid and resource["otype"] == otype.name:
+                return resource
+        return None
+
+    def replies(self, resource: dict[str, Any]) -> "SnapshotReplies":
+        return SnapshotReplies(self, *resource["replies"])
+
+    def members(self, resource: dict[str, Any]) -> "SnapshotMembers":
+        return SnapshotMembers(self, *resource["members"])
+
+    def close(self) -> None:
+        # NOTE: 仍有列视图被引用时 mmap 无法关闭，交给垃圾回收处理
+        self.offsets.clear()
+        for view in self.views.values():
+            view.release()
+        self.views.clear()
+        for buffer in self.maps.values():
+            try:
+                buffer.close()
+            except BufferError:
+                pass
+        self.maps.clear()
+
+
+class SnapshotReplies:
+    """快照中一段评论，迭代时才按行构造 Reply 对象"""
+
+    def __init__(self, snapshot: Snapshot, start: int, stop: int):
+        self.snapshot: Snapshot = snapshot
+        self.start: int = start
+        self.stop: int = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __contains__(self, item: object) -> bool:
+        return any(reply == item for reply in self)
+
+    def column(self, name: str) -> Column:
+        return self.snapshot.column(f"replies.{name}", self.start, self.stop)
+
+    def __iter__(self) -> Iterator[Reply]:
+        snapshot = self.snapshot
+        columns = {name: self.column(name) for name in REPLY_COLUMNS if name != "message"}
+        for offset in range(len(self)):
+            yield Reply(
+                rpid=int(columns["rpid"][offset]),
+                oid=int(columns["oid"][offset]),
+                otype=CommentResourceType[
+                    snapshot.dictionaries["replies.otype"][columns["otype"][offset]]
+                ],
+                mid=int(columns["mid"][offset]),
+                root=int(columns["root"][offset]),
+                parent=int(columns["parent"][offset]),
+                message=snapshot.text("replies.message", self.start + offset),
+                ctime=int(columns["ctime"][offset]),
+                location=snapshot.decode("replies.location", columns["location"][offset]),
+            )
+
+
+class SnapshotMembers:
+    """快照中一段用户，迭代时才按行构造 Member 对象"""
+
+    def __init__(self, snapshot: Snapshot, start: int, stop: int):
+        self.snapshot: Snapshot = snapshot
+        self.start: int = start
+        self.stop: int = stop
+
+    def __len__(self) -> int:
+        return self.stop - self.start
+
+    def __contains__(self, item: object) -> bool:
+        return any(member == item for member in self)
+
+    def column(self, name: str) -> Column:
+        return self.snapshot.column(f"members.{name}", self.start, self.stop)
+
+    def __iter__(self) -> Iterator[Member]:
+        columns = self._columns()
+        for offset in range(len(self)):
+            yield self._member(columns, offset)
+
+    def find(self, uids: Iterable[int]) -> dict[int, Member]:
+        """
+        只为给定 UID 构造 Member 对象，返回 {UID: Member}，快照中不存在的 UID 被忽略
+
+        NOTE: 快照中每个资源的用户按 UID 升序写入，二分查找即可定位行
+        """
+        columns = self._columns()
+        found: dict[int, Member] = {}
+        for uid in uids:
+            offset = bisect_left(columns["uid"], uid)
+            if offset < len(self) and int(columns["uid"][offset]) == uid:
+                found[uid] = self._member(columns, offset)
+        return found
+
+    def _columns(self) -> dict[str, Column]:
+        # NOTE: 文本列按行解码，不在此处映射
+        return {
+            name: self.column(name)
+            for name, kind in MEMBER_COLUMNS.items()
+            if kind != "s"
+        }
+
+    def _member(self, columns: dict[str, Column], offset: int) -> Member:
+        snapshot = self.snapshot
+        level = int(columns["level"][offset])
+        return Member(
+            uid=int(columns["uid"][offset]),
+            name=snapshot.text("members.name", self.start + offset),
+            sex=snapshot.decode("members.sex", columns["sex"][offset]),
+            sign=snapshot.text("members.sign", self.start + offset) or None,
+            level=None if level == NULL_CODE else level,
+            vip=snapshot.decode("members.vip", columns["vip"][offset]),
+            pendant=snapshot.decode("members.pendant", columns["pendant"][offset]),
+            cardbag=snapshot.decode("members.cardbag", columns["cardbag"][offset]),
+        )
@@ -0,0 +1,230 @@
+import random
+from dataclasses import dataclass
+from typing import Optional
+from collections.abc import Iterator
+
+from . import CommentResourceType
+from .bvid import aid2bvid
+from .parse import ApiRaw
+
+LOCATIONS: list[str] = [
+    "北京", "上海", "广东", "浙江", "江苏", "四川", "湖北", "山东", "河南", "福建",
+    "湖南", "陕西", "重庆", "天津", "辽宁", "安徽", "江西", "云南", "广西", "美国",
+]  # fmt: skip
+VIP_LABELS: list[str] = ["大会员", "年度大会员", "十年大会员"]
+WORDS: list[str] = [
+    "哈哈哈", "好看", "前排", "支持", "up主", "辛苦了", "三连", "来了", "太强了", "笑死",
+    "这个", "视频", "真的", "绝了", "awsl", "泪目", "打卡", "催更", "牛", "yyds",
+]  # fmt: skip
+EMOTES: list[str] = ["[doge]", "[笑哭]", "[妙啊]", "[吃瓜]", "[藏狐]", "[OK]"]
+# NOTE: UP 主 mid 的第 i 个视频 AID 为 mid * UPLOADER_STRIDE + i，视频的 UP 主由 AID 反推
+UPLOADER_STRIDE = 100
+
+
+@dataclass
+class SyntheticConfig:
+    """合成数据的规模与形态参数"""
+
+    seed: int = 0
+    member_count: int = 5000
+    replies_per_video: int = 1000
+    # NOTE: 每条根评论附带的楼中楼预览条数上限，与 API 一致最多 3 条
+    max_child_replies: int = 3
+    child_reply_ratio: float = 0.3
+    pendant_count: int = 200
+    cardbag_count: int = 100
+    sailing_ratio: float = 0.3
+    vip_ratio: float = 0.4
+    location_ratio: float = 0.95
+    duplicate_ratio: float = 0.02
+    min_words: int = 1
+    max_words: int = 12
+    page_size: int = 20
+    videos_per_uploader: int = 40
+
+
+class SyntheticGenerator:
+    """生成与 Bilibili API 返回格式一致的视频信息、评论和评论分页数据"""
+
+    def __init__(self, config: Optional[SyntheticConfig] = None):
+        if config is None:
+            config = SyntheticConfig()
+        self.config: SyntheticConfig = config
+
+    def _random_for(self, *keys: int) -> random.Random:
+        # NOTE: 相同参数得到相同数据，供 mock 服务器按页稳定返回
+        return random.Random(hash((self.config.seed, *keys)))
+
+    def member_uid(self, index: int) -> int:
+        # NOTE: 老用户 UID 位数较少，新用户为 16 位
+        rng = self._random_for(-1, index)
+        digits = rng.choice([3, 6, 8, 9, 9, 10, 16])
+        return rng.randrange(10 ** (digits - 1), 10**digits)
+
+    def generate_member(self, uid: int, rng: Optional[random.Random] = None) -> ApiRaw:
+        config = self.config
+        rng = rng or self._random_for(uid)
+        vip: ApiRaw = {"vipStatus": 0, "label": {"text": ""}}
+        if rng.random() < config.vip_ratio:
+            vip = {"vipStatus": 1, "label": {"text": rng.choice(VIP_LABELS)}}
+        user_sailing: Optional[ApiRaw] = None
+        if rng.random() < config.sailing_ratio:
+            pendant = rng.randrange(config.pendant_count)
+            cardbag = rng.randrange(config.cardbag_count)
+            user_sailing = {
+                "pendant": {"name": f"头像框{pendant} "} if rng.random() < 0.8 else None,
+                "cardbg": {"name": f"数字周边{cardbag}"} if rng.random() < 0.5 else None,
+            }
+        return {
+            "mid": str(uid),
+            "uname": f"用户{uid}",
+            "sex": rng.choice(["保密", "男", "女"]),
+            "sign": rng.choice(["", "这个人很懒，什么都没有写"]),
+            "level_info": {"current_level": rng.choice([0, 1, 2, 3, 4, 4, 5, 5, 6])},
+            "is_senior_member": 1 if rng.random() < 0.02 else 0,
+            "vip": vip,
+            "user_sailing": user_sailing,
+        }
+
+    def generate_message(self, rng: random.Random) -> str:
+        config = self.config
+        if rng.random() < config.duplicate_ratio:
+            return "兄弟们快来看这个免费领取会员的链接" + rng.choice("!！~。")
+        words = rng.choices(WORDS, k=rng.randint(config.min_words, config.max_words))
+        if rng.random() < 0.3:
+            words.append(rng.choice(EMOTES))
+        return "".join(words)
+
+    def generate_reply(
+        self,
+        oid: int,
+        rpid: int,
+        ctime: int,
+        root: int = 0,
+        parent: int = 0,
+        rng: Optional[random.Random] = None,
+    ) -> ApiRaw:
+        config = self.config
+        rng = rng or self._random_for(oid, rpid)
+        uid = self.member_uid(rng.randrange(config.member_count))
+        location: Optional[str] = None
+        if rng.random() < config.location_ratio:
+            location = "IP属地：" + rng.choice(LOCATIONS)
+        return {
+            "rpid": rpid,
+            "oid": oid,
+            "type": CommentResourceType.VIDEO.value,
+            "mid": uid,
+            "root": root,
+            "parent": parent,
+            "count": 0,
+            "rcount": 0,
+            "like": int(rng.paretovariate(1.2)) - 1,
+            "ctime": ctime,
+            "content": {"message": self.generate_message(rng)},
+            "member": self.generate_member(uid),
+            "reply_control": {"location": location} if location is not None else {},
+            "replies": None,
+        }
+
+    def generate_root_reply(self, oid: int, index: int, publish_time: int) -> ApiRaw:
+        config = self.config
+        rng = self._random_for(oid, index)
+        rpid = oid * 10**6 + index * 10
+        ctime = publish_time + int(rng.expovariate(1 / 86400))
+        reply = self.generate_reply(oid, rpid, ctime, rng=rng)
+        if rng.random() < config.child_reply_ratio:
+            count = rng.randint(1, config.max_child_replies)
+            reply["replies"] = [
+                self.generate_reply(
+                    oid,
+                    rpid + offset,
+                    ctime + offset * 60,
+                    root=rpid,
+                    parent=rpid,
+                    rng=rng,
+                )
+                for offset in range(1, count + 1)
+            ]
+            reply["rcount"] = reply["count"] = count
+        return reply
+
+    def generate_video(self, aid: int, reply_count: Optional[int] = None) -> ApiRaw:
+        rng = self._random_for(aid)
+        publish_time = 1700000000 + rng.randrange(0, 86400 * 365)
+        if reply_count is None:
+            reply_count = self.config.replies_per_video
+        owner = self.uploader_of(aid)
+        return {
+            "bvid": aid2bvid(aid),
+            "aid": aid,
+            "title": f"合成视频 {aid}",
+            "desc": rng.choice(["", "这是一个用于测试的合成视频"]),
+            "pubdate": publish_time,
+            "ctime": publish_time - rng.randrange(0, 3600),
+            "owner": {"mid": owner, "name": f"UP主{owner}"},
+            "stat": {"aid": aid, "reply": reply_count, "like": rng.randrange(0, 10**6)},
+        }
+
+    @staticmethod
+    def uploader_of(aid: int) -> int:
+        return aid // UPLOADER_STRIDE
+
+    def uploader_aids(self, mid: int) -> list[int]:
+        count = min(self.config.videos_per_uploader, UPLOADER_STRIDE)
+        return [mid * UPLOADER_STRIDE + index for index in range(count)]
+
+    def generate_uploader_page(self, mid: int, index: int = 1, size: int = 30) -> ApiRaw:
+        """生成 UP 主投稿列表的第 `index` 页，与 bilibili_api.user.User.get_videos 的返回格式一致"""
+        videos = [self.generate_video(aid) for aid in self.uploader_aids(mid)]
+        videos.sort(key=lambda video: (video["pubdate"], video["aid"]), reverse=True)
+        start = (index - 1) * size
+        return {
+            "list": {
+                "tlist": {},
+                "vlist": [
+                    {
+                        "aid": video["aid"],
+                        "bvid": video["bvid"],
+                        "title": video["title"],
+                        "description": video["desc"],
+                        "created": video["pubdate"],
+                        "comment": video["stat"]["reply"],
+                        "mid": mid,
+                        "author": video["owner"]["name"],
+                    }
+                    for video in videos[start : start + size]
+                ],
+            },
+            "page": {"pn": index, "ps": size, "count": len(videos)},
+        }
+
+    def generate_replies(self, aid: int) -> Iterator[ApiRaw]:
+        publish_time = self.generate_video(aid)["pubdate"]
+        for index in range(self.config.replies_per_video):
+            yield self.generate_root_reply(aid, index, publish_time)
+
+    def generate_page(self, aid: int, index: int = 1) -> ApiRaw:
+        """生成第 `index` 页评论，与 bilibili_api.comment.get_comments 的返回格式一致"""
+        config = self.config
+        publish_time = self.generate_video(aid)["pubdate"]
+        start = (index - 1) * config.page_size
+        stop = min(start + config.page_size, config.replies_per_video)
+        replies = [
+            self.generate_root_reply(aid, position, publish_time)
+            for position in range(start, stop)
+        ]
+        page: ApiRaw = {
+            "page": {
+                "num": index,
+                "size": config.page_size,
+                "count": config.replies_per_video,
+                "acount": config.replies_per_video,
+            },
+            "replies": replies or None,
+            "top_replies": None,
+            "upper": {"mid": 0, "top": None},
+        }
+        if index == 1 and config.replies_per_video > 0:
+            page["upper"]["top"] = self.generate_root_reply(aid, 0, publish_time)
+        return page
@@ -0,0 +1,75 @@
+import os
+from dataclasses import dataclass
+
+import pytest
+
+from bilianalyzer import Reply
+from bilianalyzer.database import (
+    MemberDatabase,
+    RawDatabase,
+    ReplyDatabase,
+    SketchDatabase,
+    VideoDatabase,
+)
+from bilianalyzer.parse import (
+    ApiRaw,
+    MemberParser,
+    ReplyParser,
+    VideoParser,
+    reset_identity_maps,
+)
+from bilianalyzer.synthetic import SyntheticConfig, SyntheticGenerator
+
+# NOTE: 奇偶不同的两个 AID，两个分片时分别落在不同分片
+AIDS: list[int] = [170001, 170002]
+
+
+@dataclass
+class Corpus:
+    """测试共用的合成数据库及写入的原始评论和解析结果"""
+
+    dbpath: str
+    raw_replies: dict[int, list[ApiRaw]]
+    replies: dict[int, list[Reply]]
+    fetch_time: int
+
+
+@pytest.fixture(autouse=True)
+def clear_identity_maps():
+    # NOTE: 解析器的身份映射是类属性，测试之间不能共享已解析的对象
+    reset_identity_maps()
+    yield
+    reset_identity_maps()
+
+
+@pytest.fixture
+def generator() -> SyntheticGenerator:
+    return SyntheticGenerator(SyntheticConfig(member_count=200, replies_per_video=120))
+
+
+@pytest.fixture
+def corpus(tmp_path, generator: SyntheticGenerator) -> Corpus:
+    dbpath = os.path.join(tmp_path, "bilianalyzer.db")
+    fetch_time = 1_700_000_000
+    raw_db = RawDatabase(dbpath)
+    video_db = VideoDatabase(dbpath)
+    member_db = MemberDatabase(dbpath)
+    reply_db = ReplyDatabase(dbpath, member_db)
+    sketch_db = SketchDatabase(dbpath)
+    raw_replies: dict[int, list[ApiRaw]] = {}
+    replies: dict[int, list[Reply]] = {}
+    for aid in AIDS:
+        member_parser = MemberParser()
+        raw_video = generator.generate_video(aid)
+        raw_replies[aid] = list(generator.generate_replies(aid))
+        replies[aid] = ReplyParser(member_parser).batch_parse_from_api(raw_replies[aid])
+        raw_db.save_raw_video(raw_video, fetch_time)
+        raw_db.save_raw_replies(raw_replies[aid], fetch_time)
+        video_db.save_video(VideoParser().parse_from_api(raw_video), fetch_time)
+        member_db.save_members(
+            list(member_parser.unroll_members(replies[aid])), fetch_time
+        )
+        reply_db.save_replies(replies[aid], fetch_time)
+        sketch_db.save_replies(replies[aid])
+    reset_identity_maps()
+    return Corpus(dbpath, raw_replies, replies, fetch_time)
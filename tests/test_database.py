@@ -0,0 +1,302 @@
+import sqlite3
+
+import pytest
+
+from bilianalyzer import CommentResourceType
+from bilianalyzer import database
+from bilianalyzer.database import (
+    MemberDatabase,
+    MetricDatabase,
+    RawDatabase,
+    ReplyDatabase,
+    compact,
+    retry_busy,
+    table_columns,
+)
+from bilianalyzer.parse import ReplyParser
+
+from .conftest import AIDS, Corpus
+
+DAY = 86400
+
+
+def create_legacy_tables(dbpath: str) -> None:
+    """按字典编码之前的表结构创建 REPLIES 和 MEMBERS，OTYPE/LOCATION/VIP 等以字符串存储"""
+    connection = sqlite3.connect(dbpath)
+    connection.executescript("""
+        CREATE TABLE MEMBERS (
+            UID INTEGER PRIMARY KEY,
+            NAME TEXT NOT NULL,
+            SEX TEXT,
+            SIGN TEXT,
+            LEVEL INTEGER,
+            VIP TEXT,
+            PENDANT TEXT,
+            CARDBAG TEXT
+        );
+        CREATE TABLE REPLIES (
+            RPID INTEGER PRIMARY KEY,
+            OID INTEGER NOT NULL,
+            OTYPE TEXT NOT NULL,
+            MID INTEGER NOT NULL,
+            ROOT INTEGER NOT NULL,
+            PARENT INTEGER NOT NULL,
+            MESSAGE TEXT NOT NULL,
+            CTIME INTEGER NOT NULL,
+            LOCATION TEXT
+        );
+        INSERT INTO MEMBERS VALUES (1, 'alice', '女', NULL, 5, '大会员', 'pendant', NULL);
+        INSERT INTO MEMBERS VALUES (2, 'bob', '男', 'hi', 3, NULL, NULL, 'cardbag');
+        INSERT INTO REPLIES VALUES (11, 170001, 'VIDEO', 1, 0, 0, '前排支持', 100, '广东');
+        INSERT INTO REPLIES VALUES (12, 170001, 'VIDEO', 2, 11, 11, '支持一下', 200, NULL);
+        """)
+    connection.commit()
+    connection.close()
+
+
+def test_legacy_tables_are_dictionary_encoded(tmp_path):
+    dbpath = str(tmp_path / "legacy.db")
+    create_legacy_tables(dbpath)
+
+    member_db = MemberDatabase(dbpath)
+    reply_db = ReplyDatabase(dbpath, member_db)
+
+    assert "VIP" not in table_columns(reply_db.cursor, "MEMBERS")
+    assert "LOCATION" not in table_columns(reply_db.cursor, "REPLIES")
+    assert {"VIP_ID", "PENDANT_ID", "CARDBAG_ID"} <= table_columns(
+        reply_db.cursor, "MEMBERS"
+    )
+    members = {member.uid: member for member in member_db.load_members()}
+    assert members[1].vip == "大会员" and members[1].pendant == "pendant"
+    assert members[2].cardbag == "cardbag" and members[2].vip is None
+    replies = {reply.rpid: reply for reply in reply_db.load_replies()}
+    assert replies[11].location == "广东" and replies[12].location is None
+    assert replies[11].otype == CommentResourceType.VIDEO
+    # NOTE: 重建保留 RPID，全文索引仍指向正确的评论
+    found = [reply.rpid for reply, _ in reply_db.search_replies("支持一")]
+    assert found == [12]
+
+
+def test_legacy_encoding_runs_once(tmp_path):
+    dbpath = str(tmp_path / "legacy.db")
+    create_legacy_tables(dbpath)
+    ReplyDatabase(dbpath, MemberDatabase(dbpath))
+    ReplyDatabase(dbpath, MemberDatabase(dbpath))
+
+    connection = sqlite3.connect(dbpath)
+    assert connection.execute("SELECT COUNT(*) FROM REPLIES").fetchone() == (2,)
+    assert connection.execute("SELECT COUNT(*) FROM LOCATIONS").fetchone() == (1,)
+
+
+def test_resave_refreshes_fetch_time_of_unchanged_rows(corpus: Corpus):
+    raw_db = RawDatabase(corpus.dbpath)
+    raw_replies = corpus.raw_replies[AIDS[0]]
+    later = corpus.fetch_time + 10 * DAY
+
+    summary = raw_db.save_raw_replies(raw_replies, later)
+
+    assert summary.unchanged == len(raw_replies)
+    assert raw_db.load_raw_fetch_time(AIDS[0], CommentResourceType.VIDEO) == later
+    # NOTE: 再次抓取到的评论不应被按抓取时间清理
+    assert raw_db.delete_replies_by_fetch_timestamp(later - DAY) == len(
+        corpus.raw_replies[AIDS[1]]
+    )
+    stored = raw_db.load_raw_reply_by_resource(AIDS[0], CommentResourceType.VIDEO)
+    assert len(stored) == len(raw_replies)
+
+
+def test_delete_raw_replies_in_batches(corpus: Corpus):
+    raw_db = RawDatabase(corpus.dbpath)
+    total = sum(len(raw_replies) for raw_replies in corpus.raw_replies.values())
+
+    assert raw_db.delete_replies_by_fetch_timestamp(corpus.fetch_time) == 0
+    assert raw_db.delete_replies_by_fetch_timestamp(corpus.fetch_time + 1, 7) == total
+    assert raw_db.load_raw_replies() == []
+
+
+def test_prune_keeps_hashes_of_parsed_replies(corpus: Corpus):
+    raw_db = RawDatabase(corpus.dbpath)
+    raw_replies = corpus.raw_replies[AIDS[0]]
+    total = sum(len(raw_replies) for raw_replies in corpus.raw_replies.values())
+
+    assert raw_db.prune_parsed_raw_replies(corpus.fetch_time + 1, 7) == total
+    assert raw_db.load_raw_replies() == []
+    (rows,) = raw_db.connection.execute("SELECT COUNT(*) FROM RAW_REPLIES").fetchone()
+    assert rows == total
+    # NOTE: 清空原始数据后再次保存相同内容仍识别为未变化
+    assert raw_db.save_raw_replies(raw_replies).unchanged == len(raw_replies)
+
+
+def test_prune_skips_unparsed_replies(corpus: Corpus, generator):
+    raw_db = RawDatabase(corpus.dbpath)
+    unparsed = list(generator.generate_replies(170003))
+    raw_db.save_raw_replies(unparsed, corpus.fetch_time)
+
+    raw_db.prune_parsed_raw_replies(corpus.fetch_time + 1)
+
+    stored = raw_db.load_raw_reply_by_resource(170003, CommentResourceType.VIDEO)
+    assert len(stored) == len(unparsed)
+
+
+def test_compact_skips_legacy_database_unless_full(tmp_path):
+    dbpath = str(tmp_path / "legacy.db")
+    connection = sqlite3.connect(dbpath)
+    connection.execute("CREATE TABLE DATA (VALUE BLOB)")
+    connection.executemany("INSERT INTO DATA VALUES (?)", [(bytes(4096),)] * 200)
+    connection.commit()
+    connection.execute("DELETE FROM DATA")
+    connection.commit()
+    connection.close()
+
+    connection = database.connect(dbpath)
+    assert compact(connection) == 0
+    assert compact(connection, full=True) > 0
+    assert connection.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+    assert connection.execute("PRAGMA freelist_count").fetchone() == (0,)
+
+
+class Writer:
+    def __init__(self, failures: int, errorcode: int = sqlite3.SQLITE_BUSY):
+        self.connection = sqlite3.connect(":memory:")
+        self.failures: int = failures
+        self.errorcode: int = errorcode
+        self.calls: int = 0
+
+    @retry_busy
+    def write(self) -> int:
+        self.calls += 1
+        if self.calls <= self.failures:
+            error = sqlite3.OperationalError("database is locked")
+            error.sqlite_errorcode = self.errorcode
+            raise error
+        return self.calls
+
+
+@pytest.fixture
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(database.time, "sleep", lambda seconds: None)
+
+
+def test_retry_busy_retries_until_success(no_backoff):
+    writer = Writer(failures=database.BUSY_RETRIES)
+    assert writer.write() == database.BUSY_RETRIES + 1
+
+
+def test_retry_busy_gives_up_after_retries(no_backoff):
+    writer = Writer(failures=database.BUSY_RETRIES + 1)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.write()
+    assert writer.calls == database.BUSY_RETRIES + 1
+
+
+def test_retry_busy_does_not_retry_other_errors(no_backoff):
+    writer = Writer(failures=1, errorcode=sqlite3.SQLITE_ERROR)
+    with pytest.raises(sqlite3.OperationalError):
+        writer.write()
+    assert writer.calls == 1
+
+
+def test_keyset_pagination_visits_every_reply_once(corpus: Corpus):
+    reply_db = ReplyDatabase(corpus.dbpath, MemberDatabase(corpus.dbpath))
+    oid, otype = AIDS[0], CommentResourceType.VIDEO
+    expected = sorted(
+        ReplyParser.unroll_replies(corpus.replies[oid]),
+        key=lambda reply: (reply.ctime, reply.rpid),
+        reverse=True,
+    )
+
+    pages: list[list[int]] = []
+    after = None
+    while page := list(reply_db.query_replies(oid, otype, after=after, limit=7)):
+        pages.append([reply.rpid for reply in page])
+        after = (page[-1].ctime, page[-1].rpid)
+
+    assert [rpid for page in pages for rpid in page] == [reply.rpid for reply in expected]
+    assert all(len(page) == 7 for page in pages[:-1])
+    assert reply_db.count_replies(oid, otype) == len(expected)
+
+
+def test_keyset_pagination_ascending_with_filters(corpus: Corpus):
+    reply_db = ReplyDatabase(corpus.dbpath, MemberDatabase(corpus.dbpath))
+    roots = sorted(corpus.replies[AIDS[1]], key=lambda reply: (reply.ctime, reply.rpid))
+    middle = roots[len(roots) // 2]
+
+    found = list(
+        reply_db.query_replies(
+            AIDS[1],
+            CommentResourceType.VIDEO,
+            root_only=True,
+            after=(middle.ctime, middle.rpid),
+            ascending=True,
+        )
+    )
+
+    assert [reply.rpid for reply in found] == [
+        reply.rpid for reply in roots[len(roots) // 2 + 1 :]
+    ]
+
+
+def test_metric_history_resolves_resource_per_reply(tmp_path, generator):
+    metric_db = MetricDatabase(str(tmp_path / "metrics.db"))
+    # NOTE: 只保留根评论，总数即各根评论数值之和
+    raw_replies = [
+        {**raw_reply, "replies": None}
+        for raw_reply in generator.generate_replies(AIDS[0])
+    ]
+    first = raw_replies[0]
+    metric_db.save_metrics(raw_replies, 100)
+    first["like"] += 5
+
+    assert metric_db.save_metrics(raw_replies, 200) == 1
+    assert "OID" not in table_columns(metric_db.cursor, "REPLY_METRICS")
+    assert metric_db.load_reply_resource(first["rpid"]) == (
+        AIDS[0],
+        CommentResourceType.VIDEO,
+    )
+    assert metric_db.load_reply_resource(1) is None
+    likes = sum(raw_reply["like"] for raw_reply in raw_replies)
+    history = metric_db.load_resource_history(AIDS[0], CommentResourceType.VIDEO)
+    assert [(fetch_time, total) for fetch_time, total, _ in history] == [
+        (100, likes - 5),
+        (200, likes),
+    ]
+    assert metric_db.load_resource_history(AIDS[1], CommentResourceType.VIDEO) == []
+
+
+def test_legacy_metric_history_is_migrated(tmp_path):
+    dbpath = str(tmp_path / "legacy.db")
+    connection = sqlite3.connect(dbpath)
+    connection.executescript("""
+        CREATE TABLE REPLY_METRICS (
+            RPID INTEGER NOT NULL,
+            FETCH_TIME INTEGER NOT NULL,
+            OID INTEGER NOT NULL,
+            OTYPE TEXT NOT NULL,
+            LIKE_DELTA INTEGER NOT NULL,
+            RCOUNT_DELTA INTEGER NOT NULL,
+            PRIMARY KEY (RPID, FETCH_TIME)
+        ) WITHOUT ROWID;
+        CREATE TABLE REPLY_METRICS_LATEST (
+            RPID INTEGER PRIMARY KEY,
+            FETCH_TIME INTEGER NOT NULL,
+            LIKES INTEGER NOT NULL,
+            RCOUNT INTEGER NOT NULL
+        );
+        INSERT INTO REPLY_METRICS VALUES (11, 100, 170001, 'VIDEO', 3, 1);
+        INSERT INTO REPLY_METRICS VALUES (11, 200, 170001, 'VIDEO', 2, 0);
+        INSERT INTO REPLY_METRICS_LATEST VALUES (11, 200, 5, 1);
+        """)
+    connection.commit()
+    connection.close()
+
+    metric_db = MetricDatabase(dbpath)
+
+    assert table_columns(metric_db.cursor, "REPLY_METRICS") == {
+        "RPID",
+        "FETCH_TIME",
+        "LIKE_DELTA",
+        "RCOUNT_DELTA",
+    }
+    assert metric_db.load_reply_resource(11) == (170001, CommentResourceType.VIDEO)
+    assert metric_db.load_reply_history(11) == [(100, 3, 1), (200, 5, 1)]
+    assert metric_db.load_latest([11]) == {11: (200, 5, 1)}
@@ -0,0 +1,100 @@
+import random
+
+from bilianalyzer import CommentResourceType, Member, Reply
+from bilianalyzer.analyze.duplicates import DuplicateAnalyzer, LSHIndex, MinHasher
+
+
+def jaccard(first: set[str], second: set[str]) -> float:
+    return len(first & second) / len(first | second)
+
+
+def make_reply(rpid: int, mid: int, message: str) -> Reply:
+    return Reply(
+        rpid=rpid,
+        oid=170001,
+        otype=CommentResourceType.VIDEO,
+        mid=mid,
+        root=0,
+        parent=0,
+        message=message,
+        ctime=1_700_000_000 + rpid,
+    )
+
+
+def test_signature_is_deterministic_32_bit():
+    hasher = MinHasher(num_permutations=64)
+
+    signature = hasher.signature("兄弟们快来看这个链接")
+
+    assert len(signature) == 64
+    assert all(0 <= value < 2**32 for value in signature)
+    assert signature == MinHasher(num_permutations=64).signature("兄弟们快来看这个链接")
+    assert signature != MinHasher(num_permutations=64, seed=2).signature(
+        "兄弟们快来看这个链接"
+    )
+
+
+def test_similarity_estimates_jaccard():
+    hasher = MinHasher(num_permutations=256)
+    rng = random.Random(0)
+    alphabet = [chr(0x4E00 + index) for index in range(500)]
+    for _ in range(20):
+        first = "".join(rng.choice(alphabet) for _ in range(40))
+        second = first[: rng.randrange(10, 40)] + "".join(
+            rng.choice(alphabet) for _ in range(10)
+        )
+        expected = jaccard(hasher.shingles(first), hasher.shingles(second))
+        estimate = MinHasher.similarity(hasher.signature(first), hasher.signature(second))
+        # NOTE: 256 个哈希的标准误差不超过 1 / (2 * sqrt(256)) ≈ 0.03
+        assert abs(estimate - expected) <= 0.15
+
+
+def test_lsh_clusters_near_duplicates_only():
+    hasher = MinHasher()
+    index = LSHIndex(threshold=0.6)
+    texts = [
+        "兄弟们快来看这个免费领取会员的链接",
+        "兄弟们快来看这个免费领取会员的链接啊",
+        "兄弟们快来看这个免费领取大会员的链接",
+        "今天的视频做得真不错辛苦了",
+        "完全无关的另一条评论内容",
+    ]
+    for key, text in enumerate(texts):
+        index.insert(key, hasher.signature(hasher.normalize(text)))
+
+    clusters = sorted(sorted(cluster) for cluster in index.clusters())
+
+    assert clusters == [[0, 1, 2], [3], [4]]
+
+
+def test_lsh_compares_with_every_group_in_bucket():
+    # NOTE: 三个签名的第一段相同，0 与 1、2 都不相似，1 与 2 相似但另一段不同，
+    # 只与桶内第一个元素比较时 2 无法与 1 归为一组
+    index = LSHIndex(bands=2, threshold=0.6)
+    index.insert(0, (1, 1, 0, 0))
+    index.insert(1, (1, 1, 2, 2))
+    index.insert(2, (1, 1, 2, 3))
+
+    clusters = sorted(sorted(cluster) for cluster in index.clusters())
+
+    assert clusters == [[0], [1, 2]]
+
+
+def test_duplicate_groups_and_members():
+    messages = ["兄弟们快来看这个免费领取会员的链接"] * 4 + [
+        "兄弟们快来看这个免费领取会员的链接!!",
+        "这个视频真的太好看了",
+        "催更催更催更催更",
+    ]
+    replies = [make_reply(rpid, rpid % 3, text) for rpid, text in enumerate(messages)]
+    members = [Member(uid=uid, name=f"user{uid}", level=uid + 1) for uid in range(3)]
+
+    analyzer = DuplicateAnalyzer(replies, members, min_group_size=3)
+    groups = analyzer.get_duplicate_groups()
+
+    assert len(groups) == 1
+    assert sorted(groups[0].rpids) == [0, 1, 2, 3, 4]
+    assert groups[0].mids == {0, 1, 2}
+    assert analyzer.analyze_duplicate_levels() == {1: 1, 2: 1, 3: 1}
+    assert analyzer.members_by_uid is not None
+    assert set(analyzer.members_by_uid) == {0, 1, 2}
@@ -0,0 +1,92 @@
+import pytest
+
+from bilianalyzer.analyze import graph as graph_module
+from bilianalyzer.analyze.graph import GraphAnalyzer, ReplyGraphBuilder
+
+# NOTE: (RPID, ROOT, PARENT, MID, 被回复者 MID)，同一楼的评论相邻
+ROWS = [
+    (1, 0, 0, 10, None),
+    (2, 1, 1, 20, 10),
+    (3, 1, 2, 30, 20),
+    (4, 1, 3, 10, 30),
+    (5, 1, 1, 30, 10),
+    (6, 0, 0, 40, None),
+    (7, 6, 6, 10, 40),
+    (8, 6, 7, 10, 10),
+    (9, 6, 100, 20, None),
+]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        if graph_module.numpy is None:
+            pytest.skip("numpy is not installed")
+    else:
+        monkeypatch.setattr(graph_module, "numpy", None)
+    return request.param
+
+
+def reference_pagerank(edges: dict[tuple[int, int], int], nodes: list[int]) -> dict:
+    """按定义逐次迭代的加权 PageRank，悬挂节点的得分均匀分配"""
+    damping = graph_module.PAGERANK_DAMPING
+    out_weights = {node: 0 for node in nodes}
+    for (source, _), weight in edges.items():
+        out_weights[source] += weight
+    ranks = {node: 1 / len(nodes) for node in nodes}
+    for _ in range(1000):
+        dangling = sum(ranks[node] for node in nodes if out_weights[node] == 0)
+        updated = {
+            node: (1 - damping + damping * dangling) / len(nodes) for node in nodes
+        }
+        for (source, target), weight in edges.items():
+            updated[target] += damping * ranks[source] * weight / out_weights[source]
+        ranks = updated
+    return ranks
+
+
+def test_builder_counts_threads_and_edges(backend):
+    builder = ReplyGraphBuilder()
+    builder.add_rows(ROWS)
+
+    graph = builder.build()
+
+    assert builder.reply_count == 9 and builder.sub_reply_count == 7
+    assert builder.thread_sizes == {5: 1, 4: 1}
+    assert builder.thread_depths == {3: 1, 2: 1}
+    assert builder.missing_parents == 1 and builder.self_replies == 1
+    assert len(graph) == 4 and graph.edge_count == 5
+    assert sorted(zip(graph.uids, graph.in_weights())) == [
+        (10, 2),
+        (20, 1),
+        (30, 1),
+        (40, 1),
+    ]
+
+
+def test_pagerank_matches_reference(backend):
+    builder = ReplyGraphBuilder()
+    builder.add_rows(ROWS)
+    graph = builder.build()
+    edges = {(20, 10): 1, (30, 20): 1, (10, 30): 1, (30, 10): 1, (10, 40): 1}
+    expected = reference_pagerank(edges, [10, 20, 30, 40])
+
+    ranks = dict(zip(graph.uids, graph.pagerank()))
+
+    assert sum(ranks.values()) == pytest.approx(1.0)
+    for uid, rank in expected.items():
+        assert ranks[uid] == pytest.approx(rank, abs=1e-6)
+
+
+def test_analyzer_ranks_most_replied_first(backend):
+    analyzer = GraphAnalyzer([ROWS[:5], ROWS[5:]], top_k=2)
+
+    analysis = analyzer.get_analysis()
+
+    assert analysis["thread_count"] == 2
+    assert analysis["most_replied"] == [(10, 2), (20, 1)]
+    assert [uid for uid, _ in analysis["influence"]][0] == 10
+
+
+def test_pagerank_of_empty_graph(backend):
+    assert len(ReplyGraphBuilder().build().pagerank()) == 0
@@ -0,0 +1,48 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bilianalyzer.metrics import count, gauge, metrics, timer
+
+
+@pytest.fixture
+def enabled():
+    metrics.reset()
+    metrics.enabled = True
+    yield metrics
+    metrics.enabled = False
+    metrics.reset()
+
+
+def test_updates_from_threads_are_not_lost(enabled):
+    def work(index: int) -> None:
+        for _ in range(2000):
+            count("test.rows")
+            with timer("test.stage"):
+                pass
+            gauge("test.depth", index)
+
+    # NOTE: 缩短线程切换间隔，未加锁的读-改-写更容易在线程之间丢失更新
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(work, range(8)))
+    finally:
+        sys.setswitchinterval(interval)
+
+    stats = enabled.to_dict()
+    assert stats["counters"]["test.rows"] == 8 * 2000
+    assert stats["timers"]["test.stage"]["count"] == 8 * 2000
+    assert stats["gauges"]["test.depth"]["max"] == 7
+    assert "test.rows" in enabled.report()
+
+
+def test_disabled_metrics_record_nothing():
+    metrics.reset()
+    count("test.rows")
+    with timer("test.stage"):
+        pass
+
+    assert metrics.to_dict() == {"timers": {}, "counters": {}, "gauges": {}}
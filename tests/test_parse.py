@@ -0,0 +1,36 @@
+from bilianalyzer.parse import (
+    MemberParser,
+    ReplyParser,
+    VideoParser,
+    reset_identity_maps,
+)
+
+from .conftest import AIDS
+
+
+def test_unshared_parsers_keep_their_own_identity_maps(generator):
+    raw_replies = list(generator.generate_replies(AIDS[0]))
+    shared = ReplyParser(MemberParser())
+    first = ReplyParser(MemberParser(shared=False), shared=False)
+    second = ReplyParser(MemberParser(shared=False), shared=False)
+
+    replies = first.batch_parse_from_api(raw_replies)
+
+    assert ReplyParser.replies_by_rpid == {} and MemberParser.members_by_uid == {}
+    assert shared.fetch_reply(replies[0].rpid) is None
+    assert second.fetch_reply(replies[0].rpid) is None
+    assert second.batch_parse_from_api(raw_replies)[0] is not replies[0]
+    # NOTE: 清空共享的身份映射不影响正在进行的其他抓取
+    reset_identity_maps()
+    assert first.fetch_reply(replies[0].rpid) is replies[0]
+    assert first.member_parser.fetch_member(replies[0].mid) is replies[0].member
+
+
+def test_unshared_video_parser(generator):
+    raw_video = generator.generate_video(AIDS[0])
+    video_parser = VideoParser(shared=False)
+
+    video = video_parser.parse_from_api(raw_video)
+
+    assert VideoParser.videos_by_bvid == {}
+    assert video_parser.fetch_video(video.bvid) is video
@@ -0,0 +1,79 @@
+import random
+from collections import Counter
+
+import pytest
+
+from bilianalyzer.analyze.sampling import (
+    proportion_intervals,
+    wilson_interval,
+    z_score,
+)
+from bilianalyzer.fetch.comments import sample_page_indices
+
+
+def test_z_score_of_common_levels():
+    assert z_score(0.95) == pytest.approx(1.959964, abs=1e-6)
+    assert z_score(0.99) == pytest.approx(2.575829, abs=1e-6)
+    with pytest.raises(ValueError):
+        z_score(1.0)
+
+
+def test_wilson_interval_matches_reference_values():
+    # NOTE: 参考值来自 Wilson (1927) 的公式，10 次中 3 次成功、95% 置信水平
+    low, high = wilson_interval(3, 10, z_score(0.95))
+
+    assert low == pytest.approx(0.1078, abs=1e-4)
+    assert high == pytest.approx(0.6032, abs=1e-4)
+
+
+def test_wilson_interval_stays_in_unit_range():
+    z = z_score(0.95)
+
+    assert wilson_interval(0, 20, z)[0] == pytest.approx(0.0, abs=1e-12)
+    assert wilson_interval(20, 20, z)[1] == pytest.approx(1.0)
+    assert 0.0 <= wilson_interval(0, 20, z)[0] and wilson_interval(20, 20, z)[1] <= 1.0
+    assert 0 < wilson_interval(1, 1000, z)[0] < 0.001
+    assert wilson_interval(0, 0, z) == (0.0, 1.0)
+
+
+def test_wilson_interval_covers_true_proportion():
+    rng = random.Random(0)
+    z = z_score(0.95)
+    trials, covered = 2000, 0
+    for _ in range(trials):
+        successes = sum(rng.random() < 0.05 for _ in range(200))
+        low, high = wilson_interval(successes, 200, z)
+        covered += low <= 0.05 <= high
+    # NOTE: 名义覆盖率 95%，允许模拟的随机波动
+    assert covered / trials >= 0.93
+
+
+def test_proportion_intervals_order_and_shares():
+    counts = Counter({"广东": 50, "北京": 30, "美国": 20})
+
+    intervals = proportion_intervals(counts, 0.9)
+
+    assert list(intervals) == ["广东", "北京", "美国"]
+    share, low, high = intervals["北京"]
+    assert share == pytest.approx(0.3)
+    assert low < share < high
+
+
+def test_sample_page_indices_draws_from_every_page():
+    rng = random.Random(1)
+
+    indices = sample_page_indices(100, 10, rng=rng)
+
+    assert len(indices) == len(set(indices)) == 10
+    assert indices == sorted(indices)
+    assert all(1 <= index <= 100 for index in indices)
+    assert sample_page_indices(5, 10) == [1, 2, 3, 4, 5]
+    # NOTE: 第 1 页与其他页被抽中的概率相同
+    first = sum(1 in sample_page_indices(10, 1, rng=rng) for _ in range(5000))
+    assert 400 <= first <= 600
+
+
+def test_stratified_sample_takes_one_page_per_span():
+    indices = sample_page_indices(100, 10, stratified=True, rng=random.Random(2))
+
+    assert [(index - 1) // 10 for index in indices] == list(range(10))
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+
+from bilianalyzer import CommentResourceType
+from bilianalyzer.database import MemberDatabase, ReplyDatabase, VideoDatabase
+from bilianalyzer.parse import ReplyParser
+from bilianalyzer.shards import ShardLayout, ShardRouter, shards_root, split_database
+
+from .conftest import AIDS, Corpus
+
+
+def count_rows(dbpath: str, table: str) -> int:
+    connection = sqlite3.connect(dbpath)
+    (rows,) = connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()
+    connection.close()
+    return rows
+
+
+def test_split_partitions_videos_by_aid(corpus: Corpus):
+    layout = ShardLayout(shards_root(corpus.dbpath), 2)
+
+    counts = split_database(corpus.dbpath, layout)
+
+    assert sum(counts) == count_rows(corpus.dbpath, "REPLIES")
+    assert ShardLayout.load(layout.root) == layout
+    for aid in AIDS:
+        dbpath = layout.path(layout.shard_of(aid))
+        other = layout.path(1 - layout.shard_of(aid))
+        expected = len(list(ReplyParser.unroll_replies(corpus.replies[aid])))
+        assert counts[layout.shard_of(aid)] == expected
+        reply_db = ReplyDatabase(dbpath, MemberDatabase(dbpath))
+        other_db = ReplyDatabase(other, MemberDatabase(other))
+        assert reply_db.count_replies(aid, CommentResourceType.VIDEO) == expected
+        assert other_db.count_replies(aid, CommentResourceType.VIDEO) == 0
+
+
+def test_split_copies_members_and_raw_data_of_each_shard(corpus: Corpus):
+    layout = ShardLayout(shards_root(corpus.dbpath), 2)
+    split_database(corpus.dbpath, layout)
+
+    for index, dbpath in enumerate(layout.paths()):
+        aid = next(aid for aid in AIDS if layout.shard_of(aid) == index)
+        assert count_rows(dbpath, "RAW_REPLIES") == len(corpus.raw_replies[aid])
+        # NOTE: 用户按其评论所在的分片复制，同一用户可能出现在多个分片中
+        mids = {reply.mid for reply in ReplyParser.unroll_replies(corpus.replies[aid])}
+        assert count_rows(dbpath, "MEMBERS") == len(mids)
+        assert count_rows(dbpath, "VIDEOS") == 1
+    assert sum(count_rows(path, "SKETCHES") for path in layout.paths()) == count_rows(
+        corpus.dbpath, "SKETCHES"
+    )
+
+
+def test_router_reads_across_shards(corpus: Corpus):
+    layout = ShardLayout(shards_root(corpus.dbpath), 2)
+    split_database(corpus.dbpath, layout)
+    router = ShardRouter(corpus.dbpath)
+
+    assert router.sharded
+    assert router.path_for(AIDS[0]) != router.path_for(AIDS[1])
+    assert [oid for oid, _ in router.load_resources()] == AIDS
+    bvids = {video.bvid for video in router.query_videos()}
+    assert bvids == {
+        video.bvid
+        for dbpath in layout.paths()
+        for video in VideoDatabase(dbpath).query_videos()
+    }
+    newest = list(router.query_replies(limit=5))
+    expected = sorted(
+        (
+            reply
+            for replies in corpus.replies.values()
+            for reply in ReplyParser.unroll_replies(replies)
+        ),
+        key=lambda reply: (reply.ctime, reply.rpid),
+        reverse=True,
+    )[:5]
+    assert [reply.rpid for reply in newest] == [reply.rpid for reply in expected]
+
+
+def test_router_without_layout_uses_single_file(tmp_path):
+    dbpath = os.path.join(tmp_path, "bilianalyzer.db")
+    router = ShardRouter(dbpath)
+
+    assert not router.sharded
+    assert router.paths() == [dbpath]
+    assert router.path_for(AIDS[0]) == dbpath
@@ -0,0 +1,74 @@
+import random
+from collections import Counter
+
+import pytest
+
+from bilianalyzer.analyze.sketches import HyperLogLog, SpaceSaving, heavy_hitters
+
+
+def zipf_stream(size: int, seed: int = 0) -> list[int]:
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, 1001)]
+    return rng.choices(range(1000), weights=weights, k=size)
+
+
+def test_space_saving_counts_within_error_bound():
+    stream = zipf_stream(20000)
+    exact = Counter(stream)
+
+    sketch = heavy_hitters(stream, 50)
+
+    assert len(sketch) == 50
+    assert sketch.total == len(stream)
+    for item in sketch.counts:
+        assert sketch.guaranteed(item) <= exact[item] <= sketch.estimate(item)
+        assert sketch.estimate(item) - exact[item] <= sketch.error_bound()
+    # NOTE: 真实计数超过 total / capacity 的元素一定被跟踪
+    for item, count in exact.items():
+        if count > sketch.error_bound():
+            assert item in sketch
+
+
+def test_space_saving_merge_keeps_error_bound():
+    first, second = zipf_stream(10000, 1), zipf_stream(10000, 2)
+    exact = Counter(first) + Counter(second)
+
+    merged = heavy_hitters(first, 50).merge(heavy_hitters(second, 50))
+
+    assert merged.total == len(first) + len(second)
+    for item in merged.counts:
+        assert merged.guaranteed(item) <= exact[item] <= merged.estimate(item)
+        assert merged.estimate(item) - exact[item] <= merged.error_bound()
+
+
+def test_space_saving_is_exact_below_capacity():
+    sketch: SpaceSaving[str] = SpaceSaving(10)
+    sketch.update_many(["a", "b", "a", "c", "a"])
+
+    assert sketch.to_counter() == Counter({"a": 3, "b": 1, "c": 1})
+    assert sketch.estimate("d") == 0
+
+
+@pytest.mark.parametrize("cardinality", [100, 5000, 100000])
+def test_hyperloglog_estimate_within_three_standard_errors(cardinality: int):
+    sketch = HyperLogLog(12)
+
+    sketch.update(range(cardinality))
+    sketch.update(range(cardinality // 2))
+
+    assert abs(len(sketch) - cardinality) <= 3 * sketch.relative_error * cardinality
+
+
+def test_hyperloglog_merge_equals_union():
+    first, second = HyperLogLog(10), HyperLogLog(10)
+    first.update(range(0, 6000))
+    second.update(range(3000, 9000))
+    union = HyperLogLog(10)
+    union.update(range(0, 9000))
+
+    merged = first.merge(second)
+
+    assert merged.registers == union.registers
+    assert HyperLogLog.from_bytes(merged.to_bytes()).registers == merged.registers
+    with pytest.raises(ValueError):
+        first.merge(HyperLogLog(12))